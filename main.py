@@ -1,14 +1,15 @@
 # Fichier: main.py
 
+import argparse
 import json
 import sys
-import pandas as pd
 from datetime import date
 from src.data_loader import DataLoader
-from src.solver import CpSatSolver
-import src.utils as utils
-import src.reporter as reporter
-from collections import defaultdict
+from src.storage import store_from_config
+import src.capacity as capacity
+import src.planner as planner
+import src.scenarios as scenarios
+import src.whatif as whatif
 import os
 
 # --- CONFIGURATION DES CHEMINS ---
@@ -20,72 +21,122 @@ FONCTIONS_PATH = os.path.join(BASE_DIR, "data/input/02_fonctions.json")
 SHIFTS_PATH = os.path.join(BASE_DIR, "data/input/03_shifts_master.json")
 NEEDS_PATH = os.path.join(BASE_DIR, "data/input/04_daily_needs.json")
 GROUPS_PATH = os.path.join(BASE_DIR, "data/input/05_groups.json")
+VALIDATION_CACHE_PATH = os.path.join(BASE_DIR, "data/cache/validation_cache.json")
+WHATIF_CACHE_PATH = os.path.join(BASE_DIR, "data/cache/whatif_cache.json")
+INPUT_DIR = os.path.join(BASE_DIR, "data/input")
 
 # Nouveaux noms de fichiers demandés
 OUTPUT_CSV_PATH = os.path.join(BASE_DIR, "data/output/Planning.csv")
 OUTPUT_REPORT_PATH = os.path.join(BASE_DIR, "data/output/Report.txt")
+OUTPUT_TABLE_PATH = os.path.join(BASE_DIR, "data/output/Planning.arrow")
+OUTPUT_REPORT_JSON_PATH = os.path.join(BASE_DIR, "data/output/Report.json")
 
-def run():
-    print("--- [1/6] Démarrage du Planificateur ---", flush=True)
-    
-    # 1. Chargement
-    loader = DataLoader(CONFIG_PATH, EMPLOYEES_PATH, FONCTIONS_PATH, SHIFTS_PATH, NEEDS_PATH, GROUPS_PATH)
-    all_data = loader.load_all_data()
-    
-    print("\n--- [2/6] Vérification des Données ---", flush=True)
-    if not all_data.get('daily_needs'):
-        print("ERREUR: Données manquantes (daily_needs vide).", flush=True)
-        sys.exit()
-    print("  SUCCÈS: Données OK.", flush=True)
+def build_loader(start_date=None, end_date=None):
+    """DataLoader sur les fichiers JSON, ou sur la base SQLite si settings.json l'active."""
+    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    store = store_from_config(config, BASE_DIR, seed_dir=INPUT_DIR)
+    if store is None:
+        loader = DataLoader(CONFIG_PATH, EMPLOYEES_PATH, FONCTIONS_PATH, SHIFTS_PATH, NEEDS_PATH, GROUPS_PATH,
+                            start_date=start_date, end_date=end_date,
+                            validation_cache_path=VALIDATION_CACHE_PATH)
+        return loader, None
+
+    loader = DataLoader.from_store(store, config, start_date=start_date, end_date=end_date,
+                                   validation_cache_path=VALIDATION_CACHE_PATH)
+    return loader, store
+
+def check_capacity(start_date=None, end_date=None):
+    """Pré-calcul de capacité seul : le mois est-il couvrable ? Sans lancer le solveur."""
+    loader, _ = build_loader(start_date, end_date)
+    report = capacity.check_capacity(loader)
+    if report is None:
+        sys.exit(1)
+    print(f"\n[Capacité] {report.summary()}", flush=True)
+    for day in report.to_dict()["days"]:
+        short = ", ".join(f"{s['shift_id']} ({s['available']}/{s['needed']})" for s in day["shifts"])
+        print(f"  {day['date']} : {day['max_coverable']}/{day['needed']} couvrables"
+              + (f" | agents/besoin : {short}" if short else ""), flush=True)
 
-    print("\n--- [3/6] Analyse des familles et besoins ---", flush=True)
-    print(f"  {len(all_data['employee_families'])} familles d'employés chargées.", flush=True)
-    
-    # Calcul des besoins totaux pour info
-    total_needs_per_shift = defaultdict(int)
-    for need in all_data["daily_needs"]:
-        total_needs_per_shift[need.shift_id] += need.count
-    all_data["total_needs_per_shift"] = total_needs_per_shift
-    print(f"  Volume total de shifts demandés : {sum(total_needs_per_shift.values())}", flush=True)
+def sweep(scenarios_path, start_date=None, end_date=None, time_limit=None, workers=None):
+    """Balayage de scénarios de pondération (src.scenarios) : tableau comparatif, sans rien écrire."""
+    with open(scenarios_path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    loader, _ = build_loader(start_date, end_date)
+    try:
+        results = scenarios.sweep_from_loader(loader, spec, time_limit=time_limit, max_workers=workers)
+    except ValueError as e:
+        print(f"ERREUR: {e}", flush=True)
+        sys.exit(1)
+    if results is None:
+        sys.exit(1)
+    print("\n" + scenarios.format_table(results), flush=True)
+    print("\n(* : front de Pareto sur manques, weekends, jours OFF et équité ; - : pénalité non mesurée)", flush=True)
 
-    # Ajout manuel de la map des fonctions (nécessaire pour le Solver)
-    all_data["fonctions_map"] = loader._load_fonctions()
-    
-    print("\n--- [4/6] Pré-calcul des contraintes ---", flush=True)
-    # Calcul des 11h de repos et des weekends
-    toxic_pairs = utils.calculate_toxic_pairs(all_data["shifts_map"], all_data["config"]["min_rest_hours"])
-    all_data["weekends"] = utils.get_weekends_in_range(all_data["date_range"])
+def what_if(deltas_path, start_date=None, end_date=None, time_limit=None, workers=None):
+    """Analyse "et si" des effectifs (src.whatif) : écart de chaque variante au planning actuel."""
+    with open(deltas_path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    loader, _ = build_loader(start_date, end_date)
+    try:
+        results = whatif.whatif_from_loader(loader, spec, WHATIF_CACHE_PATH, time_limit=time_limit, max_workers=workers)
+    except (KeyError, ValueError) as e:
+        print(f"ERREUR: variante invalide : {e}", flush=True)
+        sys.exit(1)
+    if results is None:
+        sys.exit(1)
+    print("\n" + whatif.format_table(results), flush=True)
+    print("\n(entre parenthèses : écart à la référence ; manque garanti = borne inférieure (relaxation jour par jour) ; non couverts et score au budget donné)", flush=True)
 
-    print("\n--- [5/6] Lancement du Solveur (CpSatSolver) ---", flush=True)
-    solver = CpSatSolver(all_data, toxic_pairs)
-    solver.create_model() # Construit le modèle
-    
-    # Résolution unique (plus de refiner)
-    planning, report_data = solver.solve()
+def run(start_date=None, end_date=None):
+    # 1. Chargement (seuls les besoins de la fenêtre demandée sont lus)
+    loader, store = build_loader(start_date, end_date)
+
+    # 2 à 5. Validation, pré-calculs et résolution (en mémoire)
+    result = planner.run_pipeline(loader)
+    if result.status == planner.STATUS_INVALID_DATA:
+        sys.exit()
 
     print("\n--- [6/6] Sauvegarde des résultats ---", flush=True)
-    if planning:
+    if result.ok:
         try:
-            # 1. Sauvegarde du CSV (Planning.csv)
-            df = pd.DataFrame.from_dict(planning, orient='index')
-            # Tri des colonnes par date
-            df = df[sorted(df.columns)] 
-            df.to_csv(OUTPUT_CSV_PATH, index_label="Employee")
-            print(f"  >> Planning sauvegardé : {OUTPUT_CSV_PATH}", flush=True)
-            
-            # 2. Sauvegarde du Rapport (Report.txt)
-            if report_data:
-                report_text = reporter.generate_text_report(report_data, planning)
-                with open(OUTPUT_REPORT_PATH, 'w', encoding='utf-8') as f:
-                    f.write(report_text)
-                print(f"  >> Rapport sauvegardé  : {OUTPUT_REPORT_PATH}", flush=True)
-                
+            planner.save_outputs(result, OUTPUT_CSV_PATH, OUTPUT_REPORT_PATH,
+                                 db_path=store.db_path if store else None, table_path=OUTPUT_TABLE_PATH,
+                                 report_json_path=OUTPUT_REPORT_JSON_PATH)
         except Exception as e:
             print(f"ERREUR CRITIQUE lors de la sauvegarde : {e}", flush=True)
+    elif result.conflict and result.conflict["conflict"]:
+        print("\n[FIN] Aucune solution : ces règles ne peuvent pas être respectées ensemble :", flush=True)
+        for item in result.conflict["conflict"]:
+            print(f"  - {item['description']}", flush=True)
+        if not result.conflict["minimal"]:
+            print("  (liste non minimale : temps de diagnostic écoulé)", flush=True)
     else:
         print("\n[FIN] Aucune solution trouvée. Vérifiez vos contraintes.", flush=True)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lance le planificateur CP-SAT.")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="Premier jour à planifier (AAAA-MM-JJ).")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Dernier jour à planifier (AAAA-MM-JJ).")
+    parser.add_argument("--capacity", action="store_true", help="Vérifie seulement la capacité (manque garanti), sans résoudre.")
+    parser.add_argument("--scenarios", metavar="FICHIER", default=None,
+                        help="Compare les jeux de pénalités d'un fichier JSON (liste de scénarios et/ou grille).")
+    parser.add_argument("--whatif", metavar="FICHIER", default=None,
+                        help="Évalue les variantes d'effectif d'un fichier JSON (départs, recrues, formations).")
+    parser.add_argument("--budget", type=float, default=None, help="Secondes de résolution par scénario ou variante.")
+    parser.add_argument("--workers", type=int, default=None, help="Scénarios ou variantes résolus en parallèle.")
+    args = parser.parse_args()
+
+    if args.capacity:
+        check_capacity(args.start, args.end)
+        sys.exit()
+    if args.scenarios:
+        sweep(args.scenarios, args.start, args.end, args.budget, args.workers)
+        sys.exit()
+    if args.whatif:
+        what_if(args.whatif, args.start, args.end, args.budget, args.workers)
+        sys.exit()
+
     # Création du dossier output s'il n'existe pas
     os.makedirs(os.path.dirname(OUTPUT_CSV_PATH), exist_ok=True)
-    run()
\ No newline at end of file
+    run(args.start, args.end)
\ No newline at end of file
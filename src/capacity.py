@@ -0,0 +1,170 @@
+# Fichier: src/capacity.py
+"""
+Pré-calcul de capacité, avant la construction du modèle CP-SAT : pour chaque
+jour, un flot maximum biparti entre les agents disponibles (hors congés et
+jours fixes) et les besoins (shift, nombre), en respectant les qualifications
+et un seul shift par agent et par jour.
+
+Le flot relâche les règles sur plusieurs jours (repos de 11h, heures max,
+jours OFF minimum...) : le manque qu'il laisse est donc un minimum garanti,
+que le solveur ne pourra pas combler. Il donne une borne inférieure de
+l'objectif (manque x PER_MISSING_NEED_UNIT).
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import src.utils as utils
+
+
+@dataclass
+class ShiftCapacity:
+    shift_id: str
+    needed: int
+    available: int  # Agents disponibles et qualifiés ce jour-là
+
+    @property
+    def min_shortfall(self) -> int:
+        return max(self.needed - self.available, 0)
+
+
+@dataclass
+class DayCapacity:
+    date: date
+    needed: int
+    max_coverable: int  # Valeur du flot maximum
+    shifts: List[ShiftCapacity] = field(default_factory=list)
+
+    @property
+    def min_shortfall(self) -> int:
+        return self.needed - self.max_coverable
+
+
+@dataclass
+class CapacityReport:
+    days: List[DayCapacity]
+    cost_per_missing: Optional[int]  # None si PER_MISSING_NEED_UNIT manque à settings.json
+
+    @property
+    def total_needed(self) -> int:
+        return sum(day.needed for day in self.days)
+
+    @property
+    def min_shortfall(self) -> int:
+        return sum(day.min_shortfall for day in self.days)
+
+    @property
+    def objective_lower_bound(self) -> Optional[int]:
+        if self.cost_per_missing is None:
+            return None
+        return self.min_shortfall * self.cost_per_missing
+
+    @property
+    def coverable(self) -> bool:
+        return self.min_shortfall == 0
+
+    def summary(self) -> str:
+        if self.coverable:
+            return f"Besoins couvrables : {self.total_needed} shifts, aucun manque garanti."
+        days = sum(1 for day in self.days if day.min_shortfall)
+        summary = f"Manque garanti : {self.min_shortfall} shift(s) sur {self.total_needed}, sur {days} jour(s)"
+        if self.objective_lower_bound is None:
+            return summary + "."
+        return summary + f" (borne inférieure de l'objectif : {self.objective_lower_bound})."
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Version JSON : totaux, puis les jours en manque avec les shifts trop peu pourvus."""
+        return {
+            "coverable": self.coverable,
+            "total_needed": self.total_needed,
+            "min_shortfall": self.min_shortfall,
+            "objective_lower_bound": self.objective_lower_bound,
+            "days": [{
+                "date": day.date.isoformat(),
+                "needed": day.needed,
+                "max_coverable": day.max_coverable,
+                "min_shortfall": day.min_shortfall,
+                "shifts": [{"shift_id": s.shift_id, "needed": s.needed, "available": s.available,
+                            "min_shortfall": s.min_shortfall} for s in day.shifts if s.min_shortfall],
+            } for day in self.days if day.min_shortfall],
+        }
+
+
+def _max_flow(candidates: Dict[str, List[str]], capacities: Dict[str, int]) -> int:
+    """
+    Flot maximum agents -> shifts : chaque agent (capacité 1) vers les shifts
+    qu'il peut faire, chaque shift (capacité = besoin) vers le puits. Chemins
+    augmentants en profondeur (Kuhn, avec des shifts à plusieurs places).
+    """
+    assigned = defaultdict(list)  # shift -> agents qui l'occupent
+
+    def augment(agent, visited):
+        for s_id in candidates[agent]:
+            if s_id in visited:
+                continue
+            visited.add(s_id)
+            if len(assigned[s_id]) < capacities[s_id]:
+                assigned[s_id].append(agent)
+                return True
+            for i, other in enumerate(assigned[s_id]):
+                if augment(other, visited):
+                    assigned[s_id][i] = agent
+                    return True
+        return False
+
+    # Les agents les moins polyvalents d'abord : moins de chemins à réparer ensuite
+    return sum(1 for agent in sorted(candidates, key=lambda a: len(candidates[a])) if augment(agent, set()))
+
+
+def analyze_capacity(all_data: Dict[str, Any]) -> CapacityReport:
+    """Analyse jour par jour des données chargées (DataLoader.load_all_data ou planner.prepare_data)."""
+    date_range = all_data["date_range"]
+    shifts_map = all_data["shifts_map"]
+    day_index = {day: d for d, day in enumerate(date_range)}
+
+    # Besoins agrégés par (jour, shift) comme dans le solveur
+    needs_by_day = defaultdict(dict)
+    for need in utils.aggregate_needs(all_data["daily_needs"]):
+        if need.date in day_index and need.count > 0:
+            needs_by_day[need.date][need.shift_id] = need.count
+
+    # Qualifications utilisables (shift connu, comme les variables du solveur) et disponibilités
+    agents = [(e.id, [s_id for s_id in e.qualifications if s_id in shifts_map],
+               e.availability.compile(date_range)) for e in all_data["employees"]]
+
+    days = []
+    for day in date_range:
+        needs = needs_by_day.get(day, {})
+        d = day_index[day]
+        candidates = {}
+        for e_id, qualifications, availability in agents:
+            if availability.is_off(d):
+                continue
+            shifts = [s_id for s_id in qualifications if s_id in needs]
+            if shifts:
+                candidates[e_id] = shifts
+        available = defaultdict(int)
+        for shifts in candidates.values():
+            for s_id in shifts:
+                available[s_id] += 1
+        days.append(DayCapacity(
+            date=day,
+            needed=sum(needs.values()),
+            max_coverable=_max_flow(candidates, needs),
+            shifts=[ShiftCapacity(s_id, count, available[s_id]) for s_id, count in sorted(needs.items())],
+        ))
+    try:
+        cost_per_missing = utils.penalty_weight(all_data["config"].get("penalties", {}), "PER_MISSING_NEED_UNIT")
+    except ValueError:
+        cost_per_missing = None  # Le solveur refusera la configuration ; le manque garanti reste valable
+    return CapacityReport(days, cost_per_missing)
+
+
+def check_capacity(loader) -> Optional[CapacityReport]:
+    """Charge et valide les données d'un DataLoader puis les analyse, sans solveur. None si les données sont inutilisables."""
+    all_data = loader.load_all_data()
+    if not all_data or not all_data.get("daily_needs"):
+        return None
+    return analyze_capacity(all_data)
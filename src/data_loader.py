@@ -1,13 +1,19 @@
 # Fichier: src/data_loader.py
 
+import hashlib
 import json
-from datetime import datetime, timedelta
-from typing import List, Dict, Set, Any
+import sys
+from datetime import date, datetime
+from typing import List, Dict, Set, Any, Optional
 from src.models import Employee, Shift, Constraint, Need, DAY_OF_WEEK_MAP
+from src.needs_reader import read_needs
 from src.utils import get_date_range_from_needs
+from src.validation import CHECKS, ValidationCache, ValidationIssue, document_digest, file_digest, run_checks
 
 class DataLoader:
-    def __init__(self, config_path, employees_path, fonctions_path, shifts_path, needs_path, groups_path):
+    def __init__(self, config_path, employees_path, fonctions_path, shifts_path, needs_path, groups_path,
+                 start_date: Optional[date] = None, end_date: Optional[date] = None,
+                 validation_cache_path: Optional[str] = None):
         self.config_path = config_path
         self.employees_path = employees_path
         self.fonctions_path = fonctions_path
@@ -15,18 +21,69 @@ class DataLoader:
         self.needs_path = needs_path
         self.groups_path = groups_path
 
+        # Fenêtre de planification : seuls les besoins de cette période sont chargés
+        self.start_date = start_date
+        self.end_date = end_date
+        self.needs_columns = None
+
+        # Validation incrémentale : résultats persistés par empreinte de fichier
+        self.validation_cache_path = validation_cache_path
+        self.issues: List[ValidationIssue] = []
+        self._fonctions_data = {}
+
+        # Documents déjà en mémoire (rôle -> contenu JSON), prioritaires sur les fichiers
+        self.documents: Dict[str, Any] = {}
+
+    @classmethod
+    def from_data(cls, config: Dict, employees: List[Dict], fonctions: Dict, shifts: Dict,
+                  needs: List[Dict], groups: Dict, start_date: Optional[date] = None,
+                  end_date: Optional[date] = None, validation_cache_path: Optional[str] = None) -> "DataLoader":
+        """
+        Construit un loader à partir des structures JSON déjà chargées (même
+        format que les fichiers d'entrée), sans aucun accès disque.
+        """
+        loader = cls(None, None, None, None, None, None, start_date=start_date, end_date=end_date,
+                     validation_cache_path=validation_cache_path)
+        loader.documents = {
+            "config": config,
+            "employees": employees,
+            "fonctions": fonctions,
+            "shifts": shifts,
+            "needs": needs,
+            "groups": groups,
+        }
+        return loader
+
+    @classmethod
+    def from_store(cls, store, config: Dict, start_date: Optional[date] = None,
+                   end_date: Optional[date] = None, validation_cache_path: Optional[str] = None) -> "DataLoader":
+        """
+        Construit un loader à partir du stockage SQLite (src.storage). Seuls
+        les besoins de la fenêtre demandée sont lus, via l'index sur la date.
+        """
+        return cls.from_data(
+            config,
+            store.get_document("employees"),
+            store.get_document("fonctions"),
+            store.get_document("shifts"),
+            list(store.needs_between(start_date, end_date)),
+            store.get_document("groups"),
+            start_date=start_date, end_date=end_date, validation_cache_path=validation_cache_path,
+        )
+
     def load_all_data(self) -> Dict[str, Any]:
         """
         Méthode principale pour tout charger, valider et retourner un dictionnaire de données.
         """
         print("Chargement des données...")
+        self.issues = []
         
-        config = self._load_json(self.config_path)
+        config = self._load_document("config")
         shifts_map = self._load_shifts()
         fonctions_map = self._load_fonctions()
         # On charge les données brutes des employés pour la validation
-        employees_data = self._load_json(self.employees_path)
-        daily_needs = self._load_needs(self.needs_path)
+        employees_data = self._load_document("employees")
+        daily_needs = self._load_needs(self.documents.get("needs", self.needs_path))
 
         # --- ÉTAPE DE VALIDATION ---
         is_valid = self._validate_data(shifts_map, fonctions_map, employees_data, daily_needs)
@@ -52,64 +109,91 @@ class DataLoader:
             "date_range": date_range,
             "all_shift_ids": all_shift_ids,
             "needed_shifts_lookup": needed_shifts_lookup,
-            "employee_families": employee_families
+            "employee_families": employee_families,
+            "fonctions_map": fonctions_map,
+            "needs_columns": self.needs_columns
         }
 
     def _validate_data(self, shifts_map: Dict, fonctions_map: Dict, employees_data: List[Dict], daily_needs: List[Need]) -> bool:
         """
         Vérifie la cohérence entre les différents fichiers de données.
+        Seules les règles dont un fichier a changé depuis la dernière exécution
+        sont rejouées ; toutes les anomalies sont conservées dans self.issues.
         """
         print("  [Validation] Démarrage de la vérification des données...")
-        errors = []
-        
-        # 1. Vérifier que les shifts dans les besoins existent
-        shift_ids_master = set(shifts_map.keys())
-        for need in daily_needs:
-            if need.shift_id not in shift_ids_master:
-                errors.append(f"  - Le shift '{need.shift_id}' requis le {need.date} n'existe pas dans '03_shifts_master.json'.")
-
-        # 2. Vérifier que les fonctions des employés existent
-        fonction_ids_master = set(fonctions_map.keys())
-        for emp_data in employees_data:
-            for func_item in emp_data.get("qualifications", []):
-                # On ne valide que les strings, on ignore les dicts ici
-                if isinstance(func_item, str):
-                    if func_item not in fonction_ids_master:
-                        errors.append(f"  - La fonction '{func_item}' de l'employé '{emp_data['name']}' n'existe pas dans '02_fonctions.json'.")
-
-        # 3. Vérifier que les qualifications (shifts) dans les fonctions existent
-        for func_id, qualif_list in fonctions_map.items():
-            for shift_id in qualif_list:
-                if shift_id not in shift_ids_master:
-                    errors.append(f"  - La qualification '{shift_id}' listée dans la fonction '{func_id}' n'existe pas dans '03_shifts_master.json'.")
+        data = {
+            "shift_ids": set(shifts_map.keys()),
+            "fonctions": self._fonctions_data or {},
+            "employees": employees_data or [],
+            "needs": self.needs_columns,
+        }
+        digests = {role: self._digest(role) for role in self._file_roles()}
+        errors, executed = run_checks(digests, data, ValidationCache(self.validation_cache_path),
+                                      scope=f"{self.start_date}:{self.end_date}")
+        print(f"  [Validation] {len(executed)}/{len(CHECKS)} règle(s) rejouée(s), les autres sont à jour.")
+        self.issues.extend(errors)
 
         if errors:
             print("  [Validation] ERREUR: Des incohérences ont été détectées :")
             for error in errors:
-                print(error)
+                print(f"  - {error.message} ({error.file} {error.path})")
             return False
         
         print("  [Validation] Succès : Les données sont cohérentes.")
         return True
 
+    def _file_roles(self) -> Dict[str, str]:
+        return {
+            "config": self.config_path,
+            "employees": self.employees_path,
+            "fonctions": self.fonctions_path,
+            "shifts": self.shifts_path,
+            "needs": self.needs_path,
+            "groups": self.groups_path,
+        }
+
     def _get_all_shift_ids(self, shifts_map: Dict[str, Shift]) -> Set[str]:
         """Récupère simplement la liste de tous les shift_id uniques."""
         return set(shifts_map.keys())
 
+    def _digest(self, role: str) -> str:
+        if role in self.documents:
+            return document_digest(self.documents[role])
+        return file_digest(self._file_roles()[role])
+
+    def input_digest(self) -> str:
+        """Empreinte de toutes les entrées (fichiers ou documents) et de la période planifiée."""
+        digest = hashlib.sha256()
+        for role in sorted(self._file_roles()):
+            digest.update(f"{role}:{self._digest(role)}\n".encode('utf-8'))
+        digest.update(f"{self.start_date}:{self.end_date}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _load_document(self, role: str) -> Any:
+        """Retourne le document en mémoire s'il existe, sinon lit le fichier."""
+        if role in self.documents:
+            return self.documents[role] if self.documents[role] is not None else {}
+        return self._load_json(self._file_roles()[role])
+
     def _load_json(self, file_path: str) -> Any:
+        role = next((r for r, p in self._file_roles().items() if p == file_path), file_path)
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except FileNotFoundError:
             print(f"  [Loader] ERREUR FATALE: Fichier introuvable: {file_path}")
+            self.issues.append(ValidationIssue(file=role, path="$", code="FILE_NOT_FOUND",
+                                               message=f"Fichier introuvable: {file_path}"))
             return {}
         except json.JSONDecodeError as e:
             print(f"  [Loader] ERREUR FATALE: Erreur JSON: {file_path}. Détail: {e}")
+            self.issues.append(ValidationIssue(file=role, path=f"$ (ligne {e.lineno}, colonne {e.colno})",
+                                               code="INVALID_JSON", message=f"Erreur JSON: {e.msg}"))
             return {}
 
     def _load_shifts(self) -> Dict[str, Shift]:
         shifts_map = {}
-        shifts_data = self._load_json(self.shifts_path)
+        shifts_data = self._load_document("shifts")
         if not shifts_data: return {}
              
         for shift_data in shifts_data.values():
@@ -127,10 +211,11 @@ class DataLoader:
         return shifts_map
 
     def _load_fonctions(self) -> Dict[str, List[str]]:
-        fonctions_data = self._load_json(self.fonctions_path)
+        fonctions_data = self._load_document("fonctions")
+        self._fonctions_data = fonctions_data
         fonctions_map = {}
         for func in fonctions_data.get("functions", []):
-            fonctions_map[func["id"]] = func.get("qualifications", [])
+            fonctions_map[sys.intern(func["id"])] = [sys.intern(q) for q in func.get("qualifications", [])]
         print(f"  [Loader] Succès : {len(fonctions_map)} fonctions chargées.")
         return fonctions_map
 
@@ -203,10 +288,8 @@ class DataLoader:
                         start_date = datetime.strptime(dates_str[0].strip(), "%Y-%m-%d").date()
                         end_date = datetime.strptime(dates_str[1].strip(), "%Y-%m-%d").date()
                         
-                        current_date = start_date
-                        while current_date <= end_date:
-                            parsed.append(Constraint(type="HOLIDAY", date=current_date))
-                            current_date += timedelta(days=1)
+                        # Une seule contrainte par période (plus un objet par jour)
+                        parsed.append(Constraint(type="HOLIDAY", date=start_date, end_date=end_date))
                     else:
                         print(f"AVERTISSEMENT: Format VACATION invalide: {const_str}. Attendu VACATION(AAAA-MM-JJ,AAAA-MM-JJ)")
                 except ValueError:
@@ -237,32 +320,28 @@ class DataLoader:
                 parsed.append(Constraint(type="FIXED_OFF", weekday=DAY_OF_WEEK_MAP["SUNDAY"]))
         return parsed
 
-    def _load_needs(self, needs_path: str) -> List[Need]:
-        needs = []
+    def _load_needs(self, needs_source) -> List[Need]:
+        """
+        Lit les besoins en flux, filtrés sur la fenêtre de planification.
+        `needs_source` est un chemin de fichier ou la liste des besoins en mémoire.
+        La version colonnaire est conservée dans self.needs_columns.
+        """
         try:
-            needs_data = self._load_json(needs_path)
-            if not needs_data: return []
-
-            for item in needs_data:
-                if item["shift_id"] in ["HOL", "OFF", "INSI"]: continue
-                try:
-                    need_date = datetime.strptime(item["date_str"], "%d/%m/%y").date()
-                    needs.append(Need(date=need_date, shift_id=item["shift_id"], count=item["count"]))
-                except ValueError:
-                    try:
-                        need_date = datetime.strptime(item["date_str"], "%Y-%m-%d").date()
-                        needs.append(Need(date=need_date, shift_id=item["shift_id"], count=item["count"]))
-                    except ValueError:
-                         print(f"AVERTISSEMENT: Date inconnue: {item['date_str']}")
-            
+            self.needs_columns = read_needs(needs_source or [], self.start_date, self.end_date)
+            needs = self.needs_columns.to_needs()
             print(f"  [Loader] Succès : {len(needs)} besoins chargés.")
             return needs
+        except FileNotFoundError:
+            print(f"  [Loader] ERREUR FATALE: Fichier introuvable: {needs_source}")
+            self.issues.append(ValidationIssue(file="needs", path="$", code="FILE_NOT_FOUND",
+                                               message=f"Fichier introuvable: {needs_source}"))
+            return []
         except Exception as e:
             print(f"  [Loader] ERREUR FATALE: {e}")
             return []
 
     def _load_employee_families(self, employees: List[Employee]) -> Dict[str, List[Employee]]:
-        families_data = self._load_json(self.groups_path)
+        families_data = self._load_document("groups")
         employee_families = {group_name: [] for group_name in families_data.keys()}
         
         # Add an "Autres" group for employees not explicitly listed in any group
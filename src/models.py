@@ -1,8 +1,11 @@
 # Fichier: src/models.py
 
+import sys
+from bisect import bisect_right
 from dataclasses import dataclass, field
 from datetime import date
-from typing import List, Set, Optional
+from functools import lru_cache
+from typing import List, Set, Optional, Tuple, Iterable, Iterator
 
 # Constante pour les calculs de temps (utilisée dans __post_init__)
 MINUTES_IN_DAY = 24 * 60 # 1440
@@ -18,7 +21,24 @@ DAY_OF_WEEK_MAP = {
     "SUNDAY": 6
 }
 
-@dataclass
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Partage une seule instance par identifiant (shift, fonction...)."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@lru_cache(maxsize=None)
+def _time_to_minutes(time_str: str) -> Optional[int]:
+    """Convertit "07:45" en 465. Mis en cache : chaque horaire n'est parsé qu'une fois."""
+    if not time_str or ":" not in time_str:
+        return None
+    try:
+        h, m = map(int, time_str.split(':'))
+    except ValueError:
+        return None
+    return h * 60 + m
+
+
+@dataclass(frozen=True, slots=True)
 class Constraint:
     """
     Représente une contrainte fixe pour un employé,
@@ -28,6 +48,9 @@ class Constraint:
     
     # Utilisé si type="HOLIDAY"
     date: Optional[date] = None 
+
+    # Utilisé si type="HOLIDAY" issu d'un VACATION(début,fin) : dernier jour inclus
+    end_date: Optional[date] = None
     
     # Utilisé si type="FIXED_OFF" (0=Lundi, 1=Mardi...)
     weekday: Optional[int] = None
@@ -38,8 +61,12 @@ class Constraint:
     # Utilisé si type="MAX_SHIFTS_PER_QUALIF"
     qualif: Optional[str] = None
 
+    def __post_init__(self):
+        object.__setattr__(self, "type", _intern(self.type))
+        object.__setattr__(self, "qualif", _intern(self.qualif))
+
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Shift:
     """
     Représente un shift unique (une "pièce" du puzzle).
@@ -55,37 +82,142 @@ class Shift:
     duration_minutes: int = field(init=False)
     
     # On garde tags optionnel pour éviter les erreurs si jamais on veut l'utiliser plus tard
-    tags: List[str] = field(default_factory=list)
+    tags: List[str] = field(default_factory=list, compare=False, hash=False)
 
     def __post_init__(self):
         """
         Calcule les minutes automatiquement après la création de l'objet.
         C'est ici qu'on convertit "07:45" en 465 minutes.
         """
-        
-        def _time_to_minutes(time_str: str) -> int:
-            try:
-                if not time_str or ":" not in time_str:
-                    print(f"  [Model] ERREUR: Format d'heure invalide pour shift {self.id}: '{time_str}'")
-                    return 0
-                h, m = map(int, time_str.split(':'))
-                return h * 60 + m
-            except ValueError:
-                print(f"  [Model] ERREUR: Impossible de lire l'heure pour shift {self.id}: '{time_str}'")
-                return 0
+        object.__setattr__(self, "id", _intern(self.id))
 
         # Calcul des minutes (Vital pour utils.calculate_toxic_pairs)
-        self.start_minutes = _time_to_minutes(self.start_time_str)
-        self.end_minutes = _time_to_minutes(self.end_time_str)
+        start_minutes = self._minutes_or_zero(self.start_time_str)
+        end_minutes = self._minutes_or_zero(self.end_time_str)
         
         # Gestion du shift de nuit (qui finit le lendemain)
-        if self.end_minutes < self.start_minutes:
-            self.duration_minutes = (MINUTES_IN_DAY - self.start_minutes) + self.end_minutes
+        if end_minutes < start_minutes:
+            duration_minutes = (MINUTES_IN_DAY - start_minutes) + end_minutes
         else:
-            self.duration_minutes = self.end_minutes - self.start_minutes
+            duration_minutes = end_minutes - start_minutes
+
+        object.__setattr__(self, "start_minutes", start_minutes)
+        object.__setattr__(self, "end_minutes", end_minutes)
+        object.__setattr__(self, "duration_minutes", duration_minutes)
+
+    def _minutes_or_zero(self, time_str: str) -> int:
+        minutes = _time_to_minutes(time_str)
+        if minutes is None:
+            print(f"  [Model] ERREUR: Format d'heure invalide pour shift {self.id}: '{time_str}'")
+            return 0
+        return minutes
+
+
+class HorizonAvailability:
+    """
+    Disponibilités d'un employé compilées sur un horizon de planification.
+    Bit i à 1 = jour d'index i indisponible. Lecture en O(1) par jour.
+    """
+    __slots__ = ("holiday_bits", "fixed_off_bits")
+
+    def __init__(self, holiday_bits: int = 0, fixed_off_bits: int = 0):
+        self.holiday_bits = holiday_bits
+        self.fixed_off_bits = fixed_off_bits
+
+    def is_holiday(self, day_idx: int) -> bool:
+        return bool(self.holiday_bits >> day_idx & 1)
+
+    def is_fixed_off(self, day_idx: int) -> bool:
+        return bool(self.fixed_off_bits >> day_idx & 1)
+
+    def is_off(self, day_idx: int) -> bool:
+        return bool((self.holiday_bits | self.fixed_off_bits) >> day_idx & 1)
+
+    def off_reason(self, day_idx: int) -> Optional[str]:
+        """Retourne "HOLIDAY", "FIXED_OFF" ou None (le congé est prioritaire)."""
+        if self.holiday_bits >> day_idx & 1:
+            return "HOLIDAY"
+        if self.fixed_off_bits >> day_idx & 1:
+            return "FIXED_OFF"
+        return None
 
+    def off_indices(self) -> Iterator[int]:
+        """Itère sur les index des jours indisponibles."""
+        bits = self.holiday_bits | self.fixed_off_bits
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
 
-@dataclass
+
+class AvailabilityCalendar:
+    """
+    Calendrier d'indisponibilités d'un employé, indépendant de l'horizon :
+    - congés (HOLIDAY / VACATION) sous forme d'intervalles d'ordinaux triés et fusionnés
+    - jours fixes (FIXED_OFF / NOT_WEEKEND) sous forme de masque de 7 bits
+    """
+    __slots__ = ("_starts", "_ends", "weekday_mask")
+
+    def __init__(self, holiday_intervals: Iterable[Tuple[int, int]] = (), weekday_mask: int = 0):
+        merged: List[List[int]] = []
+        for start, end in sorted(holiday_intervals):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self._starts = [s for s, _ in merged]
+        self._ends = [e for _, e in merged]
+        self.weekday_mask = weekday_mask
+
+    @classmethod
+    def from_constraints(cls, constraints: Iterable["Constraint"]) -> "AvailabilityCalendar":
+        intervals = []
+        weekday_mask = 0
+        for c in constraints:
+            if c.type == "HOLIDAY" and c.date:
+                end = c.end_date or c.date
+                intervals.append((c.date.toordinal(), end.toordinal()))
+            elif c.type == "FIXED_OFF" and c.weekday is not None:
+                weekday_mask |= 1 << c.weekday
+        return cls(intervals, weekday_mask)
+
+    @property
+    def holiday_intervals(self) -> List[Tuple[date, date]]:
+        return [(date.fromordinal(s), date.fromordinal(e)) for s, e in zip(self._starts, self._ends)]
+
+    def is_holiday(self, day: date) -> bool:
+        i = bisect_right(self._starts, day.toordinal()) - 1
+        return i >= 0 and day.toordinal() <= self._ends[i]
+
+    def is_fixed_off(self, day: date) -> bool:
+        return bool(self.weekday_mask >> day.weekday() & 1)
+
+    def compile(self, date_range: List[date]) -> HorizonAvailability:
+        """Projette le calendrier sur un horizon de jours consécutifs."""
+        if not date_range:
+            return HorizonAvailability()
+        first = date_range[0].toordinal()
+        n = len(date_range)
+
+        holiday_bits = 0
+        i = max(bisect_right(self._starts, first) - 1, 0)
+        while i < len(self._starts) and self._starts[i] < first + n:
+            lo = max(self._starts[i], first) - first
+            hi = min(self._ends[i], first + n - 1) - first
+            if hi >= lo:
+                holiday_bits |= ((1 << (hi - lo + 1)) - 1) << lo
+            i += 1
+
+        fixed_off_bits = 0
+        if self.weekday_mask:
+            first_weekday = date_range[0].weekday()
+            for idx in range(n):
+                if self.weekday_mask >> ((first_weekday + idx) % 7) & 1:
+                    fixed_off_bits |= 1 << idx
+        return HorizonAvailability(holiday_bits, fixed_off_bits)
+
+
+@dataclass(slots=True)
 class Employee:
     """
     Représente un employé, avec ses qualifications DÉJÀ TRADUITES.
@@ -100,16 +232,29 @@ class Employee:
     # La liste des contraintes fixes parsées
     constraints: List[Constraint]
 
+    # Congés et jours fixes compilés (construit depuis constraints si absent)
+    availability: Optional[AvailabilityCalendar] = None
+
+    def __post_init__(self):
+        self.id = _intern(self.id)
+        self.fonctions = {_intern(f) for f in self.fonctions}
+        self.qualifications = {_intern(q) for q in self.qualifications}
+        if self.availability is None:
+            self.availability = AvailabilityCalendar.from_constraints(self.constraints)
+
     def can_do_shift(self, shift_id: str) -> bool:
         """Vérifie si cet employé peut faire un shift donné."""
         return shift_id in self.qualifications
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Need:
     """
     Représente un besoin quotidien pour un shift donné.
     """
     date: date
     shift_id: str
-    count: int
\ No newline at end of file
+    count: int
+
+    def __post_init__(self):
+        object.__setattr__(self, "shift_id", _intern(self.shift_id))
\ No newline at end of file
@@ -0,0 +1,258 @@
+# Fichier: src/needs_reader.py
+
+import json
+import re
+import sys
+from array import array
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from src.models import Need
+from src.needs_templates import expand_needs_with_origins, is_template_document
+
+# Shifts qui ne représentent pas un besoin (absences, formations...)
+IGNORED_SHIFT_IDS = {"HOL", "OFF", "INSI"}
+
+# Formats de date acceptés dans 04_daily_needs.json, dans l'ordre de détection
+DATE_FORMATS = [
+    (re.compile(r"^\d{4}-\d{1,2}-\d{1,2}$"), "%Y-%m-%d"),
+    (re.compile(r"^\d{1,2}/\d{1,2}/\d{2}$"), "%d/%m/%y"),
+    (re.compile(r"^\d{1,2}/\d{1,2}/\d{4}$"), "%d/%m/%Y"),
+]
+
+_WHITESPACE = " \t\r\n"
+
+
+def iter_json_array(file_path: str, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """
+    Lit un fichier contenant un tableau JSON élément par élément, sans jamais
+    charger le tableau complet en mémoire.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def _fill():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        def _skip(chars: str):
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return
+                _fill()
+
+        _fill()
+        _skip(_WHITESPACE)
+        if pos >= len(buffer):
+            return
+        if buffer[pos] != "[":
+            raise ValueError(f"Tableau JSON attendu dans {file_path}")
+        pos += 1
+
+        while True:
+            _skip(_WHITESPACE + ",")
+            if pos >= len(buffer):
+                raise ValueError(f"Tableau JSON non terminé dans {file_path}")
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Élément coupé en fin de tampon : on lit la suite et on réessaie
+                if eof:
+                    raise
+                _fill()
+                continue
+            # Un nombre en fin de tampon peut être tronqué ("12" puis "34")
+            if end >= len(buffer) and not eof:
+                _fill()
+                continue
+            pos = end
+            yield item
+
+
+def detect_date_format(date_str: str) -> Optional[str]:
+    """Retourne le format strptime correspondant à une date, ou None."""
+    for pattern, fmt in DATE_FORMATS:
+        if pattern.match(date_str):
+            return fmt
+    return None
+
+
+class DateParser:
+    """
+    Convertit les chaînes de date en ordinaux. Le format est détecté une seule
+    fois (sur la première date) et chaque chaîne distincte n'est parsée qu'une
+    fois : un an de besoins ne contient que ~365 dates différentes.
+    """
+    __slots__ = ("fmt", "_cache")
+
+    def __init__(self, fmt: Optional[str] = None):
+        self.fmt = fmt
+        self._cache: Dict[str, int] = {}
+
+    def to_ordinal(self, date_str: str) -> Optional[int]:
+        cached = self._cache.get(date_str)
+        if cached is not None:
+            return cached
+        if self.fmt is None:
+            self.fmt = detect_date_format(date_str)
+        ordinal = self._parse(date_str, self.fmt)
+        if ordinal is None:
+            # Fichier mixte : on retombe sur la détection pour cette valeur
+            ordinal = self._parse(date_str, detect_date_format(date_str))
+        if ordinal is not None:
+            self._cache[date_str] = ordinal
+        return ordinal
+
+    @staticmethod
+    def _parse(date_str: str, fmt: Optional[str]) -> Optional[int]:
+        if fmt is None:
+            return None
+        try:
+            if fmt == "%Y-%m-%d" and len(date_str) == 10:
+                return date.fromisoformat(date_str).toordinal()
+            return datetime.strptime(date_str, fmt).date().toordinal()
+        except ValueError:
+            return None
+
+
+class NeedsColumns:
+    """
+    Besoins quotidiens stockés en colonnes compactes (array) au lieu d'un objet
+    Need par ligne. Les identifiants de shift sont dédupliqués dans `shift_ids`
+    et référencés par leur index. `rows` donne la position de chaque besoin
+    dans le fichier source ; pour un document au format compact, c'est l'index
+    dans `origins` du chemin JSON de l'entrée qui l'a produit.
+    """
+    __slots__ = ("shift_ids", "days", "shift_idx", "counts", "rows", "origins", "_shift_lookup")
+
+    def __init__(self):
+        self.shift_ids: List[str] = []
+        self.days = array('l')       # date.toordinal()
+        self.shift_idx = array('l')  # index dans shift_ids
+        self.counts = array('l')
+        self.rows = array('l')       # position de la ligne dans le fichier source (ou index dans origins)
+        self.origins: Optional[List[str]] = None  # Chemins JSON des entrées d'un document compact
+        self._shift_lookup: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def append(self, day_ordinal: int, shift_id: str, count: int, row: int = -1):
+        idx = self._shift_lookup.get(shift_id)
+        if idx is None:
+            idx = len(self.shift_ids)
+            shift_id = sys.intern(shift_id)
+            self._shift_lookup[shift_id] = idx
+            self.shift_ids.append(shift_id)
+        self.days.append(day_ordinal)
+        self.shift_idx.append(idx)
+        self.counts.append(count)
+        self.rows.append(row)
+
+    def shift_id_at(self, i: int) -> str:
+        return self.shift_ids[self.shift_idx[i]]
+
+    def path_at(self, i: int, field: Optional[str] = None) -> str:
+        """
+        Chemin JSON, dans le document source, de l'entrée qui a produit le
+        besoin `i` (suivi de `field` pour une ligne du format plat).
+        """
+        path = f"$[{self.rows[i]}]" if self.origins is None else self.origins[self.rows[i]]
+        # Une ligne du format plat ($[k], $.extra[k]) a des champs ; une entrée de modèle est le nombre lui-même
+        if field and path.endswith("]") and not path.endswith("']"):
+            path += f".{field}"
+        return path
+
+    def date_at(self, i: int) -> date:
+        return date.fromordinal(self.days[i])
+
+    def first_date(self) -> Optional[date]:
+        return date.fromordinal(min(self.days)) if self.days else None
+
+    def last_date(self) -> Optional[date]:
+        return date.fromordinal(max(self.days)) if self.days else None
+
+    def iter_needs(self) -> Iterator[Need]:
+        dates = {}
+        for day, s_idx, count in zip(self.days, self.shift_idx, self.counts):
+            need_date = dates.get(day)
+            if need_date is None:
+                need_date = dates[day] = date.fromordinal(day)
+            yield Need(date=need_date, shift_id=self.shift_ids[s_idx], count=count)
+
+    def to_needs(self) -> List[Need]:
+        """Matérialise les objets Need (uniquement pour la fenêtre lue)."""
+        return list(self.iter_needs())
+
+
+def _starts_with_object(file_path: str) -> bool:
+    """Vrai si le fichier contient un objet JSON (format compact) plutôt qu'un tableau."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        while True:
+            char = f.read(1)
+            if not char or char not in _WHITESPACE:
+                return char == "{"
+
+
+def read_needs(
+    source: Union[str, Iterable[Dict[str, Any]]],
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> NeedsColumns:
+    """
+    Lit les besoins quotidiens en flux et ne conserve que ceux compris dans la
+    fenêtre [start_date, end_date] (bornes incluses, optionnelles).
+
+    `source` est soit le chemin d'un fichier JSON, soit un itérable de
+    dictionnaires {date_str, shift_id, count} déjà en mémoire, soit un
+    document au format compact (src.needs_templates), développé uniquement
+    sur la fenêtre.
+    """
+    if isinstance(source, str) and _starts_with_object(source):
+        with open(source, 'r', encoding='utf-8') as f:
+            source = json.load(f)
+    columns = NeedsColumns()
+    if is_template_document(source):
+        # Un besoin renvoie à l'entrée (modèle, exception...) qui l'a produit, pas à sa position développée
+        columns.origins = []
+        origin_rows: Dict[str, int] = {}
+        def _with_origin_rows(items):
+            for item, origin in items:
+                row = origin_rows.get(origin)
+                if row is None:
+                    row = origin_rows[origin] = len(columns.origins)
+                    columns.origins.append(origin)
+                yield row, item
+        rows_items = _with_origin_rows(expand_needs_with_origins(source, start_date, end_date))
+    else:
+        items = iter_json_array(source) if isinstance(source, str) else source
+        rows_items = enumerate(items)
+    start_ord = start_date.toordinal() if start_date else None
+    end_ord = end_date.toordinal() if end_date else None
+
+    parser = DateParser()
+    for row, item in rows_items:
+        shift_id = item["shift_id"]
+        if shift_id in IGNORED_SHIFT_IDS: continue
+
+        day = parser.to_ordinal(str(item["date_str"]))
+        if day is None:
+            print(f"AVERTISSEMENT: Date inconnue: {item['date_str']}")
+            continue
+        if start_ord is not None and day < start_ord: continue
+        if end_ord is not None and day > end_ord: continue
+
+        columns.append(day, shift_id, int(item["count"]), row)
+    return columns
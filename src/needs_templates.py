@@ -0,0 +1,148 @@
+# Fichier: src/needs_templates.py
+
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Identifiant du format compact de 04_daily_needs.json
+TEMPLATES_FORMAT = "weekly_templates"
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Format compact :
+# {
+#   "format": "weekly_templates",
+#   "start": "2025-12-01", "end": "2025-12-31",
+#   "templates": {"monday": {"A10-GS": 1, ...}, ..., "sunday": {...}},
+#   "exceptions": {"2025-12-14": {"A21L-GS": 1, "A21-GS": 0}},   # 0 = besoin retiré ce jour-là
+#   "extra": [...]   # lignes du format plat dont la date est illisible, conservées telles quelles
+# }
+
+
+def is_template_document(document: Any) -> bool:
+    return isinstance(document, dict) and document.get("format") == TEMPLATES_FORMAT
+
+
+def expand_needs(document: Dict[str, Any], start_date: Optional[date] = None,
+                 end_date: Optional[date] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Génère les besoins {date_str, shift_id, count} du format compact, jour par
+    jour et uniquement sur la fenêtre demandée (intersectée avec l'horizon du
+    document) : rien n'est matérialisé en dehors de la période planifiée.
+    """
+    for item, _ in expand_needs_with_origins(document, start_date, end_date):
+        yield item
+
+
+def expand_needs_with_origins(document: Dict[str, Any], start_date: Optional[date] = None,
+                              end_date: Optional[date] = None) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """
+    Comme expand_needs, avec pour chaque besoin le chemin JSON de l'entrée du
+    document qui le produit : $.templates.<jour>['<shift>'],
+    $.exceptions['<date>']['<shift>'] ou $.extra[k] (une ligne du format plat).
+    """
+    extra = [(item, f"$.extra[{k}]") for k, item in enumerate(document.get("extra", []))]
+    if not document.get("start") or not document.get("end"):
+        yield from extra
+        return
+    first = date.fromisoformat(document["start"]).toordinal()
+    last = date.fromisoformat(document["end"]).toordinal()
+    if start_date:
+        first = max(first, start_date.toordinal())
+    if end_date:
+        last = min(last, end_date.toordinal())
+
+    templates = [document.get("templates", {}).get(weekday, {}) for weekday in WEEKDAYS]
+    exceptions = {}
+    for date_str, overrides in document.get("exceptions", {}).items():
+        day = date.fromisoformat(date_str).toordinal()
+        if first <= day <= last:
+            exceptions[day] = (date_str, overrides)
+
+    for day in range(first, last + 1):
+        current = date.fromordinal(day)
+        weekday = WEEKDAYS[current.weekday()]
+        date_str = current.isoformat()
+        exception_date, overrides = exceptions.get(day, (None, {}))
+        for shift_id, count in {**templates[current.weekday()], **overrides}.items():
+            if count > 0:
+                origin = (f"$.exceptions['{exception_date}']['{shift_id}']" if shift_id in overrides
+                          else f"$.templates.{weekday}['{shift_id}']")
+                yield {"date_str": date_str, "shift_id": shift_id, "count": count}, origin
+
+    yield from extra
+
+
+def to_flat(document: Any) -> List[Dict[str, Any]]:
+    """Format plat (liste) quel que soit le format du document."""
+    if is_template_document(document):
+        return list(expand_needs(document))
+    return list(document or [])
+
+
+def compress_needs(needs: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convertit la liste plate en modèles par jour de semaine + exceptions datées.
+    Pour chaque (jour de semaine, shift), le modèle retient le nombre le plus
+    fréquent sur l'horizon ; seuls les jours qui s'en écartent sont listés.
+    Les doublons (même date, même shift) sont additionnés.
+    """
+    from src.needs_reader import DateParser
+
+    parser = DateParser()
+    cells: Dict[int, Dict[str, int]] = defaultdict(dict)
+    extra = []
+    for need in needs:
+        day = parser.to_ordinal(str(need["date_str"]))
+        if day is None:
+            extra.append(need)
+            continue
+        shift_id = need["shift_id"]
+        cells[day][shift_id] = cells[day].get(shift_id, 0) + int(need["count"])
+
+    document: Dict[str, Any] = {"format": TEMPLATES_FORMAT}
+    if not cells:
+        # Horizon vide : aucun jour à générer
+        document.update({"start": None, "end": None, "templates": {}, "exceptions": {}})
+        if extra:
+            document["extra"] = extra
+        return document
+
+    first, last = min(cells), max(cells)
+    shift_ids = sorted({shift_id for counts in cells.values() for shift_id in counts})
+
+    # 1. Modèle : valeur la plus fréquente par (jour de semaine, shift), 0 compris
+    templates = {}
+    for weekday_idx, weekday in enumerate(WEEKDAYS):
+        days = [day for day in range(first, last + 1) if date.fromordinal(day).weekday() == weekday_idx]
+        template = {}
+        for shift_id in shift_ids:
+            frequencies = Counter(cells.get(day, {}).get(shift_id, 0) for day in days)
+            # À fréquence égale, on préfère 0 : le modèle reste plus court
+            count = max(frequencies, key=lambda c: (frequencies[c], c == 0))
+            if count > 0:
+                template[shift_id] = count
+        templates[weekday] = template
+
+    # 2. Exceptions : écarts au modèle, jour par jour
+    exceptions = {}
+    for day in range(first, last + 1):
+        current = date.fromordinal(day)
+        template = templates[WEEKDAYS[current.weekday()]]
+        actual = cells.get(day, {})
+        overrides = {}
+        for shift_id in set(template) | set(actual):
+            count = actual.get(shift_id, 0)
+            if count != template.get(shift_id, 0):
+                overrides[shift_id] = count
+        if overrides:
+            exceptions[current.isoformat()] = dict(sorted(overrides.items()))
+
+    document.update({
+        "start": date.fromordinal(first).isoformat(),
+        "end": date.fromordinal(last).isoformat(),
+        "templates": templates,
+        "exceptions": exceptions,
+    })
+    if extra:
+        document["extra"] = extra
+    return document
@@ -0,0 +1,132 @@
+# Fichier: src/plan_table.py
+"""
+Planning au format colonnaire (Apache Arrow), écrit à côté de Planning.csv :
+une ligne par (employé, jour), des colonnes typées et les métadonnées de
+l'exécution dans le schéma. Le fichier IPC (.arrow) n'est pas compressé :
+il se relit par memory-map, sans copie ni analyse de texte. Un chemin en
+.parquet produit un fichier Parquet pour les outils BI.
+
+pyarrow est optionnel : sans lui, la sortie colonnaire est simplement ignorée.
+"""
+
+import json
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from src.utils import atomic_output
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # Dépendance optionnelle
+    pa = None
+
+# Colonnes du planning, dans l'ordre du fichier
+COLUMNS = ("employee_id", "employee_name", "date", "shift_id", "status", "function", "minutes")
+# Statut d'un jour travaillé ; les autres statuts sont ceux du planning (OFF, HOLIDAY, FIXED_OFF, ERR_NO_SHIFT)
+STATUS_WORK = "WORK"
+# Clé des métadonnées de l'exécution dans le schéma
+METADATA_KEY = b"planning"
+FORMAT_VERSION = 1
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def plan_columns(result) -> Dict[str, List[Any]]:
+    """
+    Colonnes Python d'un PlanningResult : employés dans l'ordre du planning,
+    jours croissants. Un jour travaillé porte son shift, sa fonction et sa
+    durée ; un jour non travaillé n'a que son statut (minutes = 0).
+    """
+    columns = {name: [] for name in COLUMNS}
+    for name, days in (result.planning or {}).items():
+        employee_id = result.employee_ids.get(name)
+        for date_str in sorted(days):
+            value = days[date_str]
+            detail = result.shift_details.get(value)
+            columns["employee_id"].append(employee_id)
+            columns["employee_name"].append(name)
+            columns["date"].append(date.fromisoformat(date_str))
+            if detail is None:
+                columns["shift_id"].append(None)
+                columns["status"].append(value)
+                columns["function"].append(None)
+                columns["minutes"].append(0)
+            else:
+                columns["shift_id"].append(value)
+                columns["status"].append(STATUS_WORK)
+                columns["function"].append(detail[0])
+                columns["minutes"].append(detail[1])
+    return columns
+
+
+def plan_metadata(result) -> Dict[str, Any]:
+    """Métadonnées de l'exécution : empreinte des entrées, objectif, temps de résolution, période."""
+    report_data = result.report_data or {}
+    dates = [date_str for days in (result.planning or {}).values() for date_str in days]
+    metadata = {
+        "format_version": FORMAT_VERSION,
+        "created_at": time.time(),
+        "status": result.status,
+        "objective": report_data.get("score"),
+        "total_uncovered": report_data.get("total_uncovered"),
+        "start_date": min(dates) if dates else None,
+        "end_date": max(dates) if dates else None,
+    }
+    metadata.update(result.metadata)
+    return metadata
+
+
+def build_table(result):
+    """pyarrow.Table du planning ; les colonnes texte sont encodées en dictionnaire."""
+    columns = plan_columns(result)
+    arrays = [pa.array(columns[name], pa.string()).dictionary_encode()
+              for name in ("employee_id", "employee_name")]
+    arrays.append(pa.array(columns["date"], pa.date32()))
+    arrays += [pa.array(columns[name], pa.string()).dictionary_encode()
+               for name in ("shift_id", "status", "function")]
+    arrays.append(pa.array(columns["minutes"], pa.int32()))
+    metadata = {METADATA_KEY: json.dumps(plan_metadata(result), ensure_ascii=False).encode('utf-8')}
+    return pa.Table.from_arrays(arrays, names=list(COLUMNS), metadata=metadata)
+
+
+def write_plan_table(result, path: str) -> bool:
+    """
+    Écrit le planning colonnaire (.arrow : IPC non compressé, .parquet :
+    Parquet) via un fichier temporaire unique renommé (utils.atomic_output). Retourne False sans pyarrow.
+    """
+    if pa is None:
+        print("  >> pyarrow absent : planning colonnaire non écrit.", flush=True)
+        return False
+    table = build_table(result)
+    with atomic_output(path) as tmp_path:
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            pq.write_table(table, tmp_path)
+        else:
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+    return True
+
+
+def read_plan_table(path: str):
+    """
+    Relit un planning colonnaire. Le fichier .arrow est ouvert par
+    memory-map : les colonnes pointent directement dans le fichier.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow est requis pour lire le planning colonnaire.")
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, memory_map=True)
+    return ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def read_metadata(table) -> Optional[Dict[str, Any]]:
+    """Métadonnées de l'exécution stockées dans le schéma d'une table (None si absentes)."""
+    raw = (table.schema.metadata or {}).get(METADATA_KEY)
+    return json.loads(raw) if raw else None
@@ -0,0 +1,186 @@
+# Fichier: src/planner.py
+
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+import src.capacity as capacity
+import src.reporter as reporter
+import src.utils as utils
+from src.data_loader import DataLoader
+from src.solver import CpSatSolver
+from src.validation import ValidationIssue
+
+# Statuts possibles d'une exécution
+STATUS_OK = "OK"
+STATUS_INVALID_DATA = "INVALID_DATA"
+STATUS_NO_SOLUTION = "NO_SOLUTION"
+STATUS_CANCELLED = "CANCELLED"
+
+
+@dataclass
+class PlanningResult:
+    """
+    Résultat complet d'une exécution du planificateur, en objets Python.
+    `planning` : {nom employé: {"AAAA-MM-JJ": shift_id | "OFF" | "HOLIDAY" | "FIXED_OFF"}}
+    """
+    status: str
+    planning: Optional[Dict[str, Dict[str, str]]] = None
+    report_data: Optional[Dict[str, Any]] = None
+    report_text: Optional[str] = None
+    issues: List[ValidationIssue] = field(default_factory=list)
+    # Pré-calcul de capacité (src.capacity, CapacityReport.to_dict())
+    capacity: Optional[Dict[str, Any]] = None
+    # Règles dures en conflit quand le modèle est infaisable (CpSatSolver.explain_infeasibility)
+    conflict: Optional[Dict[str, Any]] = None
+    # Contexte de la sortie colonnaire (src.plan_table) : id des employés par nom,
+    # (fonction, durée en minutes) par shift, métadonnées de l'exécution
+    employee_ids: Dict[str, str] = field(default_factory=dict)
+    shift_details: Dict[str, Tuple[str, int]] = field(default_factory=dict)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return self.status == STATUS_OK
+
+
+def prepare_data(loader: DataLoader) -> Optional[Dict[str, Any]]:
+    """
+    Étapes [1/6] à [4/6] : chargement, validation, analyse des besoins et
+    pré-calcul des contraintes. Retourne None si les données sont inutilisables.
+    """
+    print("--- [1/6] Démarrage du Planificateur ---", flush=True)
+    all_data = loader.load_all_data()
+
+    print("\n--- [2/6] Vérification des Données ---", flush=True)
+    if not all_data.get('daily_needs'):
+        print("ERREUR: Données manquantes (daily_needs vide).", flush=True)
+        return None
+    print("  SUCCÈS: Données OK.", flush=True)
+
+    print("\n--- [3/6] Analyse des familles et besoins ---", flush=True)
+    print(f"  {len(all_data['employee_families'])} familles d'employés chargées.", flush=True)
+
+    # Calcul des besoins totaux pour info
+    total_needs_per_shift = defaultdict(int)
+    for need in all_data["daily_needs"]:
+        total_needs_per_shift[need.shift_id] += need.count
+    all_data["total_needs_per_shift"] = total_needs_per_shift
+    print(f"  Volume total de shifts demandés : {sum(total_needs_per_shift.values())}", flush=True)
+
+    print("\n--- [4/6] Pré-calcul des contraintes ---", flush=True)
+    # Calcul des 11h de repos et des weekends
+    all_data["toxic_pairs"] = utils.calculate_toxic_pairs(all_data["shifts_map"], all_data["config"]["min_rest_hours"])
+    all_data["weekends"] = utils.get_weekends_in_range(all_data["date_range"])
+    return all_data
+
+
+def run_pipeline(loader: DataLoader, stop_event=None, on_solution=None) -> PlanningResult:
+    """
+    Exécute toute la chaîne (données -> solveur -> rapport) sans rien écrire
+    sur disque. `stop_event` (threading/multiprocessing.Event) permet
+    d'interrompre la recherche CP-SAT, `on_solution` reçoit chaque solution
+    intermédiaire (voir SolutionMonitor).
+    """
+    all_data = prepare_data(loader)
+    if all_data is None:
+        return PlanningResult(status=STATUS_INVALID_DATA, issues=list(loader.issues))
+
+    # Manque garanti, connu avant toute recherche
+    capacity_report = capacity.analyze_capacity(all_data)
+    print(f"  [Capacité] {capacity_report.summary()}", flush=True)
+
+    print("\n--- [5/6] Lancement du Solveur (CpSatSolver) ---", flush=True)
+    solver = CpSatSolver(all_data, all_data["toxic_pairs"])
+    solver.create_model() # Construit le modèle
+    solver.apply_capacity_bounds(capacity_report)
+    planning, report_data = solver.solve(stop_event=stop_event, on_solution=on_solution)
+
+    if stop_event is not None and stop_event.is_set():
+        return PlanningResult(status=STATUS_CANCELLED, planning=planning, report_data=report_data,
+                              issues=list(loader.issues), capacity=capacity_report.to_dict())
+    if not planning:
+        return PlanningResult(status=STATUS_NO_SOLUTION, issues=list(loader.issues),
+                              capacity=capacity_report.to_dict(), conflict=solver.conflict)
+
+    shift_details = {s_id: (solver.shift_to_fonction_map.get(s_id, reporter.DEFAULT_FONCTION), shift.duration_minutes)
+                     for s_id, shift in all_data["shifts_map"].items()}
+    report_text = None
+    if report_data:
+        # Statistiques du rapport en une passe sur la matrice d'affectation
+        report_data.update(reporter.compute_statistics(planning, shift_details, all_data["daily_needs"],
+                                                       all_data["employees"], all_data["employee_families"]))
+        report_data["capacity"] = capacity_report.to_dict()
+        report_text = reporter.generate_text_report(report_data)
+    return PlanningResult(
+        status=STATUS_OK, planning=planning, report_data=report_data,
+        report_text=report_text, issues=list(loader.issues), capacity=capacity_report.to_dict(),
+        employee_ids={e.name: e.id for e in all_data["employees"]},
+        shift_details=shift_details,
+        metadata={"input_hash": loader.input_digest(),
+                  "solve_time_seconds": (report_data or {}).get("solve_time_seconds")},
+    )
+
+
+def solve_from_data(config: Dict, employees: List[Dict], fonctions: Dict, shifts: Dict,
+                    needs: List[Dict], groups: Dict, start_date: Optional[date] = None,
+                    end_date: Optional[date] = None, stop_event=None, on_solution=None) -> PlanningResult:
+    """
+    Point d'entrée bibliothèque : planifie à partir des cinq structures
+    d'entrée et de la configuration, telles qu'elles seraient lues dans
+    data/input/ et config/settings.json.
+    """
+    loader = DataLoader.from_data(config, employees, fonctions, shifts, needs, groups,
+                                  start_date=start_date, end_date=end_date)
+    return run_pipeline(loader, stop_event=stop_event, on_solution=on_solution)
+
+
+def save_outputs(result: PlanningResult, csv_path: Optional[str], report_path: Optional[str] = None,
+                 db_path: Optional[str] = None, table_path: Optional[str] = None,
+                 report_json_path: Optional[str] = None):
+    """
+    Étape [6/6] : écrit Planning.csv (sauf si `csv_path` est None) et
+    Report.txt à partir d'un résultat. Chaque fichier est remplacé d'un bloc
+    (utils.atomic_output).
+    Avec `db_path`, le planning est aussi ajouté à l'historique SQLite ; avec
+    `table_path`, il est aussi écrit au format colonnaire (src.plan_table) ;
+    avec `report_json_path`, le rapport est aussi écrit en JSON structuré.
+    """
+    import pandas as pd
+
+    # 1. Sauvegarde du CSV (Planning.csv)
+    if csv_path:
+        df = pd.DataFrame.from_dict(result.planning, orient='index')
+        # Tri des colonnes par date
+        df = df[sorted(df.columns)]
+        with utils.atomic_output(csv_path) as tmp_path:
+            df.to_csv(tmp_path, index_label="Employee")
+        print(f"  >> Planning sauvegardé : {csv_path}", flush=True)
+
+    # 2. Sauvegarde du Rapport (Report.txt)
+    if report_path and result.report_text:
+        with utils.atomic_output(report_path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(result.report_text)
+        print(f"  >> Rapport sauvegardé  : {report_path}", flush=True)
+
+    # 2 bis. Rapport structuré (Report.json), rendu section par section par l'application web
+    if report_json_path and result.report_data:
+        document = reporter.report_document(result.report_data)
+        document["employee_ids"] = result.employee_ids
+        document["metadata"] = dict(result.metadata, status=result.status, created_at=time.time())
+        utils.write_json_atomic(report_json_path, document)
+        print(f"  >> Rapport JSON        : {report_json_path}", flush=True)
+
+    # 3. Historique des versions (backend SQLite)
+    if db_path:
+        from src.storage import SqliteStore
+        version = SqliteStore(db_path).save_plan(result)
+        print(f"  >> Planning enregistré : version {version} ({db_path})", flush=True)
+
+    # 4. Planning colonnaire typé (Arrow / Parquet), si pyarrow est installé
+    if table_path:
+        from src.plan_table import write_plan_table
+        if write_plan_table(result, table_path):
+            print(f"  >> Planning colonnaire : {table_path}", flush=True)
@@ -1,126 +1,357 @@
 # Fichier: src/reporter.py
-from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Tuple
 
-def generate_text_report(report_data: dict, planning_grid: dict) -> str:
-    """Génère un rapport d'audit détaillé au format texte, avec des tableaux."""
-    
+import numpy as np
+
+# Codes des cases non travaillées dans la matrice d'affectation (les shifts sont >= 0)
+OFF_CODES = {"OFF": -1, "HOLIDAY": -2, "FIXED_OFF": -3}
+NO_SHIFT = -4   # ERR_NO_SHIFT : jour travaillé dont le shift n'a pas été retrouvé
+NO_CELL = -5    # Jour absent de la ligne de l'employé
+DEFAULT_FONCTION = "AUTRE"
+
+
+class AssignmentMatrix:
+    """
+    Le planning en une matrice entière employés x jours : chaque case contient
+    l'indice du shift dans `shift_ids`, ou un code négatif (OFF_CODES, NO_SHIFT,
+    NO_CELL). Toutes les statistiques du rapport sont calculées sur elle.
+    """
+
+    def __init__(self, planning: Dict[str, Dict[str, str]], shift_ids: Iterable[str]):
+        self.names = list(planning)
+        self.dates = sorted({date_str for days in planning.values() for date_str in days})
+        self.shift_ids = list(dict.fromkeys(shift_ids))
+        codes = {s_id: idx for idx, s_id in enumerate(self.shift_ids)}
+        codes.update(OFF_CODES)
+        codes["ERR_NO_SHIFT"] = NO_SHIFT
+        day_index = {date_str: d for d, date_str in enumerate(self.dates)}
+
+        self.matrix = np.full((len(self.names), len(self.dates)), NO_CELL, dtype=np.int32)
+        for e, days in enumerate(planning.values()):
+            cells = []
+            for value in days.values():
+                code = codes.get(value)
+                if code is None:  # Shift absent du référentiel : ajouté en fin d'index
+                    code = codes[value] = len(self.shift_ids)
+                    self.shift_ids.append(value)
+                cells.append(code)
+            self.matrix[e, [day_index[date_str] for date_str in days]] = cells
+
+    @property
+    def worked(self) -> np.ndarray:
+        return self.matrix >= 0
+
+    @property
+    def off(self) -> np.ndarray:
+        return (self.matrix < 0) & (self.matrix > NO_SHIFT)
+
+    def shift_counts(self) -> np.ndarray:
+        """Matrice employés x shifts : nombre de jours de chaque shift."""
+        n_emp, n_shifts = len(self.names), len(self.shift_ids)
+        rows, days = np.nonzero(self.worked)
+        flat = np.bincount(rows * n_shifts + self.matrix[rows, days], minlength=n_emp * n_shifts)
+        return flat.reshape(n_emp, n_shifts)
+
+    def coverage(self) -> np.ndarray:
+        """Matrice jours x shifts : nombre d'agents affectés."""
+        n_days, n_shifts = len(self.dates), len(self.shift_ids)
+        rows, days = np.nonzero(self.worked)
+        flat = np.bincount(days * n_shifts + self.matrix[rows, days], minlength=n_days * n_shifts)
+        return flat.reshape(n_days, n_shifts)
+
+
+def _spread(values: np.ndarray) -> Tuple[float, float]:
+    return (values.min().item(), values.max().item()) if values.size else (0, 0)
+
+
+def compute_statistics(planning: Dict[str, Dict[str, str]], shift_details: Dict[str, Tuple[str, int]],
+                       needs: Iterable[Any], employees: List[Any],
+                       families: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """
+    Calcule en une passe NumPy toutes les statistiques du rapport :
+    détail par employé (jours OFF, heures, shifts et fonctions), couverture
+    par (jour, shift) face aux besoins, écarts d'équité par famille, par
+    fonction et par qualification. `shift_details` : {shift: (fonction,
+    minutes)}, `needs` : objets Need, `employees` / `families` : objets
+    Employee. Le résultat ne contient que des types JSON.
+    """
+    needs = list(needs)
+    grid = AssignmentMatrix(planning, list(shift_details) + [need.shift_id for need in needs])
+    n_shifts = len(grid.shift_ids)
+    minutes = np.array([shift_details.get(s_id, (None, 0))[1] for s_id in grid.shift_ids], dtype=np.int64)
+    fonctions = list(dict.fromkeys(shift_details.get(s_id, (DEFAULT_FONCTION, 0))[0] for s_id in grid.shift_ids))
+    fonction_of_shift = np.array([fonctions.index(shift_details.get(s_id, (DEFAULT_FONCTION, 0))[0])
+                                  for s_id in grid.shift_ids], dtype=np.int64)
+    # Shift -> fonction en matrice 0/1, pour passer des comptes par shift aux comptes par fonction
+    to_fonction = np.zeros((n_shifts, len(fonctions)), dtype=np.int64)
+    to_fonction[np.arange(n_shifts), fonction_of_shift] = 1
+
+    counts = grid.shift_counts()                 # employés x shifts
+    fonction_counts = counts @ to_fonction       # employés x fonctions
+    days_off = grid.off.sum(axis=1)
+    days_work = len(grid.dates) - days_off
+    total_minutes = counts @ minutes
+    total_hours = np.round(total_minutes / 60, 1)
+
+    # --- Détail par employé ---
+    employees_details = {}
+    for e, name in enumerate(grid.names):
+        shift_cols = np.flatnonzero(counts[e])
+        fonction_cols = np.flatnonzero(fonction_counts[e])
+        employees_details[name] = {
+            "name": name, "days_off": int(days_off[e]), "days_work": int(days_work[e]),
+            "total_hours": float(total_hours[e]),
+            "shifts_breakdown": {grid.shift_ids[s]: int(counts[e, s]) for s in shift_cols},
+            "fonctions_breakdown": {fonctions[f]: int(fonction_counts[e, f]) for f in fonction_cols},
+        }
+
+    # --- Statistiques globales ---
+    stats = {"avg_off": 0, "min_off": 0, "min_off_agent": "", "nb_no_weekend": 0}
+    if grid.names:
+        # Ex-aequo départagés par nom, comme un tri de (jours OFF, nom)
+        first = min(range(len(grid.names)), key=lambda e: (days_off[e], grid.names[e]))
+        stats.update(avg_off=float(days_off.mean()), min_off=int(days_off[first]),
+                     min_off_agent=grid.names[first])
+        saturdays = [d for d, date_str in enumerate(grid.dates[:-1])
+                     if date.fromisoformat(date_str).weekday() == 5
+                     and date.fromisoformat(grid.dates[d + 1]).weekday() == 6]
+        if saturdays:
+            saturdays = np.array(saturdays)
+            weekend_off = grid.off[:, saturdays] & grid.off[:, saturdays + 1]
+            stats["nb_no_weekend"] = int((~weekend_off.any(axis=1)).sum())
+
+    # --- Couverture par (jour, shift) face aux besoins ---
+    assigned = grid.coverage()
+    needed = np.zeros_like(assigned)
+    day_index = {date_str: d for d, date_str in enumerate(grid.dates)}
+    shift_index = {s_id: s for s, s_id in enumerate(grid.shift_ids)}
+    for need in needs:
+        d = day_index.get(need.date.isoformat())
+        if d is not None:
+            needed[d, shift_index[need.shift_id]] += need.count
+    missing = np.maximum(needed - assigned, 0)
+    coverage = []
+    for d, date_str in enumerate(grid.dates):
+        cols = np.flatnonzero(assigned[d] | needed[d])
+        coverage.append({
+            "date": date_str,
+            "shifts": {grid.shift_ids[s]: {"assigned": int(assigned[d, s]), "needed": int(needed[d, s])}
+                       for s in cols},
+            "missing": int(missing[d].sum()),
+        })
+
+    # --- Équité par famille (écarts d'heures et de jours OFF) ---
+    row_of = {name: e for e, name in enumerate(grid.names)}
+    family_equity = {}
+    for group_name, members in families.items():
+        rows = np.array([row_of[emp.name] for emp in members if emp.name in row_of], dtype=np.int64)
+        min_h, max_h = _spread(total_hours[rows])
+        min_o, max_o = _spread(days_off[rows])
+        family_equity[group_name] = {
+            "members": [grid.names[e] for e in rows],
+            "min_hours": min_h, "max_hours": max_h, "hours_gap": round(max_h - min_h, 1),
+            "min_off": min_o, "max_off": max_o, "off_gap": max_o - min_o,
+        }
+
+    # --- Équité par fonction (agents de la fonction) et par qualification (agents qualifiés) ---
+    rows_of_employees = [(row_of[emp.name], emp) for emp in employees if emp.name in row_of]
+    fonction_equity = {}
+    for f, fonction in enumerate(fonctions):
+        rows = [e for e, emp in rows_of_employees if fonction in emp.fonctions]
+        if len(rows) < 2:
+            continue
+        values = fonction_counts[rows, f]
+        fonction_equity[fonction] = {
+            "min": int(values.min()), "max": int(values.max()), "gap": int(values.max() - values.min()),
+            "detail": [{"name": grid.names[e], "count": int(c)} for e, c in zip(rows, values)],
+        }
+
+    qualified = np.zeros((len(grid.names), n_shifts), dtype=bool)
+    for e, emp in rows_of_employees:
+        qualified[e, [shift_index[s_id] for s_id in emp.qualifications if s_id in shift_index]] = True
+    qualif_equity_report = {}
+    for s in np.flatnonzero(qualified.sum(axis=0) >= 2):  # Shifts partagés par au moins deux agents
+        rows = np.flatnonzero(qualified[:, s])
+        qualif_equity_report[grid.shift_ids[s]] = [
+            {"name": grid.names[e], "count": int(counts[e, s])} for e in rows
+        ]
+
+    return {
+        "employees_details": employees_details,
+        "stats": stats,
+        "coverage": coverage,
+        "total_assigned": int(assigned.sum()),
+        "total_needed": int(needed.sum()),
+        "family_equity": family_equity,
+        "fonction_equity": fonction_equity,
+        "qualif_equity_report": qualif_equity_report,
+    }
+
+
+def report_document(report_data: dict) -> Dict[str, Any]:
+    """Version JSON du rapport, construite sur les mêmes statistiques que le texte."""
+    keys = ("score", "total_uncovered", "solve_time_seconds", "penalties", "stats", "employees_details",
+            "coverage", "total_assigned", "total_needed", "family_equity", "fonction_equity",
+            "qualif_equity_report", "capacity", "penalty_totals")
+    return {key: report_data[key] for key in keys if key in report_data}
+
+
+# --- RENDU TEXTE PAR SECTION ---
+# Chaque section se rend seule, éventuellement restreinte à un ensemble
+# d'agents (`agents` : noms, None = tous) et à une famille (`group`, pour les
+# pénalités de groupe). Les sections [2] et [5] portent sur tout le planning
+# et ignorent ces filtres.
+
+def _equity_rows(label, detail, agents):
+    """Ligne du tableau d'équité pour une liste [{'name', 'count'}], ou None si l'écart est faible."""
+    detail = [s for s in detail if agents is None or s['name'] in agents]
+    counts = [s['count'] for s in detail]
+    if not counts:
+        return None
+    min_c, max_c = min(counts), max(counts)
+    gap = max_c - min_c
+    if gap <= 1: # N'affiche que les écarts significatifs
+        return None
+    detail_str = ", ".join([f"{s['name'].split(' ')[0]}:{s['count']}" for s in detail])
+    return f"| {label:<12} | {min_c:<3} | {max_c:<3} | {gap:<4} | {detail_str} |"
+
+
+def _penalties_section(report_data, agents, group):
     lines = []
-    lines.append("=========================================================================")
-    lines.append("                       RAPPORT DE PLANIFICATION                      ")
-    lines.append("=========================================================================")
-    lines.append(f"SCORE DE PÉNALITÉ TOTAL : {int(report_data.get('score', 0))}")
-    lines.append(f"SHIFTS NON COUVERTS     : {report_data.get('total_uncovered', 0)}")
-    lines.append("")
-    
-    # --- Section 1 : Pénalités Actives ---
-    lines.append("--- [1] ANALYSE DES PÉNALITÉS (Violations des règles molles) ---")
     penalties = report_data.get('penalties', [])
+    if agents is not None:
+        # Pénalités des agents retenus, et celles de leur famille ("GROUPE") si elle est filtrée
+        penalties = [p for p in penalties
+                     if p['agent'] in agents or (group and p['agent'] == "GROUPE" and group in p['reason'])]
     if not penalties:
         lines.append("  Aucune pénalité majeure détectée. Planning parfait.")
     else:
         sorted_penalties = sorted(penalties, key=lambda x: (x['agent'], x['cost']))
         for p in sorted_penalties:
             lines.append(f"  [COÛT {p['cost']}] {p['agent']} : {p['reason']}")
-    lines.append("")
+    return lines
+
 
-    # --- Section 2 : Statistiques Globales ---
-    lines.append("--- [2] STATISTIQUES RH GLOBALES ---")
+def _stats_section(report_data, agents, group):
     stats = report_data.get('stats', {})
-    lines.append(f"  Moyenne Jours OFF : {stats.get('avg_off', 0):.1f}")
-    lines.append(f"  Min Jours OFF     : {stats.get('min_off', 0)} (Employé: {stats.get('min_off_agent', 'N/A')})")
-    lines.append(f"  Agents sans Weekend : {stats.get('nb_no_weekend', 0)}")
-    lines.append("")
+    return [
+        f"  Moyenne Jours OFF : {stats.get('avg_off', 0):.1f}",
+        f"  Min Jours OFF     : {stats.get('min_off', 0)} (Employé: {stats.get('min_off_agent', 'N/A')})",
+        f"  Agents sans Weekend : {stats.get('nb_no_weekend', 0)}",
+    ]
 
-    # --- NOUVELLE SECTION 3: AUDIT D'ÉQUITÉ PROPORTIONNELLE ---
-    lines.append("--- [3] AUDIT D'ÉQUITÉ PAR QUALIFICATION (Shifts partagés) ---")
+
+def _equity_section(report_data, agents, group):
+    lines = []
     qualif_report = report_data.get('qualif_equity_report', {})
     if not qualif_report:
         lines.append("  Aucune qualification partagée n'a été analysée.")
     else:
         lines.append(f"| {'QUALIFICATION':<12} | {'MIN':<3} | {'MAX':<3} | {'ÉCART':<4} | DÉTAIL (Agent:Nb) |")
         lines.append(f"|:{'-'*12}-|:{'-'*3}-|:{'-'*3}-|:{'-'*4}-|:------------------|")
-        
         for s_id, q_stats in sorted(qualif_report.items()):
-            counts = [s['count'] for s in q_stats]
-            if not counts: continue
-            min_c, max_c = min(counts), max(counts)
-            gap = max_c - min_c
-            
-            if gap > 1: # N'affiche que les écarts significatifs
-                detail_str = ", ".join([f"{s['name'].split(' ')[0]}:{s['count']}" for s in q_stats])
-                lines.append(f"| {s_id:<12} | {min_c:<3} | {max_c:<3} | {gap:<4} | {detail_str} |")
-    lines.append("")
+            row = _equity_rows(s_id, q_stats, agents)
+            if row:
+                lines.append(row)
+
+    fonction_report = report_data.get('fonction_equity', {})
+    if fonction_report:
+        lines.append("")
+        lines.append(f"| {'FONCTION':<12} | {'MIN':<3} | {'MAX':<3} | {'ÉCART':<4} | DÉTAIL (Agent:Nb) |")
+        lines.append(f"|:{'-'*12}-|:{'-'*3}-|:{'-'*3}-|:{'-'*4}-|:------------------|")
+        for fonction, f_stats in sorted(fonction_report.items()):
+            row = _equity_rows(fonction, f_stats['detail'], agents)
+            if row:
+                lines.append(row)
+    return lines
+
 
-    # --- NOUVELLE SECTION 4: DÉTAIL PAR FAMILLE MÉTIER ---
-    lines.append("--- [4] DÉTAIL PAR EMPLOYÉ (Regroupé par Famille Métier) ---")
-    
+def _employees_section(report_data, agents, group):
+    lines = []
     emp_details = report_data.get('employees_details', {})
-    agents_in_families = set()
-    
+
     header = f"| {'GROUPE':<17} | {'NOM DE L\'AGENT':<25} | {'OFF':<3} | {'TRAVAIL':<7} | {'HEURES':<6} | {'COMPTE PAR FONCTION'} |"
     lines.append(header)
     lines.append(f"|:{'-'*17}-|:{'-'*25}-|:{'-'*3}-|:{'-'*7}-|:{'-'*6}-|:------------------------|")
 
-    families_report = report_data.get('families_report', {})
-    
-    # Itérer sur le dictionnaire de familles (qui est maintenant ordonné)
-    for group_name, family_group in families_report.items():
-        if not family_group: continue
-        
-        lines.append(f"|{'-'*17} | {'-'*25} | {'-'*3} | {'-'*7} | {'-'*6} | {'-'*24} |")
+    # Familles dans l'ordre du rapport, écarts déjà calculés par compute_statistics
+    for group_name, family in report_data.get('family_equity', {}).items():
+        members = [name for name in family['members'] if agents is None or name in agents]
+        if not members: continue
 
-        # Calculer les écarts pour cette famille
-        family_hours = [emp_details.get(e.name, {}).get('total_hours', 0) for e in family_group]
-        family_off = [emp_details.get(e.name, {}).get('days_off', 0) for e in family_group]
-        
-        min_h, max_h = (min(family_hours), max(family_hours)) if family_hours else (0, 0)
-        min_o, max_o = (min(family_off), max(family_off)) if family_off else (0, 0)
-        
-        lines.append(f"| {group_name:<17} | {'(ÉQUITÉ GROUPE)':<25} | {max_o - min_o:<3}j | {'':<7} | {max_h - min_h:<6.1f}h | (Écarts Heures/Jours OFF) |")
+        lines.append(f"|{'-'*17} | {'-'*25} | {'-'*3} | {'-'*7} | {'-'*6} | {'-'*24} |")
+        lines.append(f"| {group_name:<17} | {'(ÉQUITÉ GROUPE)':<25} | {family['off_gap']:<3}j | {'':<7} | {family['hours_gap']:<6.1f}h | (Écarts Heures/Jours OFF) |")
         lines.append(f"|{'-'*17} | {'-'*25} | {'-'*3} | {'-'*7} | {'-'*6} | {'-'*24} |")
 
-        for agent in sorted(family_group, key=lambda x: x.name):
-            agent_name = agent.name
+        for agent_name in sorted(members):
             details = emp_details.get(agent_name)
             if not details: continue
-            
-            agents_in_families.add(agent_name)
-            
+
             fonc_str = ", ".join([f"{k}:{v}" for k, v in sorted(details["fonctions_breakdown"].items())])
-            
+
             lines.append(
                 f"| {'':<17} | {details['name']:<25} | "
                 f"{details['days_off']:<3} | {details['days_work']:<7} | "
                 f"{details['total_hours']:<6.1f} | {fonc_str} |"
             )
+    return lines
 
-    # Note: Les agents "Autres" seront affichés ici
-    
-    lines.append("")
 
-    # --- Section 5 : Résumé Journalier ---
-    lines.append("--- [5] RÉSUMÉ DE LA COUVERTURE JOURNALIÈRE (Shifts Assignés) ---")
-    if not planning_grid:
+def _coverage_section(report_data, agents, group):
+    lines = []
+    coverage = report_data.get('coverage')
+    if not coverage:
         lines.append("  Données du planning non disponibles pour l'audit journalier.")
-    else:
-        daily_totals = defaultdict(lambda: defaultdict(int))
-        all_dates = sorted(next(iter(planning_grid.values())).keys())
-        
-        for emp_name, schedule in planning_grid.items():
-            for date_str, assignment in schedule.items():
-                if assignment not in ['OFF', 'HOLIDAY', 'FIXED_OFF', 'ERR_NO_SHIFT']:
-                    daily_totals[date_str][assignment] += 1
-                                
-        for date_str in all_dates:
-            totals_for_day = daily_totals[date_str]
-            if not totals_for_day:
-                lines.append(f"  {date_str} : (Aucun shift assigné)")
-                continue
-            
-            summary_list = [f"{count}x {shift}" for shift, count in sorted(totals_for_day.items())]
-            lines.append(f"  {date_str} : {', '.join(summary_list)}")
-            
+        return lines
+    for day in coverage:
+        assigned = [(shift, c['assigned']) for shift, c in sorted(day['shifts'].items()) if c['assigned']]
+        if not assigned:
+            line = f"  {day['date']} : (Aucun shift assigné)"
+        else:
+            line = f"  {day['date']} : {', '.join(f'{count}x {shift}' for shift, count in assigned)}"
+        if day['missing']:
+            short = [f"{c['needed'] - c['assigned']}x {shift}" for shift, c in sorted(day['shifts'].items())
+                     if c['needed'] > c['assigned']]
+            line += f" | MANQUE : {', '.join(short)}"
+        lines.append(line)
+    return lines
+
+
+# Sections du rapport, dans l'ordre : id -> (titre, rendu)
+SECTIONS = {
+    "penalties": ("[1] ANALYSE DES PÉNALITÉS (Violations des règles molles)", _penalties_section),
+    "stats": ("[2] STATISTIQUES RH GLOBALES", _stats_section),
+    "equity": ("[3] AUDIT D'ÉQUITÉ PAR QUALIFICATION (Shifts partagés)", _equity_section),
+    "employees": ("[4] DÉTAIL PAR EMPLOYÉ (Regroupé par Famille Métier)", _employees_section),
+    "coverage": ("[5] RÉSUMÉ DE LA COUVERTURE JOURNALIÈRE (Shifts Assignés)", _coverage_section),
+}
+
+
+def render_section(report_data: dict, section: str, agents=None, group=None) -> str:
+    """Rend une seule section du rapport texte, restreinte à `agents` (noms) et à `group` si fournis."""
+    title, render = SECTIONS[section]
+    return "\n".join([f"--- {title} ---"] + render(report_data, agents, group))
+
+
+def generate_text_report(report_data: dict) -> str:
+    """Génère un rapport d'audit détaillé au format texte, avec des tableaux."""
+
+    lines = []
+    lines.append("=========================================================================")
+    lines.append("                       RAPPORT DE PLANIFICATION                      ")
+    lines.append("=========================================================================")
+    lines.append(f"SCORE DE PÉNALITÉ TOTAL : {int(report_data.get('score', 0))}")
+    lines.append(f"SHIFTS NON COUVERTS     : {report_data.get('total_uncovered', 0)}")
+    capacity = report_data.get('capacity')
+    if capacity:
+        lines.append(f"MANQUE MINIMUM GARANTI  : {capacity['min_shortfall']} (pré-calcul de capacité)")
     lines.append("")
+
+    for section in SECTIONS:
+        lines.append(render_section(report_data, section))
+        lines.append("")
+
     lines.append("=========================================================================")
-    
-    return "\n".join(lines)
\ No newline at end of file
+
+    return "\n".join(lines)
@@ -0,0 +1,336 @@
+# Fichier: src/scenarios.py
+"""
+Balayage de scénarios de pondération : plusieurs jeux de pénalités (et de
+paramètres de settings.json) résolus en parallèle, avec un budget court par
+scénario, puis comparés sur la couverture, les weekends, les jours OFF et
+l'équité.
+
+Le modèle CP-SAT est construit une fois par version des données et des
+paramètres structurels (tout sauf `penalties` et le budget) : chaque
+scénario ne fait que repondérer l'objectif (CpSatSolver.set_objective).
+Les processus du pool héritent du modèle déjà construit (fork) ; sans fork,
+chaque processus le reconstruit une fois à son démarrage.
+"""
+
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import src.capacity as capacity
+import src.utils as utils
+from src.solver import CpSatSolver
+from src.utils import DEFAULT_PENALTIES, penalty_weight
+
+# Clés d'un scénario qui ne changent pas la structure du modèle
+NON_STRUCTURAL_KEYS = ("name", "penalties", "solver_time_limit_seconds")
+
+# Indicateurs comparés (à minimiser) : (clé, en-tête, pénalité de settings.json mesurée)
+METRICS = (
+    ("uncovered", "Manques", "PER_MISSING_NEED_UNIT"),
+    ("no_weekend", "Sans WE", "NO_WEEKEND_GUARANTEED"),
+    ("missing_off_days", "OFF manq.", "PER_DAY_OFF_MISSING"),
+    ("work_days_gap", "Écart jours", "PENALTY_INTRA_GROUP_WORK_DAYS_EQUITY_GAP"),
+    ("qualif_gap", "Écart qualif", "PENALTY_INTRA_GROUP_SHIFT_EQUITY_GAP"),
+    ("consecutive", "Consécutifs", "PER_CONSECUTIVE_WORK_DAY_VIOLATION"),
+    ("isolated_off", "OFF isolés", "PENALTY_ISOLATED_DAY_OFF"),
+)
+
+# Indicateurs servant au front de Pareto
+PARETO_METRICS = ("uncovered", "no_weekend", "missing_off_days", "work_days_gap", "qualif_gap")
+
+
+@dataclass
+class Scenario:
+    name: str
+    penalties: Dict[str, int] = field(default_factory=dict)  # Poids remplacés
+    overrides: Dict[str, Any] = field(default_factory=dict)  # Autres clés de settings.json remplacées
+    time_limit: Optional[float] = None  # Budget propre, sinon celui du balayage
+
+
+@dataclass
+class ScenarioResult:
+    scenario: Scenario
+    status: str  # Statut CP-SAT ("OPTIMAL", "FEASIBLE", "INFEASIBLE", "UNKNOWN")
+    score: Optional[float] = None  # Objectif avec les poids du scénario
+    reference_score: Optional[int] = None  # Même planning, poids de settings.json : comparable entre scénarios
+    metrics: Dict[str, Optional[int]] = field(default_factory=dict)
+    solve_time_seconds: Optional[float] = None
+    pareto: bool = False
+
+    @property
+    def solved(self) -> bool:
+        return self.status in ("OPTIMAL", "FEASIBLE")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.scenario.name,
+            "penalties": self.scenario.penalties,
+            "overrides": self.scenario.overrides,
+            "status": self.status,
+            "score": self.score,
+            "reference_score": self.reference_score,
+            "metrics": self.metrics,
+            "solve_time_seconds": self.solve_time_seconds,
+            "pareto": self.pareto,
+        }
+
+
+def load_scenarios(spec: Any, config: Dict) -> List[Scenario]:
+    """
+    Scénarios d'un document JSON : une liste de scénarios, ou un objet avec
+    "scenarios" (liste) et/ou "grid" (produit cartésien). Un scénario est
+    {"name": ..., "penalties": {...}, <clé de settings.json>: valeur...} ;
+    une grille est {clé: [valeurs]}, où une clé de pénalité remplace un poids
+    et toute autre clé un paramètre de settings.json. ValueError sur une clé
+    qui n'est ni une pénalité connue ni un paramètre de settings.json.
+    """
+    if isinstance(spec, list):
+        spec = {"scenarios": spec}
+    scenarios = []
+    for i, item in enumerate(spec.get("scenarios", []), 1):
+        overrides = {key: value for key, value in item.items() if key not in NON_STRUCTURAL_KEYS}
+        where = f"scénario '{item.get('name', f'S{i}')}'"
+        _check_keys(item.get("penalties", {}), utils.known_penalties(config), f"{where} (penalties)")
+        _check_keys(overrides, _settings_keys(config), where)
+        scenarios.append(Scenario(name=item.get("name", f"S{i}"), penalties=dict(item.get("penalties", {})),
+                                  overrides=overrides, time_limit=item.get("solver_time_limit_seconds")))
+    scenarios.extend(expand_grid(spec.get("grid", {}), config))
+    return scenarios
+
+
+def expand_grid(grid: Dict[str, List[Any]], config: Dict) -> List[Scenario]:
+    """
+    Un scénario par combinaison de valeurs de la grille, nommé d'après ses
+    valeurs. ValueError sur une clé inconnue (voir load_scenarios).
+    """
+    if not grid:
+        return []
+    penalty_keys = utils.known_penalties(config)
+    _check_keys(grid, penalty_keys | _settings_keys(config), "grille")
+    keys = list(grid)
+    scenarios = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        scenario = Scenario(name=", ".join(f"{key}={value}" for key, value in zip(keys, values)))
+        for key, value in zip(keys, values):
+            if key in penalty_keys:
+                scenario.penalties[key] = value
+            else:
+                scenario.overrides[key] = value
+        scenarios.append(scenario)
+    return scenarios
+
+
+def _settings_keys(config: Dict) -> set:
+    """Paramètres de settings.json qu'un scénario peut remplacer."""
+    return set(config) - set(NON_STRUCTURAL_KEYS)
+
+
+def _check_keys(keys, allowed: set, where: str):
+    """ValueError si une clé de `keys` n'est pas dans `allowed` : une faute de frappe ne doit pas passer inaperçue."""
+    unknown = sorted(set(keys) - allowed)
+    if unknown:
+        raise ValueError(f"{where} : clé(s) inconnue(s) {', '.join(unknown)} "
+                         "(ni pénalité connue ni paramètre de settings.json).")
+
+
+def scenario_config(config: Dict, scenario: Scenario) -> Dict:
+    """settings.json vu par un scénario."""
+    merged = dict(config, **scenario.overrides)
+    merged["penalties"] = dict(config["penalties"], **scenario.penalties)
+    return merged
+
+
+def scenario_data(all_data: Dict[str, Any], config: Dict) -> Dict[str, Any]:
+    """Données préparées (planner.prepare_data) pour une autre configuration, sans les recharger."""
+    data = dict(all_data, config=config)
+    if config["min_rest_hours"] != all_data["config"]["min_rest_hours"]:
+        data["toxic_pairs"] = utils.calculate_toxic_pairs(data["shifts_map"], config["min_rest_hours"])
+    return data
+
+
+def build_solver(data: Dict[str, Any], capacity_report: Optional[capacity.CapacityReport] = None) -> CpSatSolver:
+    """Modèle complet (contraintes, objectif, bornes de capacité), prêt à être résolu ou repondéré."""
+    solver = CpSatSolver(data, data["toxic_pairs"])
+    solver.create_model()
+    if capacity_report is not None:
+        solver.apply_capacity_bounds(capacity_report)
+    return solver
+
+
+def metrics_from_totals(penalty_totals: Dict[str, int]) -> Dict[str, Optional[int]]:
+    """Indicateurs d'un planning ; None si la pénalité correspondante n'a pas de termes dans le modèle."""
+    return {metric: penalty_totals.get(key) for metric, _, key in METRICS}
+
+
+# --- POOL DE PROCESSUS ---
+# Le modèle du processus courant : hérité du parent (fork) ou construit par _init_worker
+_worker_solver = None
+
+
+# Sortie muette du processus courant, ouverte une fois pour toute sa durée
+_devnull = None
+
+
+def silence_output():
+    """
+    Initialisation d'un processus du pool : les journaux (chargement, modèle,
+    solutions) de plusieurs résolutions s'entremêleraient. Les journaux
+    natifs de CP-SAT restent coupés (log_search_progress, désactivé par défaut).
+    """
+    global _devnull
+    if _devnull is None:
+        _devnull = open(os.devnull, 'w')
+    sys.stdout = sys.stderr = _devnull
+
+
+def _init_worker(solver, data, capacity_report):
+    global _worker_solver
+    silence_output()
+    _worker_solver = solver if solver is not None else build_solver(data, capacity_report)
+
+
+def _solve_weights(penalties: Dict[str, int], time_limit: float, num_workers: int):
+    """Tâche d'un processus : repondère le modèle hérité et le résout."""
+    _worker_solver.set_objective(penalties)
+    _, report_data = _worker_solver.solve(time_limit=time_limit, num_workers=num_workers, explain=False)
+    return _worker_solver.status, report_data
+
+
+def pool_size(tasks: int, max_workers: Optional[int] = None) -> int:
+    return max(1, min(tasks, max_workers or os.cpu_count() or 1))
+
+
+def solver_threads(processes: int) -> int:
+    """Threads CP-SAT par scénario, pour que le pool n'excède pas le nombre de cœurs."""
+    return max(1, (os.cpu_count() or 1) // processes)
+
+
+def process_pool(processes: int, initializer, initargs_fork, initargs_spawn) -> ProcessPoolExecutor:
+    """
+    Pool de `processes` processus. Avec fork, `initargs_fork` est transmis
+    sans copie ni sérialisation (un CpModel n'est pas sérialisable) ; sinon
+    `initargs_spawn` doit permettre de reconstruire l'état du processus.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        context, initargs = multiprocessing.get_context("fork"), initargs_fork
+    else:
+        context, initargs = multiprocessing.get_context("spawn"), initargs_spawn
+    return ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=initializer, initargs=initargs)
+
+
+def run_sweep(all_data: Dict[str, Any], scenarios: List[Scenario], time_limit: float,
+              max_workers: Optional[int] = None) -> List[ScenarioResult]:
+    """
+    Résout tous les scénarios sur les données préparées `all_data`, en
+    parallèle, avec `time_limit` secondes chacun (sauf budget propre), et
+    marque le front de Pareto. Les résultats suivent l'ordre des scénarios.
+    """
+    base_config = all_data["config"]
+    reference = base_config["penalties"]
+
+    # Un modèle par jeu de paramètres structurels
+    versions: Dict[str, List[int]] = {}
+    for i, scenario in enumerate(scenarios):
+        versions.setdefault(json.dumps(scenario.overrides, sort_keys=True), []).append(i)
+
+    results: List[Optional[ScenarioResult]] = [None] * len(scenarios)
+    for indexes in versions.values():
+        members = [scenarios[i] for i in indexes]
+        config = scenario_config(base_config, Scenario("", overrides=members[0].overrides))
+        # Une pénalité n'a de termes que si son poids est non nul à la construction :
+        # on construit avec le plus grand poids de chaque pénalité sur ces scénarios
+        weights = [scenario_config(base_config, s)["penalties"] for s in members]
+        config["penalties"] = {key: max(penalty_weight(w, key) for w in weights)
+                               for key in set(DEFAULT_PENALTIES).union(*weights)}
+        data = scenario_data(all_data, config)
+        capacity_report = capacity.analyze_capacity(data)
+
+        print(f"\n[Scénarios] Modèle {members[0].overrides or 'de base'} : {len(members)} scénario(s)", flush=True)
+        solver = build_solver(data, capacity_report)
+
+        processes = pool_size(len(members), max_workers)
+        with process_pool(processes, _init_worker, (solver, None, None), (None, data, capacity_report)) as pool:
+            futures = {}
+            for i, scenario in zip(indexes, members):
+                weights = scenario_config(base_config, scenario)["penalties"]
+                futures[pool.submit(_solve_weights, weights, scenario.time_limit or time_limit,
+                                    solver_threads(processes))] = i
+            for future in as_completed(futures):
+                i = futures[future]
+                status, report_data = future.result()
+                results[i] = _result(scenarios[i], status, report_data, reference)
+                print(f"  [{status}] {scenarios[i].name}", flush=True)
+
+    mark_pareto(results)
+    return results
+
+
+def _result(scenario: Scenario, status: str, report_data: Optional[Dict], reference: Dict[str, int]) -> ScenarioResult:
+    if not report_data:
+        return ScenarioResult(scenario, status)
+    totals = report_data["penalty_totals"]
+    return ScenarioResult(
+        scenario, status,
+        score=report_data["score"],
+        reference_score=sum(penalty_weight(reference, key) * value for key, value in totals.items()),
+        metrics=metrics_from_totals(totals),
+        solve_time_seconds=report_data["solve_time_seconds"],
+    )
+
+
+def mark_pareto(results: List[ScenarioResult], metrics=PARETO_METRICS):
+    """
+    Marque les résultats qu'aucun autre ne domine : au moins aussi bon sur
+    tous les indicateurs `metrics` mesurés des deux côtés, et meilleur sur
+    l'un d'eux.
+    """
+    solved = [r for r in results if r.solved]
+
+    def dominates(a, b):
+        pairs = [(a.metrics[m], b.metrics[m]) for m in metrics
+                 if a.metrics.get(m) is not None and b.metrics.get(m) is not None]
+        return bool(pairs) and all(x <= y for x, y in pairs) and any(x < y for x, y in pairs)
+
+    for result in solved:
+        result.pareto = not any(dominates(other, result) for other in solved if other is not result)
+
+
+def format_table(results: List[ScenarioResult]) -> str:
+    """Tableau texte de comparaison ; * = scénario sur le front de Pareto."""
+    headers = ["", "Scénario", "Statut", "Score réf."] + [title for _, title, _ in METRICS] + ["Temps (s)"]
+    rows = []
+    for result in results:
+        cells = ["*" if result.pareto else "", result.scenario.name, result.status,
+                 "" if result.reference_score is None else str(result.reference_score)]
+        cells += ["-" if result.metrics.get(metric) is None else str(result.metrics[metric])
+                  for metric, _, _ in METRICS] if result.solved else [""] * len(METRICS)
+        cells.append("" if result.solve_time_seconds is None else f"{result.solve_time_seconds:.1f}")
+        rows.append(cells)
+    widths = [max(len(row[i]) for row in [headers] + rows) for i in range(len(headers))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in [headers] + rows]
+    lines.insert(1, "-" * len(lines[0]))
+    return "\n".join(lines)
+
+
+def sweep_from_loader(loader, scenarios_spec: Any, time_limit: Optional[float] = None,
+                      max_workers: Optional[int] = None) -> Optional[List[ScenarioResult]]:
+    """Charge les données d'un DataLoader puis balaye les scénarios ; None si les données sont inutilisables."""
+    from src.planner import prepare_data
+
+    all_data = prepare_data(loader)
+    if all_data is None:
+        return None
+    settings = all_data["config"].get("scenarios", {})
+    scenarios = load_scenarios(scenarios_spec, all_data["config"])
+    time_limit = time_limit or settings.get("time_limit_seconds", 30)
+    print(f"\n--- Balayage : {len(scenarios)} scénario(s), {time_limit}s chacun ---", flush=True)
+    start = time.monotonic()
+    results = run_sweep(all_data, scenarios, time_limit, max_workers or settings.get("workers"))
+    print(f"  Balayage terminé en {time.monotonic() - start:.1f}s.", flush=True)
+    return results
@@ -7,17 +7,23 @@ class SolutionMonitor(cp_model.CpSolverSolutionCallback):
     Un "espion" qui surveille le processus de résolution et affiche chaque
     nouvelle solution trouvée par le solveur.
     """
-    def __init__(self, objective_var):
+    def __init__(self, objective_var, on_solution=None, lower_bound=None):
         """
         Initialise le moniteur.
         
         Args:
             objective_var: La variable d'objectif du modèle (la somme des pénalités)
                            pour pouvoir afficher le score.
+            on_solution: Fonction optionnelle appelée à chaque solution avec un
+                         dictionnaire {solution, objective, best_bound, wall_time}.
+            lower_bound: Borne inférieure connue de l'objectif (src.capacity) :
+                         une solution qui l'atteint est optimale, la recherche s'arrête.
         """
         cp_model.CpSolverSolutionCallback.__init__(self)
         self.__solution_count = 0
         self.__objective_var = objective_var
+        self.__on_solution = on_solution
+        self.__lower_bound = lower_bound
 
     def on_solution_callback(self):
         """
@@ -26,7 +32,17 @@ class SolutionMonitor(cp_model.CpSolverSolutionCallback):
         """
         current_objective = self.ObjectiveValue()
         print(f"  -> Nouvelle solution  (N°{self.__solution_count}) | Score : {current_objective:.2f}")
+        if self.__on_solution is not None:
+            self.__on_solution({
+                "solution": self.__solution_count,
+                "objective": current_objective,
+                "best_bound": self.BestObjectiveBound(),
+                "wall_time": self.WallTime(),
+            })
         self.__solution_count += 1
+        if self.__lower_bound is not None and current_objective <= self.__lower_bound:
+            print(f"  -> Borne inférieure atteinte ({self.__lower_bound}) : solution optimale, arrêt de la recherche.")
+            self.StopSearch()
 
     def solution_count(self):
         """Retourne le nombre total de solutions trouvées."""
@@ -1,11 +1,14 @@
 # Fichier: src/solver.py
 
 import json
+import threading
+import time
 from datetime import date, timedelta
-from typing import List, Dict, Tuple, Set, Any
+from typing import List, Dict, Tuple, Set, Any, Optional
 from ortools.sat.python import cp_model
 from src.models import Employee, Shift, Need, Constraint
 from src.solution_monitor import SolutionMonitor
+from src.utils import REQUIRED_PENALTIES, aggregate_needs, penalty_weight
 
 # Map des jours de la semaine
 DAY_OF_WEEK_MAP = {
@@ -15,20 +18,23 @@ DAY_OF_WEEK_MAP = {
 
 class CpSatSolver:
     
-    def __init__(self, data: Dict[str, Any], toxic_pairs: Set[Tuple[str, str]]):
+    def __init__(self, data: Dict[str, Any], toxic_pairs: Set[Tuple[str, str]], with_assumptions: bool = False):
         self.data = data
         self.toxic_pairs = toxic_pairs
         
         self.config = data["config"]
         self.employees = data["employees"]
         self.shifts_map = data["shifts_map"]
-        self.daily_needs = data["daily_needs"]
+        self.daily_needs = aggregate_needs(data["daily_needs"])  # Un besoin par (date, shift), comme src.capacity
         self.date_range = data["date_range"]
         self.weekends = data["weekends"]
         
         self.all_shift_ids = data["all_shift_ids"]
         self.needed_shifts = data["needed_shifts_lookup"] 
         self.employee_families = data.get("employee_families", {})
+
+        # Disponibilités compilées sur l'horizon (congés + jours fixes, lecture O(1))
+        self.availability = {e.id: e.availability.compile(self.date_range) for e in self.employees}
         
         # Créer le traducteur inversé pour le rapport
         self.fonctions_map = data.get("fonctions_map", {})
@@ -39,7 +45,21 @@ class CpSatSolver:
 
         self.model = cp_model.CpModel()
         self.variables = {} 
-        self.penalties = [] 
+        # Termes de l'objectif regroupés par pénalité de settings.json, {clé: [variables]},
+        # pondérés par set_objective() : changer les poids ne reconstruit pas le modèle
+        self.penalty_terms = {}
+        self.weights = {}
+        # Manque minimum garanti par le pré-calcul de capacité (apply_capacity_bounds)
+        self.min_shortfall = None
+        # Borne inférieure de l'objectif issue du pré-calcul de capacité (apply_capacity_bounds)
+        self.lower_bound = None
+        # Diagnostic d'infaisabilité : chaque groupe de règles dures est gardé par un
+        # littéral d'hypothèse, {clé: (littéral, description)} ; None = modèle normal
+        self.assumptions = {} if with_assumptions else None
+        # Explication du dernier échec de solve() (explain_infeasibility), None sinon
+        self.conflict = None
+        # Statut CP-SAT du dernier solve() ("OPTIMAL", "FEASIBLE", "INFEASIBLE", "UNKNOWN"...)
+        self.status = None
 
     def create_model(self):
         print("Construction du modèle de contraintes...")
@@ -58,9 +78,11 @@ class CpSatSolver:
         total_off_days_per_employee = {} 
         total_shifts_per_fonction = {} 
 
+        # Bornes sur l'horizon réel : la fenêtre de --start/--end peut dépasser un mois
+        n_days = len(self.date_range)
         for e in self.employees:
-            total_minutes_per_employee[e.id] = self.model.NewIntVar(0, 31*1440, f"total_min_{e.id}")
-            total_off_days_per_employee[e.id] = self.model.NewIntVar(0, 31, f"total_off_{e.id}")
+            total_minutes_per_employee[e.id] = self.model.NewIntVar(0, n_days * 1440, f"total_min_{e.id}")
+            total_off_days_per_employee[e.id] = self.model.NewIntVar(0, n_days, f"total_off_{e.id}")
             
             shifts_minutes_this_month = [] 
             off_days_this_month = []
@@ -135,21 +157,20 @@ class CpSatSolver:
         # Règle 3: Contraintes fixes
         print("    -> Application des contraintes fixes (congés, jours fixes)...")
         for e in self.employees:
+            availability = self.availability[e.id]
+            for day_idx in availability.off_indices():
+                reason = availability.off_reason(day_idx)
+                label = "Congés" if reason == "HOLIDAY" else "Jours fixes OFF"
+                self._guard(self.model.Add(is_off[e.id, self.date_range[day_idx]] == 1),
+                            (reason, e.id), f"{label} de {e.name} ({e.id})")
+
             for c in e.constraints: 
-                if c.type == "HOLIDAY" and c.date:
-                    if c.date in self.date_range:
-                        self.model.Add(is_off[e.id, c.date] == 1)
-                        
-                elif c.type == "FIXED_OFF" and c.weekday is not None:
-                    for j in self.date_range:
-                        if j.weekday() == c.weekday:
-                            self.model.Add(is_off[e.id, j] == 1)
-                                
-                elif c.type == "MAX_HOURS" and c.value is not None:
+                if c.type == "MAX_HOURS" and c.value is not None:
                     try:
                         total_minutes_vars = self.variables["total_minutes_per_employee"]
                         max_minutes = int(c.value) * 60
-                        self.model.Add(total_minutes_vars[e.id] <= max_minutes)
+                        self._guard(self.model.Add(total_minutes_vars[e.id] <= max_minutes),
+                                    ("MAX_HOURS", e.id), f"MAX_HOURS {c.value}h de {e.name} ({e.id})")
                     except (ValueError, KeyError):
                         pass
 
@@ -158,7 +179,9 @@ class CpSatSolver:
                         fonction_to_limit = c.qualif 
                         limit_value = int(c.value)
                         if (e.id, fonction_to_limit) in total_shifts_per_fonction:
-                            self.model.Add(total_shifts_per_fonction[e.id, fonction_to_limit] <= limit_value)
+                            self._guard(self.model.Add(total_shifts_per_fonction[e.id, fonction_to_limit] <= limit_value),
+                                        ("MAX_SHIFTS_PER_QUALIF", e.id, fonction_to_limit),
+                                        f"MAX_SHIFTS_PER_QUALIF {fonction_to_limit} <= {limit_value} de {e.name} ({e.id})")
                     except (KeyError, TypeError, ValueError):
                         pass
 
@@ -186,20 +209,23 @@ class CpSatSolver:
             if group_name in group_overrides:
                 min_off = group_overrides[group_name]
                 if min_off > 0:
-                    self.model.Add(total_off_days_vars[e.id] >= min_off)
+                    self._guard(self.model.Add(total_off_days_vars[e.id] >= min_off),
+                                ("GROUP_MIN_OFF_DAYS", group_name),
+                                f"group_min_off_days : {min_off} jours OFF minimum pour le groupe {group_name}")
 
         # Règle 6: Minimum de shifts BEUA-F pour groupe TRI
         tri_group_members = self.employee_families.get("3. TRI", [])
         for e in tri_group_members:
             fonction_cible = "BEUA-F"
             if (e.id, fonction_cible) in total_shifts_per_fonction:
-                self.model.Add(total_shifts_per_fonction[e.id, fonction_cible] >= 4)
+                self._guard(self.model.Add(total_shifts_per_fonction[e.id, fonction_cible] >= 4),
+                            ("TRI_MIN_BEUA", e.id), f"Minimum 4 shifts {fonction_cible} (groupe TRI) pour {e.name} ({e.id})")
 
         # Règle 7: Règles spécifiques par agent
         print("    -> Application des règles spécifiques par agent (via Config)...")
         specific_rules = self.config.get("specific_agent_rules", [])
 
-        for rule in specific_rules:
+        for rule_idx, rule in enumerate(specific_rules):
             target_ids = rule.get("agent_ids", [])
             target_func = rule.get("target_function")
             min_cnt = rule.get("min_count", 0)
@@ -207,7 +233,21 @@ class CpSatSolver:
 
             for e_id in target_ids:
                 if (e_id, target_func) in total_shifts_per_fonction:
-                    self.model.Add(total_shifts_per_fonction[e_id, target_func] >= min_cnt)
+                    self._guard(self.model.Add(total_shifts_per_fonction[e_id, target_func] >= min_cnt),
+                                ("SPECIFIC_AGENT_RULE", rule_idx, e_id),
+                                f"specific_agent_rules n°{rule_idx + 1} : minimum {min_cnt} {target_func} pour {e_id}")
+
+    def _guard(self, constraint, key, description):
+        """
+        En mode diagnostic, la contrainte n'est imposée que si le littéral
+        d'hypothèse de son groupe de règles (`key`) est vrai.
+        """
+        if self.assumptions is None:
+            return
+        if key not in self.assumptions:
+            literal = self.model.NewBoolVar(f"assume_{len(self.assumptions)}")
+            self.assumptions[key] = (literal, description)
+        constraint.OnlyEnforceIf(self.assumptions[key][0])
 
     def _3_add_soft_objectives(self):
         print("  [3/4] Ajout des objectifs (pénalités)...")
@@ -217,7 +257,6 @@ class CpSatSolver:
         total_shifts_per_fonction = self.variables["total_shifts_per_fonction"]
         
         # --- Objectif 1: Couverture des besoins (10 000 pts) ---
-        cost_missing = self.config["penalties"]["PER_MISSING_NEED_UNIT"]
         for need in self.daily_needs:
             if need.date not in self.date_range: continue
             agents_normaux = [assign[e.id, need.date, need.shift_id] for e in self.employees if (e.id, need.date, need.shift_id) in assign]
@@ -226,10 +265,9 @@ class CpSatSolver:
             self.model.Add(total_couv + shortfall >= need.count) 
             self.variables["shortfalls"].append(shortfall)
             self.variables["shortfall_details"].append((need, shortfall))
-            self.penalties.append(shortfall * cost_missing)
+            self._penalize("PER_MISSING_NEED_UNIT", shortfall)
 
         # --- Objectif 2: Jours OFF (1 500 pts) ---
-        cost_off = self.config["penalties"]["PER_DAY_OFF_MISSING"]
         emp_to_group = {emp.id: group_name for group_name, group in self.employee_families.items() for emp in group}
         group_overrides = self.config.get("group_min_off_days", {})
         global_min_off = self.config.get("min_off_days_per_month", 8)
@@ -241,11 +279,10 @@ class CpSatSolver:
             if min_off > 0:
                 jours_manquants = self.model.NewIntVar(0, min_off, f"manque_off_{e.id}")
                 self.model.Add(total_off_days_vars[e.id] + jours_manquants >= min_off)
-                self.penalties.append(jours_manquants * cost_off)
-                self.variables["penalty_details"].append(("Jours OFF manquants", e.name, jours_manquants, cost_off))
+                self._penalize("PER_DAY_OFF_MISSING", jours_manquants)
+                self.variables["penalty_details"].append(("Jours OFF manquants", e.name, jours_manquants, "PER_DAY_OFF_MISSING"))
             
         # --- Objectif 3: Weekend Garanti (500 pts) ---
-        cost_we = self.config["penalties"]["NO_WEEKEND_GUARANTEED"]
         for e in self.employees:
             we_reussis_vars = []
             for sam, dim in self.weekends:
@@ -260,12 +297,11 @@ class CpSatSolver:
             self.model.Add(sum(we_reussis_vars) == 0).OnlyEnforceIf(a_au_moins_un_we.Not())
             no_we_var = self.model.NewBoolVar(f"no_we_{e.id}")
             self.model.Add(a_au_moins_un_we == no_we_var.Not())
-            self.penalties.append(no_we_var * cost_we)
-            self.variables["penalty_details"].append(("Weekend non garanti", e.name, no_we_var, cost_we))
+            self._penalize("NO_WEEKEND_GUARANTEED", no_we_var)
+            self.variables["penalty_details"].append(("Weekend non garanti", e.name, no_we_var, "NO_WEEKEND_GUARANTEED"))
 
         # --- Objectif 4: Équité du TOTAL des Jours de Travail (PRIORITÉ: 5000 pts) ---
-        cost_equity_days = self.config["penalties"].get("PENALTY_INTRA_GROUP_WORK_DAYS_EQUITY_GAP", 5000)
-        if cost_equity_days > 0:
+        if penalty_weight(self.config["penalties"], "PENALTY_INTRA_GROUP_WORK_DAYS_EQUITY_GAP") > 0:
             num_days = len(self.date_range)
             for family_name, family_group in self.employee_families.items():
                 if len(family_group) > 1:
@@ -282,12 +318,11 @@ class CpSatSolver:
                     
                     gap = self.model.NewIntVar(0, num_days, f"gap_days_{family_name}")
                     self.model.Add(gap == max_wd - min_wd)
-                    self.penalties.append(gap * cost_equity_days)
-                    self.variables["penalty_details"].append((f"Écart Total Jours {family_name}", "GROUPE", gap, cost_equity_days))
+                    self._penalize("PENALTY_INTRA_GROUP_WORK_DAYS_EQUITY_GAP", gap)
+                    self.variables["penalty_details"].append((f"Écart Total Jours {family_name}", "GROUPE", gap, "PENALTY_INTRA_GROUP_WORK_DAYS_EQUITY_GAP"))
 
         # --- Objectif 5: Équité par QUALIFICATION (SECONDAIRE: 500 pts) ---
-        cost_equity_shifts = self.config["penalties"].get("PENALTY_INTRA_GROUP_SHIFT_EQUITY_GAP", 500)
-        if cost_equity_shifts > 0:
+        if penalty_weight(self.config["penalties"], "PENALTY_INTRA_GROUP_SHIFT_EQUITY_GAP") > 0:
             max_shifts_possible = len(self.date_range)
             for group_name, group_members in self.employee_families.items():
                 if len(group_members) < 2: continue
@@ -305,25 +340,23 @@ class CpSatSolver:
                             self.model.AddMinEquality(min_s, counts)
                             self.model.AddMaxEquality(max_s, counts)
                             self.model.Add(gap_s == max_s - min_s)
-                            self.penalties.append(gap_s * cost_equity_shifts)
-                            self.variables["penalty_details"].append((f"Écart Qualif {func_name} ({group_name})", "GROUPE", gap_s, cost_equity_shifts))
+                            self._penalize("PENALTY_INTRA_GROUP_SHIFT_EQUITY_GAP", gap_s)
+                            self.variables["penalty_details"].append((f"Écart Qualif {func_name} ({group_name})", "GROUPE", gap_s, "PENALTY_INTRA_GROUP_SHIFT_EQUITY_GAP"))
 
         # --- Objectif 6: Max jours consécutifs (2000 pts) ---
         max_consec = self.config.get("max_consecutive_work_days", 6)
-        cost_consec = self.config["penalties"]["PER_CONSECUTIVE_WORK_DAY_VIOLATION"]
         for e in self.employees:
             for i in range(len(self.date_range) - max_consec):
                 violation = self.model.NewBoolVar(f"consec_violation_{e.id}_{i}")
                 jours_travailles = [is_off[e.id, self.date_range[i+k]].Not() for k in range(max_consec + 1)]
                 self.model.Add(sum(jours_travailles) > max_consec).OnlyEnforceIf(violation)
                 self.model.Add(sum(jours_travailles) <= max_consec).OnlyEnforceIf(violation.Not())
-                self.penalties.append(violation * cost_consec)
+                self._penalize("PER_CONSECUTIVE_WORK_DAY_VIOLATION", violation)
 
         # --- Objectif 7 : HOMOGÉNÉISATION (Éviter les jours OFF isolés) (1000 pts) ---
         # Logique : Si jour J est OFF, alors (J-1) et (J+1) ne doivent pas être TRAVAILLÉS tous les deux.
         # On veut éviter le schéma : TRAVAIL - OFF - TRAVAIL
-        cost_isolated = self.config["penalties"].get("PENALTY_ISOLATED_DAY_OFF", 1000)
-        if cost_isolated > 0:
+        if penalty_weight(self.config["penalties"], "PENALTY_ISOLATED_DAY_OFF") > 0:
             for e in self.employees:
                 # On ne peut vérifier que si J a un précédent et un suivant, donc de l'index 1 à N-2
                 for i in range(1, len(self.date_range) - 1):
@@ -343,15 +376,49 @@ class CpSatSolver:
                         is_off[e.id, self.date_range[i+1]]
                     ]).OnlyEnforceIf(isolated_var.Not())
 
-                    self.penalties.append(isolated_var * cost_isolated)
+                    self._penalize("PENALTY_ISOLATED_DAY_OFF", isolated_var)
                     # Pas besoin de l'ajouter aux penalty_details pour ne pas polluer le rapport, 
                     # mais cela va guider le solveur vers des blocs de repos (2 jours ou +).
 
         # --- Objectif Final ---
-        objective_var = self.model.NewIntVar(0, 1000000000, "objective")
-        self.model.Add(objective_var == sum(self.penalties))
-        self.model.Minimize(objective_var)
-        self.variables["objective"] = objective_var
+        self.set_objective(self.config["penalties"])
+
+    def _penalize(self, key, var):
+        """Ajoute un terme (non pondéré) à la pénalité `key` de settings.json."""
+        self.penalty_terms.setdefault(key, []).append(var)
+
+    def set_objective(self, penalties: Dict[str, int]):
+        """
+        (Re)pondère l'objectif avec les poids `penalties` (format de
+        settings.json) sans toucher aux variables ni aux contraintes : seul
+        l'objectif du modèle est remplacé. Une pénalité à 0 au moment de
+        create_model() n'a pas de termes. ValueError si une pénalité
+        obligatoire (REQUIRED_PENALTIES) manque.
+        """
+        self.weights = {key: penalty_weight(penalties, key)
+                        for key in set(self.penalty_terms) | set(REQUIRED_PENALTIES)}
+        objective = sum(self.weights[key] * sum(terms) for key, terms in self.penalty_terms.items())
+        self.model.Minimize(objective)
+        self.variables["objective"] = objective
+        if self.min_shortfall is not None:
+            self.lower_bound = self.min_shortfall * self.weights.get("PER_MISSING_NEED_UNIT", 0)
+
+    def apply_capacity_bounds(self, capacity):
+        """
+        Ajoute au modèle les bornes du pré-calcul de capacité (src.capacity) :
+        manque minimum de chaque jour et du mois, en contraintes redondantes.
+        La recherche s'arrête dès qu'une solution atteint la borne inférieure
+        de l'objectif qui en découle (recalculée par set_objective()).
+        """
+        shortfalls_by_day = {}
+        for need, shortfall in self.variables["shortfall_details"]:
+            shortfalls_by_day.setdefault(need.date, []).append(shortfall)
+        for day in capacity.days:
+            if day.min_shortfall > 0 and day.date in shortfalls_by_day:
+                self.model.Add(sum(shortfalls_by_day[day.date]) >= day.min_shortfall)
+        self.model.Add(sum(self.variables["shortfalls"]) >= capacity.min_shortfall)
+        self.min_shortfall = capacity.min_shortfall
+        self.lower_bound = self.min_shortfall * self.weights.get("PER_MISSING_NEED_UNIT", 0)
 
     def _4_define_search_strategy(self):
         print("  [4/4] Définition de la stratégie de recherche...")
@@ -370,13 +437,35 @@ class CpSatSolver:
 
         self.model.AddDecisionStrategy(sorted_vars, cp_model.CHOOSE_FIRST, cp_model.SELECT_MIN_VALUE)
 
-    def solve(self):
-        print(f"Lancement du solveur ({self.config['solver_time_limit_seconds']}s)...")
+    def solve(self, stop_event: Optional[threading.Event] = None, on_solution=None,
+              time_limit: Optional[float] = None, num_workers: Optional[int] = None, explain: bool = True):
+        """
+        Lance la résolution. Si `stop_event` est fourni, son activation (depuis
+        un autre thread ou processus) interrompt la recherche CP-SAT ; la
+        meilleure solution trouvée jusque-là est conservée. `on_solution` est
+        transmis au SolutionMonitor pour suivre la progression.
+        `time_limit` et `num_workers` remplacent solver_time_limit_seconds et
+        le parallélisme par défaut de CP-SAT ; `explain=False` saute le
+        diagnostic d'infaisabilité.
+        """
+        if time_limit is None:
+            time_limit = self.config["solver_time_limit_seconds"]
+        print(f"Lancement du solveur ({time_limit}s)...")
         solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = self.config["solver_time_limit_seconds"]
+        solver.parameters.max_time_in_seconds = time_limit
+        if num_workers:
+            solver.parameters.num_workers = num_workers
         
-        solution_monitor = SolutionMonitor(self.variables["objective"])
-        status = solver.Solve(self.model, solution_monitor)
+        solution_monitor = SolutionMonitor(self.variables["objective"], on_solution=on_solution,
+                                           lower_bound=self.lower_bound)
+        finished = threading.Event()
+        if stop_event is not None:
+            threading.Thread(target=self._stop_search_when_set, args=(solver, stop_event, finished), daemon=True).start()
+        try:
+            status = solver.Solve(self.model, solution_monitor)
+        finally:
+            finished.set()
+        self.status = solver.StatusName(status)
 
         if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
             print(f"Solution trouvée ! Coût: {solver.ObjectiveValue()}")
@@ -385,20 +474,97 @@ class CpSatSolver:
             return planning, report_data
         else:
             print("Aucune solution trouvée.")
+            if explain and status == cp_model.INFEASIBLE and not (stop_event is not None and stop_event.is_set()):
+                self.conflict = self.explain_infeasibility(self.config.get("infeasibility_time_limit_seconds", 10))
             return None, None
 
+    def explain_infeasibility(self, time_limit: float = 10) -> Dict[str, Any]:
+        """
+        Cherche un ensemble minimal de groupes de règles dures incompatibles :
+        un modèle sans objectif, dont chaque groupe (congés et jours fixes par
+        agent, MAX_HOURS, MAX_SHIFTS_PER_QUALIF, group_min_off_days, minimum
+        BEUA-F du TRI, specific_agent_rules) est gardé par une hypothèse.
+        CP-SAT renvoie un sous-ensemble suffisant d'hypothèses, réduit ensuite
+        en retirant une hypothèse à la fois. `time_limit` borne le tout.
+        """
+        print(f"Recherche des règles en conflit ({time_limit}s max)...")
+        deadline = time.monotonic() + time_limit
+        diagnosis = CpSatSolver(self.data, self.toxic_pairs, with_assumptions=True)
+        diagnosis._1_create_variables()
+        diagnosis._2_add_hard_constraints()
+        model = diagnosis.model
+        by_index = {literal.Index(): (key, literal, description)
+                    for key, (literal, description) in diagnosis.assumptions.items()}
+
+        def check(indexes):
+            """Statut du modèle sous les hypothèses `indexes` et, s'il est infaisable, son noyau."""
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return cp_model.UNKNOWN, None
+            model.ClearAssumptions()
+            model.AddAssumptions([by_index[i][1] for i in indexes])
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = remaining
+            # Les noyaux d'hypothèses exigent une recherche séquentielle
+            solver.parameters.num_workers = 1
+            status = solver.Solve(model)
+            if status == cp_model.INFEASIBLE:
+                return status, list(solver.SufficientAssumptionsForInfeasibility())
+            return status, None
+
+        status, core = check(list(by_index))
+        if status != cp_model.INFEASIBLE:
+            reason = ("Les règles gardées ne suffisent pas à expliquer l'échec (repos de 11h, shifts non demandés...)."
+                      if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else "Temps de diagnostic écoulé.")
+            print(f"  {reason}")
+            return {"status": "NO_CONFLICT_FOUND", "minimal": False, "reason": reason, "conflict": []}
+
+        if not core:
+            reason = "Le modèle est infaisable même sans les règles gardées (repos de 11h, shifts non demandés...)."
+            print(f"  {reason}")
+            return {"status": "NO_CONFLICT_FOUND", "minimal": False, "reason": reason, "conflict": []}
+
+        # Réduction : une hypothèse est retirée si le reste est encore infaisable
+        minimal = True
+        kept, pending = [], list(core)
+        while pending:
+            candidate = pending.pop(0)
+            status, smaller = check(kept + pending)
+            if status == cp_model.INFEASIBLE:
+                # Le nouveau noyau peut être plus petit encore : on n'en garde que les hypothèses
+                smaller = set(smaller)
+                pending = [idx for idx in pending if idx in smaller]
+            else:
+                if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                    minimal = False  # Temps écoulé : l'hypothèse est gardée sans preuve
+                kept.append(candidate)
+
+        conflict = [{"rule": by_index[idx][0][0], "key": [str(part) for part in by_index[idx][0]],
+                     "description": by_index[idx][2]} for idx in kept]
+        print(f"  {len(conflict)} règle(s) en conflit{'' if minimal else ' (réduction incomplète)'} :")
+        for item in conflict:
+            print(f"    - {item['description']}")
+        return {"status": "CONFLICT_FOUND", "minimal": minimal, "conflict": conflict}
+
+    @staticmethod
+    def _stop_search_when_set(solver, stop_event, finished):
+        while not finished.is_set():
+            if stop_event.wait(0.2):
+                print("Arrêt de la recherche demandé.")
+                solver.StopSearch()
+                return
+
     def _collect_report_data(self, solver):
         data = {
             "score": solver.ObjectiveValue(),
+            "solve_time_seconds": round(solver.WallTime(), 3),
             "total_uncovered": sum(solver.Value(s) for s in self.variables["shortfalls"]),
+            # Valeur non pondérée de chaque pénalité (jours, agents, shifts...), comparable d'un jeu de poids à l'autre
+            "penalty_totals": {key: sum(solver.Value(var) for var in terms) for key, terms in self.penalty_terms.items()},
             "penalties": [],
-            "stats": {},
-            "employees_details": {},
-            "families_report": self.employee_families,
-            "qualif_equity_report": {} 
         }
         
-        cost_missing = self.config["penalties"]["PER_MISSING_NEED_UNIT"]
+        cost_missing = self.weights.get("PER_MISSING_NEED_UNIT", 0)
         for (need, shortfall_var) in self.variables["shortfall_details"]:
             val = solver.Value(shortfall_var)
             if val > 0:
@@ -408,46 +574,12 @@ class CpSatSolver:
                     "cost": val * cost_missing
                 })
 
-        for (name, context, var, cost) in self.variables["penalty_details"]:
+        for (name, context, var, key) in self.variables["penalty_details"]:
             val = solver.Value(var)
             if val > 0:
-                data["penalties"].append({"agent": context, "reason": f"{name} ({val})", "cost": val * cost})
+                data["penalties"].append({"agent": context, "reason": f"{name} ({val})", "cost": val * self.weights[key]})
 
-        total_off_days_vars = self.variables["total_off_days_per_employee"]
-        total_minutes_vars = self.variables["total_minutes_per_employee"]
-        assign = self.variables["assign"]
-        is_off = self.variables["is_off"]
-        
-        days_off_list = []
-        for e in self.employees:
-            nb_off = solver.Value(total_off_days_vars[e.id])
-            nb_shifts = len(self.date_range) - nb_off
-            days_off_list.append((nb_off, e.name))
-            
-            total_hours = round(solver.Value(total_minutes_vars[e.id]) / 60, 1)
-            shifts_bk = {}
-            funcs_bk = {}
-            
-            for j in self.date_range:
-                if solver.Value(is_off[e.id, j]) == 0:
-                    for s_id in e.qualifications:
-                        if (e.id, j, s_id) in assign and solver.Value(assign[e.id, j, s_id]) == 1:
-                            shifts_bk[s_id] = shifts_bk.get(s_id, 0) + 1
-                            fname = self.shift_to_fonction_map.get(s_id, "AUTRE")
-                            funcs_bk[fname] = funcs_bk.get(fname, 0) + 1
-                            break
-            
-            data["employees_details"][e.name] = {
-                "name": e.name, "days_off": nb_off, "days_work": nb_shifts,
-                "total_hours": total_hours, "shifts_breakdown": shifts_bk,
-                "fonctions_breakdown": funcs_bk
-            }
-
-        days_off_list.sort()
-        data["stats"]["avg_off"] = sum(x[0] for x in days_off_list)/len(days_off_list) if days_off_list else 0
-        data["stats"]["min_off"] = days_off_list[0][0] if days_off_list else 0
-        data["stats"]["min_off_agent"] = days_off_list[0][1] if days_off_list else ""
-        
+        # Détail par employé, couverture et équité : calculés depuis le planning (reporter.compute_statistics)
         return data
 
     def _process_results(self, solver) -> Dict[str, Dict[str, str]]:
@@ -457,18 +589,11 @@ class CpSatSolver:
 
         for e in self.employees:
             planning[e.name] = {}
-            for j in self.date_range:
+            availability = self.availability[e.id]
+            for day_idx, j in enumerate(self.date_range):
                 date_str = j.strftime("%Y-%m-%d")
                 if solver.Value(is_off[e.id, j]) == 1:
-                    val = "OFF"
-                    for c in e.constraints:
-                        if c.type == "HOLIDAY" and c.date == j:
-                            val = "HOLIDAY"
-                            break
-                        if c.type == "FIXED_OFF" and c.weekday == j.weekday():
-                            val = "FIXED_OFF"
-                            break
-                    planning[e.name][date_str] = val
+                    planning[e.name][date_str] = availability.off_reason(day_idx) or "OFF"
                 else:
                     main_shift = ""
                     for s_id in e.qualifications:
@@ -0,0 +1,364 @@
+# Fichier: src/storage.py
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.needs_reader import DateParser
+from src.needs_templates import to_flat
+from src.utils import atomic_output
+
+# Rôles des documents d'entrée et nom des fichiers JSON correspondants
+INPUT_FILES = {
+    "employees": "01_employees.json",
+    "fonctions": "02_fonctions.json",
+    "shifts": "03_shifts_master.json",
+    "needs": "04_daily_needs.json",
+    "groups": "05_groups.json",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS revisions (
+    role TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS employees (
+    position INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    name TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS employees_id ON employees (id);
+CREATE TABLE IF NOT EXISTS functions (
+    position INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shifts (
+    position INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS needs (
+    position INTEGER PRIMARY KEY,
+    day INTEGER,              -- date.toordinal(), NULL si la date est illisible
+    date_str TEXT NOT NULL,   -- valeur d'origine, restituée telle quelle à l'export
+    shift_id TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS needs_day_shift ON needs (day, shift_id);
+CREATE INDEX IF NOT EXISTS needs_shift_day ON needs (shift_id, day);
+CREATE TABLE IF NOT EXISTS groups (
+    position INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS group_members (
+    group_name TEXT NOT NULL,
+    member_position INTEGER NOT NULL,
+    employee_id TEXT NOT NULL,
+    PRIMARY KEY (group_name, member_position)
+);
+CREATE INDEX IF NOT EXISTS group_members_employee ON group_members (employee_id);
+CREATE TABLE IF NOT EXISTS plans (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    score REAL,
+    total_uncovered INTEGER,
+    first_day INTEGER,
+    last_day INTEGER,
+    report_text TEXT
+);
+CREATE TABLE IF NOT EXISTS plan_cells (
+    version INTEGER NOT NULL REFERENCES plans (version) ON DELETE CASCADE,
+    employee_name TEXT NOT NULL,
+    employee_id TEXT,
+    day INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (version, employee_name, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS plan_cells_employee ON plan_cells (employee_id, version, day);
+CREATE INDEX IF NOT EXISTS plan_cells_day ON plan_cells (version, day);
+"""
+
+
+class SqliteStore:
+    """
+    Stockage SQLite (mode WAL) des données d'entrée et de l'historique des
+    plannings. Les documents sont restitués dans le même format que les
+    fichiers JSON de data/input/, les besoins et les plannings sont en plus
+    interrogeables par date, shift ou agent via des index.
+
+    Une connexion par thread : en WAL, les lecteurs ne sont jamais bloqués
+    par une écriture en cours.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- DOCUMENTS D'ENTRÉE ---
+
+    def revision(self, role: str) -> int:
+        """Compteur incrémenté à chaque remplacement du document (invalidation des caches)."""
+        row = self._connection().execute("SELECT revision FROM revisions WHERE role = ?", (role,)).fetchone()
+        return row[0] if row else 0
+
+    def has_document(self, role: str) -> bool:
+        return self.revision(role) > 0
+
+    def get_document(self, role: str) -> Any:
+        """Document complet, au format du fichier JSON correspondant."""
+        conn = self._connection()
+        if role == "employees":
+            return [json.loads(doc) for (doc,) in conn.execute("SELECT doc FROM employees ORDER BY position")]
+        if role == "fonctions":
+            return {"functions": [json.loads(doc) for (doc,) in conn.execute("SELECT doc FROM functions ORDER BY position")]}
+        if role == "shifts":
+            shifts = {}
+            for shift_id, doc in conn.execute("SELECT id, doc FROM shifts ORDER BY position"):
+                shifts[shift_id] = json.loads(doc)
+            return shifts
+        if role == "needs":
+            return [json.loads(doc) for (doc,) in conn.execute("SELECT doc FROM needs ORDER BY position")]
+        if role == "groups":
+            groups = {name: [] for (name,) in conn.execute("SELECT name FROM groups ORDER BY position")}
+            for group_name, employee_id in conn.execute(
+                    "SELECT group_name, employee_id FROM group_members ORDER BY group_name, member_position"):
+                groups.setdefault(group_name, []).append(employee_id)
+            return groups
+        raise ValueError(f"Rôle de document inconnu : {role}")
+
+    def replace_document(self, role: str, data: Any):
+        """Remplace tout le document dans une seule transaction."""
+        self.replace_documents({role: data})
+
+    def replace_documents(self, documents: Dict[str, Any]):
+        """Remplace plusieurs documents dans une seule transaction : tous ou aucun (import Excel)."""
+        conn = self._connection()
+        with conn:
+            for role, data in documents.items():
+                self._replace(conn, role, data)
+
+    def _replace(self, conn: sqlite3.Connection, role: str, data: Any):
+        if role == "employees":
+            conn.execute("DELETE FROM employees")
+            conn.executemany("INSERT INTO employees (position, id, name, doc) VALUES (?, ?, ?, ?)", (
+                (i, emp.get("id"), emp.get("name"), json.dumps(emp, ensure_ascii=False))
+                for i, emp in enumerate(data or [])
+            ))
+        elif role == "fonctions":
+            conn.execute("DELETE FROM functions")
+            conn.executemany("INSERT INTO functions (position, id, doc) VALUES (?, ?, ?)", (
+                (i, func.get("id"), json.dumps(func, ensure_ascii=False))
+                for i, func in enumerate((data or {}).get("functions", []))
+            ))
+        elif role == "shifts":
+            conn.execute("DELETE FROM shifts")
+            conn.executemany("INSERT INTO shifts (position, id, start_time, end_time, doc) VALUES (?, ?, ?, ?, ?)", (
+                (i, shift_id, shift.get("start_time"), shift.get("end_time"), json.dumps(shift, ensure_ascii=False))
+                for i, (shift_id, shift) in enumerate((data or {}).items())
+            ))
+        elif role == "needs":
+            # Le format compact est stocké développé : les besoins restent indexés par date
+            data = to_flat(data)
+            parser = DateParser()
+            conn.execute("DELETE FROM needs")
+            conn.executemany("INSERT INTO needs (position, day, date_str, shift_id, count, doc) VALUES (?, ?, ?, ?, ?, ?)", (
+                (i, parser.to_ordinal(str(need["date_str"])), str(need["date_str"]), need["shift_id"],
+                 int(need["count"]), json.dumps(need, ensure_ascii=False))
+                for i, need in enumerate(data or [])
+            ))
+        elif role == "groups":
+            conn.execute("DELETE FROM groups")
+            conn.execute("DELETE FROM group_members")
+            groups = data or {}
+            conn.executemany("INSERT INTO groups (position, name) VALUES (?, ?)", enumerate(groups))
+            conn.executemany("INSERT INTO group_members (group_name, member_position, employee_id) VALUES (?, ?, ?)", (
+                (name, k, employee_id)
+                for name, members in groups.items()
+                for k, employee_id in enumerate(members)
+            ))
+        else:
+            raise ValueError(f"Rôle de document inconnu : {role}")
+        conn.execute(
+            "INSERT INTO revisions (role, revision) VALUES (?, 1) "
+            "ON CONFLICT (role) DO UPDATE SET revision = revision + 1", (role,)
+        )
+
+    def needs_between(self, start_date: Optional[date] = None, end_date: Optional[date] = None) -> Iterator[Dict[str, Any]]:
+        """Besoins d'une période (bornes incluses), lus via l'index sur la date."""
+        query = "SELECT date_str, shift_id, count FROM needs WHERE day IS NOT NULL"
+        params = []
+        if start_date:
+            query += " AND day >= ?"
+            params.append(start_date.toordinal())
+        if end_date:
+            query += " AND day <= ?"
+            params.append(end_date.toordinal())
+        for date_str, shift_id, count in self._connection().execute(query + " ORDER BY day, position", params):
+            yield {"date_str": date_str, "shift_id": shift_id, "count": count}
+
+    # --- IMPORT / EXPORT JSON ---
+
+    def import_json(self, input_dir: str, roles: Optional[List[str]] = None) -> Dict[str, int]:
+        """Charge les fichiers JSON de `input_dir` (ceux qui existent). Retourne le nombre d'éléments par rôle."""
+        imported = {}
+        for role in roles or INPUT_FILES:
+            file_path = os.path.join(input_dir, INPUT_FILES[role])
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.replace_document(role, data)
+            if role == "fonctions":
+                imported[role] = len(data.get("functions", []))
+            else:
+                imported[role] = len(to_flat(data)) if role == "needs" else len(data)
+        return imported
+
+    def export_json(self, output_dir: str, roles: Optional[List[str]] = None) -> List[str]:
+        """Réécrit les documents au format des fichiers d'entrée dans `output_dir`."""
+        os.makedirs(output_dir, exist_ok=True)
+        written = []
+        for role in roles or INPUT_FILES:
+            file_path = os.path.join(output_dir, INPUT_FILES[role])
+            with atomic_output(file_path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.get_document(role), f, indent=2, ensure_ascii=False)
+            written.append(file_path)
+        return written
+
+    # --- HISTORIQUE DES PLANNINGS ---
+
+    def save_plan(self, result) -> int:
+        """
+        Enregistre un PlanningResult comme nouvelle version. Retourne le numéro
+        de version. Les identifiants des agents sont ceux du résultat (données
+        de la résolution), pas ceux de la table employees au moment de l'écriture.
+        """
+        planning = result.planning or {}
+        report_data = result.report_data or {}
+        conn = self._connection()
+        name_to_id = result.employee_ids or {}
+
+        cells = []
+        for name, days in planning.items():
+            employee_id = name_to_id.get(name)
+            for date_str, value in days.items():
+                cells.append((name, employee_id, date.fromisoformat(date_str).toordinal(), value))
+        days = [cell[2] for cell in cells]
+
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO plans (created_at, status, score, total_uncovered, first_day, last_day, report_text) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), result.status, report_data.get("score"), report_data.get("total_uncovered"),
+                 min(days) if days else None, max(days) if days else None, result.report_text)
+            )
+            version = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO plan_cells (version, employee_name, employee_id, day, value) VALUES (?, ?, ?, ?, ?)",
+                ((version, *cell) for cell in cells)
+            )
+        return version
+
+    def plans(self) -> List[Dict[str, Any]]:
+        """Métadonnées des versions enregistrées, de la plus récente à la plus ancienne."""
+        rows = self._connection().execute(
+            "SELECT version, created_at, status, score, total_uncovered, first_day, last_day FROM plans ORDER BY version DESC"
+        )
+        return [{
+            "version": version, "created_at": created_at, "status": status, "score": score,
+            "total_uncovered": total_uncovered,
+            "start_date": date.fromordinal(first_day).isoformat() if first_day else None,
+            "end_date": date.fromordinal(last_day).isoformat() if last_day else None,
+        } for version, created_at, status, score, total_uncovered, first_day, last_day in rows]
+
+    def latest_plan_version(self) -> Optional[int]:
+        row = self._connection().execute("SELECT MAX(version) FROM plans").fetchone()
+        return row[0]
+
+    def plan(self, version: Optional[int] = None, start_date: Optional[date] = None,
+             end_date: Optional[date] = None) -> Dict[str, Dict[str, str]]:
+        """Planning {nom: {"AAAA-MM-JJ": valeur}} d'une version (la dernière par défaut)."""
+        version = version or self.latest_plan_version()
+        query = "SELECT employee_name, day, value FROM plan_cells WHERE version = ?"
+        params = [version]
+        if start_date:
+            query += " AND day >= ?"
+            params.append(start_date.toordinal())
+        if end_date:
+            query += " AND day <= ?"
+            params.append(end_date.toordinal())
+        planning: Dict[str, Dict[str, str]] = {}
+        for name, day, value in self._connection().execute(query + " ORDER BY employee_name, day", params):
+            planning.setdefault(name, {})[date.fromordinal(day).isoformat()] = value
+        return planning
+
+    def plan_for(self, employee: str, version: Optional[int] = None) -> Dict[str, str]:
+        """Planning d'un agent (id ou nom) pour une version (la dernière par défaut)."""
+        version = version or self.latest_plan_version()
+        rows = self._connection().execute(
+            "SELECT day, value FROM plan_cells WHERE version = ? AND (employee_id = ? OR employee_name = ?) ORDER BY day",
+            (version, employee, employee)
+        )
+        return {date.fromordinal(day).isoformat(): value for day, value in rows}
+
+
+def store_from_config(config: Dict, base_dir: str, seed_dir: Optional[str] = None) -> Optional[SqliteStore]:
+    """
+    SqliteStore si settings.json active le backend SQLite
+    ("storage": {"backend": "sqlite", "sqlite_path": "data/planner.db"}), sinon None.
+    Une base encore vide est initialisée avec les fichiers JSON de `seed_dir`.
+    """
+    storage = (config or {}).get("storage") or {}
+    if storage.get("backend") != "sqlite":
+        return None
+    store = SqliteStore(os.path.join(base_dir, storage.get("sqlite_path", "data/planner.db")))
+    if seed_dir and not any(store.has_document(role) for role in INPUT_FILES):
+        print(f"  [Storage] Base vide, import des fichiers de {seed_dir}...", flush=True)
+        store.import_json(seed_dir)
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import/export des données d'entrée entre les fichiers JSON et la base SQLite.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("db_path", help="Chemin de la base SQLite.")
+    parser.add_argument("--dir", default=os.path.join("data", "input"), help="Dossier des fichiers JSON (défaut: data/input).")
+    args = parser.parse_args()
+
+    store = SqliteStore(args.db_path)
+    if args.action == "import":
+        for role, count in store.import_json(args.dir).items():
+            print(f"  [Storage] {role} : {count} élément(s) importé(s).")
+    else:
+        for file_path in store.export_json(args.dir):
+            print(f"  [Storage] Exporté : {file_path}")
@@ -1,13 +1,50 @@
 # Fichier: src/utils.py
 
 import json
+import os
+import tempfile
+from contextlib import contextmanager
 from datetime import date, timedelta
 from typing import List, Dict, Tuple, Set, Any
-from src.models import Shift
+from src.models import Need, Shift
 
 # Constante pour les calculs de temps
 MINUTES_IN_DAY = 24 * 60 # 1440
 
+# Pénalités sans lesquelles l'objectif n'a pas de sens : settings.json doit les fournir
+REQUIRED_PENALTIES = (
+    "PER_MISSING_NEED_UNIT",
+    "PER_DAY_OFF_MISSING",
+    "NO_WEEKEND_GUARANTEED",
+    "PER_CONSECUTIVE_WORK_DAY_VIOLATION",
+)
+
+# Poids des pénalités facultatives de settings.json, quand elles n'y figurent pas
+DEFAULT_PENALTIES = {
+    "PENALTY_INTRA_GROUP_WORK_DAYS_EQUITY_GAP": 5000,
+    "PENALTY_INTRA_GROUP_SHIFT_EQUITY_GAP": 500,
+    "PENALTY_ISOLATED_DAY_OFF": 1000,
+}
+
+
+def penalty_weight(penalties: Dict[str, int], key: str) -> int:
+    """
+    Poids de la pénalité `key` dans `penalties` (section de settings.json).
+    Une pénalité facultative absente prend son poids de DEFAULT_PENALTIES,
+    une pénalité inconnue vaut 0 ; ValueError si une pénalité de
+    REQUIRED_PENALTIES est absente.
+    """
+    if key in penalties:
+        return penalties[key]
+    if key in REQUIRED_PENALTIES:
+        raise ValueError(f"Pénalité obligatoire '{key}' absente de settings.json (section 'penalties').")
+    return DEFAULT_PENALTIES.get(key, 0)
+
+
+def known_penalties(config: Dict) -> Set[str]:
+    """Noms de pénalités reconnus : ceux de settings.json, obligatoires et facultatives."""
+    return set(config.get("penalties", {})) | set(REQUIRED_PENALTIES) | set(DEFAULT_PENALTIES)
+
 def get_date_range_from_needs(needs: List) -> List[date]:
     """
     Trouve le premier et le dernier jour du mois à partir de la liste des besoins.
@@ -32,6 +69,20 @@ def get_date_range_from_needs(needs: List) -> List[date]:
     print(f"  [Utils] Plage de dates déterminée : {start_date} à {end_date}")
     return date_list
 
+def aggregate_needs(needs: List[Need]) -> List[Need]:
+    """
+    Un besoin par (date, shift), les effectifs des doublons additionnés, dans
+    l'ordre de première apparition. Le solveur et src.capacity lisent les
+    besoins à travers cette fonction pour en avoir la même lecture.
+    """
+    counts: Dict[Tuple[date, str], int] = {}
+    for need in needs:
+        key = (need.date, need.shift_id)
+        counts[key] = counts.get(key, 0) + need.count
+    if len(counts) == len(needs):
+        return list(needs)
+    return [Need(date=day, shift_id=shift_id, count=count) for (day, shift_id), count in counts.items()]
+
 def get_weekends_in_range(date_range: List[date]) -> List[Tuple[date, date]]:
     """
     Trouve tous les couples (Samedi, Dimanche).
@@ -75,4 +126,63 @@ def calculate_toxic_pairs(
                 toxic_pairs.add((shift_tard.id, shift_tot.id))
 
     print(f"  [Utils] Trouvé {len(toxic_pairs)} transitions de shift interdites.")
-    return toxic_pairs
\ No newline at end of file
+    return toxic_pairs
+
+
+# Masque de création des fichiers du processus (os.umask ne sait que le remplacer)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def temp_path_for(path: str) -> str:
+    """
+    Crée un fichier temporaire vide et unique dans le dossier de `path`, avec
+    les droits habituels d'un fichier créé par open() (mkstemp crée en 0600).
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+    except OSError:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+@contextmanager
+def atomic_output(path: str):
+    """
+    Chemin temporaire unique du dossier de `path` (temp_path_for), à remplir
+    dans le bloc : il remplace `path` (os.replace) si le bloc se termine sans
+    erreur et est supprimé sinon. Plusieurs écrivains concurrents (threads ou
+    processus) ne mélangent jamais leurs contenus, le dernier l'emporte.
+    """
+    tmp_path = temp_path_for(path)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path: str, document: Any, fsync: bool = False):
+    """
+    Écrit `document` en JSON dans `path` via atomic_output ; un document déjà
+    sérialisé (bytes) est écrit tel quel. Avec `fsync`, le contenu est sur
+    disque avant le renommage.
+    """
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'wb') as f:
+            if isinstance(document, bytes):
+                f.write(document)
+            else:
+                f.write(json.dumps(document, ensure_ascii=False).encode('utf-8'))
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
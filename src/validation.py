@@ -0,0 +1,284 @@
+# Fichier: src/validation.py
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from src.utils import write_json_atomic
+
+# Version du format du cache : à incrémenter si les règles changent
+CACHE_VERSION = 2
+
+
+@dataclass(frozen=True, slots=True)
+class ValidationIssue:
+    """
+    Une incohérence détectée dans les fichiers d'entrée, localisée précisément
+    pour pouvoir être affichée en ligne dans l'interface web.
+    """
+    file: str     # rôle du fichier : "needs", "employees", "fonctions", "shifts"...
+    path: str     # chemin JSON, ex: "$[12].shift_id"
+    code: str     # ex: "UNKNOWN_SHIFT"
+    message: str
+
+    def to_dict(self) -> Dict[str, str]:
+        return asdict(self)
+
+
+def file_digest(file_path: str) -> str:
+    """Empreinte SHA-256 du contenu d'un fichier ("" s'il n'existe pas)."""
+    try:
+        with open(file_path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return ""
+
+
+def document_digest(document: Any) -> str:
+    """Empreinte SHA-256 d'un document JSON déjà en mémoire (forme canonique)."""
+    canonical = json.dumps(document, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+# --- RÈGLES DE COHÉRENCE ---
+# Chaque règle lit uniquement les données dont elle dépend, via un mapping :
+# - "shift_ids"  : set des shifts de 03_shifts_master.json
+# - "fonctions"  : document brut de 02_fonctions.json
+# - "employees"  : liste brute de 01_employees.json
+# - "needs"      : NeedsColumns (src.needs_reader)
+
+def _check_needs_shifts(data: Mapping[str, Any]) -> List[ValidationIssue]:
+    """1. Les shifts demandés dans les besoins existent dans le master."""
+    issues = []
+    shift_ids_master = data["shift_ids"]
+    needs = data["needs"]
+    reported = set()
+    for i in range(len(needs)):
+        shift_id = needs.shift_id_at(i)
+        if shift_id not in shift_ids_master:
+            # Une entrée de modèle produit un besoin par semaine : une seule anomalie par entrée
+            path = needs.path_at(i, "shift_id")
+            if path in reported:
+                continue
+            reported.add(path)
+            issues.append(ValidationIssue(
+                file="needs", path=path, code="UNKNOWN_SHIFT",
+                message=f"Le shift '{shift_id}' requis le {needs.date_at(i)} n'existe pas dans '03_shifts_master.json'."
+            ))
+    return issues
+
+
+def _check_employee_fonctions(data: Mapping[str, Any]) -> List[ValidationIssue]:
+    """2. Les fonctions des employés existent."""
+    issues = []
+    fonction_ids_master = {f.get("id") for f in data["fonctions"].get("functions", [])}
+    for i, emp_data in enumerate(data["employees"] or []):
+        for k, func_item in enumerate(emp_data.get("qualifications", [])):
+            # On ne valide que les strings, on ignore les dicts ici
+            if isinstance(func_item, str) and func_item not in fonction_ids_master:
+                issues.append(ValidationIssue(
+                    file="employees", path=f"$[{i}].qualifications[{k}]", code="UNKNOWN_FONCTION",
+                    message=f"La fonction '{func_item}' de l'employé '{emp_data.get('name')}' n'existe pas dans '02_fonctions.json'."
+                ))
+    return issues
+
+
+def _check_fonction_qualifications(data: Mapping[str, Any]) -> List[ValidationIssue]:
+    """3. Les qualifications (shifts) listées dans les fonctions existent."""
+    issues = []
+    shift_ids_master = data["shift_ids"]
+    for i, func in enumerate(data["fonctions"].get("functions", [])):
+        for k, shift_id in enumerate(func.get("qualifications", [])):
+            if shift_id not in shift_ids_master:
+                issues.append(ValidationIssue(
+                    file="fonctions", path=f"$.functions[{i}].qualifications[{k}]", code="UNKNOWN_QUALIFICATION",
+                    message=f"La qualification '{shift_id}' listée dans la fonction '{func.get('id')}' n'existe pas dans '03_shifts_master.json'."
+                ))
+    return issues
+
+
+def _check_needs_unique(data: Mapping[str, Any]) -> List[ValidationIssue]:
+    """4. Un seul besoin par (date, shift) : un doublon serait ambigu (somme ou remplacement ?)."""
+    issues = []
+    needs = data["needs"]
+    first_path = {}
+    reported = set()
+    for i in range(len(needs)):
+        key = (needs.days[i], needs.shift_idx[i])
+        path = needs.path_at(i)
+        if key not in first_path:
+            first_path[key] = path
+            continue
+        if path in reported:
+            continue
+        reported.add(path)
+        issues.append(ValidationIssue(
+            file="needs", path=path, code="DUPLICATE_NEED",
+            message=f"Le besoin '{needs.shift_id_at(i)}' du {needs.date_at(i)} est déjà défini ({first_path[key]})."
+        ))
+    return issues
+
+
+# nom de la règle -> (fichiers dont elle dépend, fonction)
+CHECKS: Dict[str, Tuple[Tuple[str, ...], Callable[[Mapping[str, Any]], List[ValidationIssue]]]] = {
+    "needs_shifts": (("needs", "shifts"), _check_needs_shifts),
+    "employee_fonctions": (("employees", "fonctions"), _check_employee_fonctions),
+    "fonction_qualifications": (("fonctions", "shifts"), _check_fonction_qualifications),
+    "needs_unique": (("needs",), _check_needs_unique),
+}
+
+
+class ValidationCache:
+    """
+    Résultats des règles persistés sur disque, indexés par l'empreinte des
+    fichiers dont chaque règle dépend. Une règle n'est rejouée que si l'un de
+    ses fichiers a changé.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None):
+        self.cache_path = cache_path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    content = json.load(f)
+                if content.get("version") == CACHE_VERSION:
+                    self.entries = content.get("checks", {})
+            except (OSError, json.JSONDecodeError):
+                self.entries = {}
+
+    def get(self, check_name: str, key: str) -> Optional[List[ValidationIssue]]:
+        entry = self.entries.get(check_name)
+        if not entry or entry.get("key") != key:
+            return None
+        return [ValidationIssue(**issue) for issue in entry.get("issues", [])]
+
+    def put(self, check_name: str, key: str, issues: List[ValidationIssue]):
+        self.entries[check_name] = {"key": key, "issues": [issue.to_dict() for issue in issues]}
+        self._dirty = True
+
+    def save(self):
+        """
+        Écrit le cache, au mieux : le web, l'import Excel, les processus du
+        solveur et main.py l'écrivent en parallèle ; un échec ne fait que
+        rejouer les règles la prochaine fois.
+        """
+        if not self.cache_path or not self._dirty:
+            return
+        try:
+            write_json_atomic(self.cache_path, {"version": CACHE_VERSION, "checks": self.entries})
+        except OSError as e:
+            print(f"  [Validation] AVERTISSEMENT: cache non enregistré ({e}).")
+            return
+        self._dirty = False
+
+
+class _LazyData(Mapping):
+    """Mapping dont chaque valeur n'est chargée qu'au premier accès."""
+
+    def __init__(self, loaders: Dict[str, Callable[[], Any]]):
+        self._loaders = loaders
+        self._values: Dict[str, Any] = {}
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            self._values[key] = self._loaders[key]()
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def __len__(self):
+        return len(self._loaders)
+
+
+def run_checks(
+    digests: Dict[str, str],
+    data: Mapping[str, Any],
+    cache: Optional[ValidationCache] = None,
+    scope: str = "",
+) -> Tuple[List[ValidationIssue], List[str]]:
+    """
+    Exécute les règles de cohérence en réutilisant les résultats en cache.
+
+    `digests` associe chaque rôle de fichier à son empreinte, `scope` distingue
+    les exécutions dont les résultats diffèrent à fichiers égaux (ex: fenêtre
+    de planification). Retourne (anomalies, règles réellement exécutées).
+    """
+    cache = cache or ValidationCache()
+    issues: List[ValidationIssue] = []
+    executed: List[str] = []
+    for name, (files, check) in CHECKS.items():
+        key_parts = [f"{role}={digests.get(role, '')}" for role in files]
+        if "needs" in files:
+            key_parts.append(scope)
+        key = hashlib.sha256("|".join(key_parts).encode('utf-8')).hexdigest()
+
+        cached = cache.get(name, key)
+        if cached is None:
+            cached = check(data)
+            cache.put(name, key, cached)
+            executed.append(name)
+        issues.extend(cached)
+    cache.save()
+    return issues, executed
+
+
+def validate_files(paths: Dict[str, str], cache_path: Optional[str] = None,
+                   start_date=None, end_date=None) -> List[ValidationIssue]:
+    """
+    Valide les fichiers d'entrée sans construire le modèle (utilisé par l'API
+    web après chaque sauvegarde). Seuls les fichiers nécessaires aux règles à
+    rejouer sont lus.
+    """
+    from src.needs_reader import NeedsColumns, read_needs
+
+    def _read(role):
+        try:
+            with open(paths[role], 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _needs():
+        try:
+            return read_needs(paths["needs"], start_date, end_date)
+        except FileNotFoundError:
+            return NeedsColumns()
+
+    def _shift_ids():
+        shifts_data = _read("shifts") or {}
+        return {s["id"] for s in shifts_data.values() if isinstance(s, dict) and "id" in s}
+
+    data = _LazyData({
+        "shift_ids": _shift_ids,
+        "fonctions": lambda: _read("fonctions") or {},
+        "employees": lambda: _read("employees") or [],
+        "needs": _needs,
+    })
+    digests = {role: file_digest(path) for role, path in paths.items()}
+    issues, _ = run_checks(digests, data, ValidationCache(cache_path), scope=f"{start_date}:{end_date}")
+    return issues
+
+
+def validate_documents(documents: Dict[str, Any], cache_path: Optional[str] = None,
+                       start_date=None, end_date=None) -> List[ValidationIssue]:
+    """
+    Même validation que validate_files, sur des documents déjà en mémoire
+    (ex: lus depuis la base SQLite), au format des fichiers d'entrée.
+    """
+    from src.needs_reader import read_needs
+
+    shifts_data = documents.get("shifts") or {}
+    data = _LazyData({
+        "shift_ids": lambda: {s["id"] for s in shifts_data.values() if isinstance(s, dict) and "id" in s},
+        "fonctions": lambda: documents.get("fonctions") or {},
+        "employees": lambda: documents.get("employees") or [],
+        "needs": lambda: read_needs(documents.get("needs") or [], start_date, end_date),
+    })
+    digests = {role: document_digest(document) for role, document in documents.items()}
+    issues, _ = run_checks(digests, data, ValidationCache(cache_path), scope=f"{start_date}:{end_date}")
+    return issues
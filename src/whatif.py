@@ -0,0 +1,293 @@
+# Fichier: src/whatif.py
+"""
+Analyse "et si" des effectifs : chaque variante (départ d'agents, recrues,
+formation à une qualification...) est appliquée aux données préparées, sans
+modifier 01_employees.json, puis résolue avec un budget court, en parallèle
+des autres. Le rapport donne, par variante, l'écart au planning de référence
+sur le manque garanti (src.capacity, borne inférieure par relaxation jour
+par jour), les shifts non couverts et le score.
+
+Les résultats concluants (solution trouvée ou modèle infaisable) sont mis en
+cache par variante, pour une version donnée des entrées et un budget donné :
+reposer la même question ne relance rien. Un budget épuisé sans solution
+(UNKNOWN) n'est pas mis en cache, la variante est résolue à nouveau.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+from concurrent.futures import as_completed
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import src.capacity as capacity
+from src.models import Employee
+from src.utils import write_json_atomic
+from src.scenarios import (build_solver, metrics_from_totals, pool_size, process_pool, silence_output,
+                           solver_threads)
+
+# Types de changement d'une variante
+ADD_AGENT = "ADD_AGENT"
+REMOVE_AGENT = "REMOVE_AGENT"
+ADD_QUALIFICATION = "ADD_QUALIFICATION"
+REMOVE_QUALIFICATION = "REMOVE_QUALIFICATION"
+
+# Groupe des agents ajoutés sans groupe ni modèle (comme DataLoader._load_employee_families)
+DEFAULT_GROUP = "11. Autres"
+
+CACHE_VERSION = 1
+# Statuts CP-SAT mis en cache ; UNKNOWN ne dit rien de la variante, seulement du budget
+CACHED_STATUSES = ("OPTIMAL", "FEASIBLE", "INFEASIBLE")
+# Variantes gardées dans le cache, les plus anciennes sont oubliées d'abord
+MAX_CACHED_RESULTS = 500
+
+
+@dataclass
+class Delta:
+    name: str
+    changes: List[Dict[str, Any]] = field(default_factory=list)  # Vide = planning de référence
+
+
+@dataclass
+class WhatIfResult:
+    delta: Delta
+    status: str  # Statut CP-SAT ("OPTIMAL", "FEASIBLE", "INFEASIBLE", "UNKNOWN")
+    min_shortfall: int  # Manque garanti par le pré-calcul de capacité (borne inférieure)
+    score: Optional[float] = None
+    total_uncovered: Optional[int] = None
+    metrics: Dict[str, Optional[int]] = field(default_factory=dict)
+    solve_time_seconds: Optional[float] = None
+    cached: bool = False
+
+    @property
+    def solved(self) -> bool:
+        return self.status in ("OPTIMAL", "FEASIBLE")
+
+    def marginal(self, baseline: "WhatIfResult") -> Dict[str, Optional[float]]:
+        """Écart à la référence : négatif = mieux que le planning actuel."""
+        both = self.solved and baseline.solved
+        return {
+            "min_shortfall": self.min_shortfall - baseline.min_shortfall,
+            "total_uncovered": self.total_uncovered - baseline.total_uncovered if both else None,
+            "score": self.score - baseline.score if both else None,
+        }
+
+
+def load_deltas(spec: Any) -> List[Delta]:
+    """
+    Variantes d'un document JSON : une liste, ou {"deltas": [...]}. Une
+    variante est {"name": ..., "changes": [changement...]}, ou un changement
+    seul. Changements :
+    - {"type": "REMOVE_AGENT", "agent_ids": [...]}
+    - {"type": "ADD_AGENT", "like": "E012", "count": 2} (mêmes qualifications
+      et même groupe que E012, sans ses congés ni contraintes), ou
+      {"type": "ADD_AGENT", "qualifications": [...], "group": ..., "count": 1}
+    - {"type": "ADD_QUALIFICATION" | "REMOVE_QUALIFICATION", "qualification": "XRAY-F",
+      "agent_ids": [...]} ; sans agent_ids, "count" agents (du "group" si
+      précisé) qui ne l'ont pas encore, ou qui l'ont, dans l'ordre du fichier.
+    """
+    if isinstance(spec, dict):
+        spec = spec.get("deltas", [])
+    deltas = []
+    for i, item in enumerate(spec, 1):
+        changes = item["changes"] if "changes" in item else [{k: v for k, v in item.items() if k != "name"}]
+        deltas.append(Delta(name=item.get("name", f"D{i}"), changes=changes))
+    return deltas
+
+
+def apply_delta(all_data: Dict[str, Any], delta: Delta) -> Dict[str, Any]:
+    """Données préparées de la variante ; `all_data` n'est pas modifié. ValueError si un changement est invalide."""
+    fonctions_map = all_data["fonctions_map"]
+    employees = {e.id: e for e in all_data["employees"]}
+    groups = {name: [e.id for e in members] for name, members in all_data["employee_families"].items()}
+
+    def agent(e_id):
+        if e_id not in employees:
+            raise ValueError(f"{delta.name} : agent inconnu '{e_id}'.")
+        return employees[e_id]
+
+    def with_fonctions(e, fonctions):
+        for fonction in fonctions:
+            if fonction not in fonctions_map:
+                raise ValueError(f"{delta.name} : qualification inconnue '{fonction}'.")
+        qualifications = set().union(*(fonctions_map[f] for f in fonctions))
+        return dataclasses.replace(e, fonctions=set(fonctions), qualifications=qualifications)
+
+    def group_of(e_id):
+        return next((name for name, ids in groups.items() if e_id in ids), DEFAULT_GROUP)
+
+    added = 0
+    for change in delta.changes:
+        kind = change.get("type")
+        if kind == REMOVE_AGENT:
+            for e_id in change["agent_ids"]:
+                agent(e_id)
+                del employees[e_id]
+                for ids in groups.values():
+                    if e_id in ids:
+                        ids.remove(e_id)
+        elif kind == ADD_AGENT:
+            if "like" in change:
+                model = agent(change["like"])
+                fonctions, group = sorted(model.fonctions), change.get("group", group_of(model.id))
+            else:
+                fonctions, group = change["qualifications"], change.get("group", DEFAULT_GROUP)
+            if group not in groups:
+                raise ValueError(f"{delta.name} : groupe inconnu '{group}'.")
+            for _ in range(change.get("count", 1)):
+                added += 1
+                e_id = f"NEW{added:02d}"
+                employees[e_id] = with_fonctions(Employee(id=e_id, name=f"Nouvel agent {added}", fonctions=set(),
+                                                          qualifications=set(), constraints=[]), fonctions)
+                groups[group].append(e_id)
+        elif kind in (ADD_QUALIFICATION, REMOVE_QUALIFICATION):
+            fonction = change["qualification"]
+            adding = kind == ADD_QUALIFICATION
+            if "agent_ids" in change:
+                targets = [agent(e_id) for e_id in change["agent_ids"]]
+            else:
+                pool = [employees[e_id] for e_id in groups.get(change["group"], [])] if "group" in change \
+                    else list(employees.values())
+                targets = [e for e in pool if (fonction in e.fonctions) != adding][:change.get("count", 1)]
+            for e in targets:
+                fonctions = e.fonctions | {fonction} if adding else e.fonctions - {fonction}
+                employees[e.id] = with_fonctions(e, fonctions)
+        else:
+            raise ValueError(f"{delta.name} : type de changement inconnu '{kind}'.")
+
+    return dict(all_data, employees=list(employees.values()),
+                employee_families={name: [employees[e_id] for e_id in ids] for name, ids in groups.items()})
+
+
+def _evaluate(data: Dict[str, Any], time_limit: float, num_workers: int) -> Dict[str, Any]:
+    """Tâche d'un processus : construit et résout le modèle d'une variante."""
+    capacity_report = capacity.analyze_capacity(data)
+    solver = build_solver(data, capacity_report)
+    _, report_data = solver.solve(time_limit=time_limit, num_workers=num_workers, explain=False)
+    result = {"status": solver.status, "min_shortfall": capacity_report.min_shortfall}
+    if report_data:
+        result.update(score=report_data["score"], total_uncovered=report_data["total_uncovered"],
+                      metrics=metrics_from_totals(report_data["penalty_totals"]),
+                      solve_time_seconds=report_data["solve_time_seconds"])
+    return result
+
+
+class WhatIfCache:
+    """Résultats des variantes persistés sur disque, indexés par (entrées, variante, budget)."""
+
+    def __init__(self, cache_path: Optional[str] = None):
+        self.cache_path = cache_path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    content = json.load(f)
+                if content.get("version") == CACHE_VERSION:
+                    self.entries = content.get("results", {})
+            except (OSError, json.JSONDecodeError):
+                self.entries = {}
+
+    @staticmethod
+    def key(data_version: str, delta: Delta, time_limit: float) -> str:
+        canonical = json.dumps([data_version, delta.changes, time_limit], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        result = self.entries.get(key)
+        return result if result is not None and result["status"] in CACHED_STATUSES else None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Garde `result` s'il est concluant (CACHED_STATUSES) ; retourne True dans ce cas."""
+        if result["status"] not in CACHED_STATUSES:
+            return False
+        self.entries.pop(key, None)
+        self.entries[key] = result
+        while len(self.entries) > MAX_CACHED_RESULTS:
+            del self.entries[next(iter(self.entries))]
+        return True
+
+    def save(self):
+        """Écrit le cache, au mieux : un échec ne fait que relancer les variantes la prochaine fois."""
+        if not self.cache_path:
+            return
+        try:
+            write_json_atomic(self.cache_path, {"version": CACHE_VERSION, "results": self.entries})
+        except OSError as e:
+            print(f"  [Et si] AVERTISSEMENT: cache non enregistré ({e}).", flush=True)
+
+
+def run_whatif(all_data: Dict[str, Any], deltas: List[Delta], time_limit: float, data_version: str,
+               cache: Optional[WhatIfCache] = None, max_workers: Optional[int] = None) -> List[WhatIfResult]:
+    """
+    Évalue la référence puis chaque variante sur les données préparées
+    `all_data` (version `data_version`, voir DataLoader.input_digest).
+    Le premier résultat est la référence, les suivants suivent `deltas`.
+    """
+    cache = cache or WhatIfCache()
+    deltas = [Delta("Référence")] + deltas
+    # Variantes construites avant le pool : une erreur de saisie arrête tout de suite
+    variants = [apply_delta(all_data, delta) for delta in deltas]
+    keys = [WhatIfCache.key(data_version, delta, time_limit) for delta in deltas]
+
+    outcomes: List[Optional[Dict[str, Any]]] = [cache.get(key) for key in keys]
+    pending = [i for i, outcome in enumerate(outcomes) if outcome is None]
+    print(f"\n[Et si] {len(deltas)} variante(s), {len(deltas) - len(pending)} déjà en cache.", flush=True)
+    if pending:
+        stored = False
+        processes = pool_size(len(pending), max_workers)
+        with process_pool(processes, silence_output, (), ()) as pool:
+            futures = {pool.submit(_evaluate, variants[i], time_limit, solver_threads(processes)): i for i in pending}
+            for future in as_completed(futures):
+                i = futures[future]
+                outcomes[i] = future.result()
+                stored = cache.put(keys[i], outcomes[i]) or stored
+                print(f"  [{outcomes[i]['status']}] {deltas[i].name}", flush=True)
+        if stored:
+            cache.save()
+
+    pending = set(pending)
+    return [WhatIfResult(delta, cached=i not in pending, **outcome)
+            for i, (delta, outcome) in enumerate(zip(deltas, outcomes))]
+
+
+def format_table(results: List[WhatIfResult]) -> str:
+    """Tableau texte : valeurs de chaque variante et, entre parenthèses, l'écart à la référence (première ligne)."""
+    baseline = results[0]
+
+    def cell(value, diff):
+        if value is None:
+            return ""
+        text = f"{value:.0f}"
+        return text if diff is None else f"{text} ({diff:+.0f})"
+
+    headers = ["Variante", "Statut", "Manque garanti", "Non couverts", "Score", "Temps (s)", ""]
+    rows = []
+    for result in results:
+        diff = result.marginal(baseline) if result is not baseline else {}
+        rows.append([
+            result.delta.name, result.status,
+            cell(result.min_shortfall, diff.get("min_shortfall")),
+            cell(result.total_uncovered, diff.get("total_uncovered")),
+            cell(result.score, diff.get("score")),
+            "" if result.solve_time_seconds is None else f"{result.solve_time_seconds:.1f}",
+            "cache" if result.cached else "",
+        ])
+    widths = [max(len(row[i]) for row in [headers] + rows) for i in range(len(headers))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in [headers] + rows]
+    lines.insert(1, "-" * len(lines[0]))
+    return "\n".join(lines)
+
+
+def whatif_from_loader(loader, deltas_spec: Any, cache_path: Optional[str] = None, time_limit: Optional[float] = None,
+                       max_workers: Optional[int] = None) -> Optional[List[WhatIfResult]]:
+    """Charge les données d'un DataLoader puis évalue les variantes ; None si les données sont inutilisables."""
+    from src.planner import prepare_data
+
+    all_data = prepare_data(loader)
+    if all_data is None:
+        return None
+    settings = all_data["config"].get("whatif", {})
+    time_limit = time_limit or settings.get("time_limit_seconds", 20)
+    return run_whatif(all_data, load_deltas(deltas_spec), time_limit, loader.input_digest(),
+                      WhatIfCache(cache_path), max_workers or settings.get("workers"))
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from raw_planning import load_raw_planning
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Accès au package src/ (écriture atomique)
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+from src.utils import atomic_output
+CSV_PATH = os.path.join(BASE_DIR, "planning_brut.csv")
+
+# Jours de la semaine acceptés dans les opérations (français ou anglais)
+WEEKDAYS = {
+    "LUNDI": 0, "MARDI": 1, "MERCREDI": 2, "JEUDI": 3, "VENDREDI": 4, "SAMEDI": 5, "DIMANCHE": 6,
+    "MONDAY": 0, "TUESDAY": 1, "WEDNESDAY": 2, "THURSDAY": 3, "FRIDAY": 4, "SATURDAY": 5, "SUNDAY": 6,
+}
+
+
+class BatchEditError(Exception):
+    pass
+
+
+# --- SÉLECTION DES JOURS ---
+# Une opération désigne ses jours par "dates" (liste AAAA-MM-JJ), ou par une
+# période "start"/"end" ou "month" (AAAA-MM), éventuellement filtrée par
+# "weekdays" (ex: ["lundi"]). Dans une période, les jours absents du planning
+# sont ignorés ; une date explicite absente est une erreur.
+
+def _select_dates(operation, date_map):
+    if "dates" in operation:
+        dates = [str(d) for d in operation["dates"]]
+        unknown = [d for d in dates if d not in date_map]
+        if unknown:
+            raise BatchEditError(f"Date(s) inconnue(s) dans le planning : {', '.join(unknown)}")
+    else:
+        if "month" in operation:
+            prefix = str(operation["month"])
+            dates = [d for d in date_map if d.startswith(prefix + "-")]
+        else:
+            start, end = operation.get("start"), operation.get("end")
+            if not start and not end:
+                raise BatchEditError(f"Opération sans jours ('dates', 'month' ou 'start'/'end') : {operation}")
+            dates = [d for d in date_map if (not start or d >= start) and (not end or d <= end)]
+    weekdays = operation.get("weekdays")
+    if weekdays:
+        try:
+            wanted = {WEEKDAYS[str(w).upper()] for w in weekdays}
+        except KeyError as e:
+            raise BatchEditError(f"Jour de la semaine inconnu : {e.args[0]}")
+        dates = [d for d in dates if date.fromisoformat(d).weekday() in wanted]
+    return dates
+
+
+def _plan(operations, date_map):
+    """
+    Valide toutes les opérations avant toute modification et les regroupe
+    par colonne, dans l'ordre donné : {colonne: [(op, shift, n ou None)]}.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BatchEditError("Liste d'opérations vide.")
+    by_column = {}
+    for operation in operations:
+        op = operation.get("op") if isinstance(operation, dict) else None
+        if op not in ("add", "delete"):
+            raise BatchEditError(f"Opération inconnue : {operation!r}")
+        shift_id = str(operation.get("shift_id") or "").strip()
+        if not shift_id:
+            raise BatchEditError(f"'shift_id' manquant : {operation!r}")
+        count = operation.get("count", 1 if op == "add" else None)
+        if count is not None and (not isinstance(count, int) or count < 1):
+            raise BatchEditError(f"'count' invalide : {operation!r}")
+        for d in _select_dates(operation, date_map):
+            by_column.setdefault(date_map[d], []).append((op, shift_id, count))
+    return by_column
+
+
+def apply_operations(frame, date_map, operations):
+    """
+    Applique une liste d'opérations au planning brut, en une fois :
+    - {"op": "add", "shift_id": X, "count": n, <jours>} : n shifts X par jour,
+      dans les premières cases vides de la colonne (nouvelles lignes si besoin) ;
+    - {"op": "delete", "shift_id": Y, "count": n (défaut : tous), <jours>} :
+      retire les premiers Y du jour, la colonne est ensuite tassée.
+    Les opérations d'un même jour s'appliquent dans l'ordre donné. Tout ou
+    rien : une opération invalide lève BatchEditError sans rien modifier.
+    Retourne (nouveau DataFrame, diff).
+    """
+    by_column = _plan(operations, date_map)
+    date_of = {col: d for d, col in date_map.items()}
+
+    new_columns = {}
+    changes, missing = [], []
+    for col, column_operations in by_column.items():
+        values = frame[col].to_numpy(dtype=object, copy=True)
+        values[values == ""] = None
+        before = Counter(values[~pd.isna(values)])
+
+        for op, shift_id, count in column_operations:
+            if op == "delete":
+                positions = np.flatnonzero(values == shift_id)
+                if count is not None and len(positions) < count:
+                    missing.append({"date_str": date_of[col], "shift_id": shift_id,
+                                    "requested": count, "found": len(positions)})
+                values[positions[:count]] = None
+                # Colonne tassée : les cases restantes remontent, comme ShiftEditor.remove_shift
+                kept = values[~pd.isna(values)]
+                values = np.full(len(values), None, dtype=object)
+                values[:len(kept)] = kept
+            else:
+                # Premières cases vides, puis nouvelles lignes en bas du tableau
+                holes = np.flatnonzero(pd.isna(values))[:count]
+                values[holes] = shift_id
+                if count > len(holes):
+                    values = np.concatenate([values, np.full(count - len(holes), shift_id, dtype=object)])
+
+        new_columns[col] = values
+        after = Counter(values[~pd.isna(values)])
+        for shift_id in sorted(set(before) | set(after)):
+            if before[shift_id] != after[shift_id]:
+                changes.append({"date_str": date_of[col], "shift_id": shift_id,
+                                "before": before[shift_id], "after": after[shift_id]})
+
+    # Une seule extension du tableau, puis une affectation par colonne modifiée
+    length = max([len(frame)] + [len(values) for values in new_columns.values()])
+    result = frame.reindex(range(length))
+    for col, values in new_columns.items():
+        if len(values) < length:
+            values = np.concatenate([values, np.full(length - len(values), None, dtype=object)])
+        result[col] = values
+
+    changes.sort(key=lambda change: (change["date_str"], change["shift_id"]))
+    diff = {
+        "changes": changes,
+        "added": sum(max(0, c["after"] - c["before"]) for c in changes),
+        "removed": sum(max(0, c["before"] - c["after"]) for c in changes),
+        "rows_added": length - len(frame),
+        "missing": missing,
+    }
+    return result, diff
+
+
+def save_planning(frame, csv_path):
+    """Écrit le planning via un fichier temporaire unique renommé : jamais de fichier à moitié écrit."""
+    with atomic_output(csv_path) as tmp_path:
+        frame.to_csv(tmp_path, index=False, sep=',')
+
+
+def edit_planning(operations, csv_path=CSV_PATH, dry_run=False):
+    """Une transaction : chargement (en cache), toutes les opérations, une sauvegarde. Retourne le diff."""
+    planning = load_raw_planning(csv_path)
+    if not planning.found:
+        raise BatchEditError(f"Aucune ligne de dates trouvée dans {csv_path}.")
+    frame, diff = apply_operations(planning.frame, planning.date_map, operations)
+    if not dry_run and diff["changes"]:
+        save_planning(frame, csv_path)
+    diff["saved"] = not dry_run and bool(diff["changes"])
+    return diff
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Applique une liste d'opérations add/delete au planning brut, en une transaction.")
+    parser.add_argument("--csv_path", default=CSV_PATH, help="Chemin du planning brut (défaut : tool/planning_brut.csv).")
+    parser.add_argument("--operations", required=True, help="Fichier JSON de la liste d'opérations, ou '-' pour stdin.")
+    parser.add_argument("--dry_run", action="store_true", help="Calcule le diff sans sauvegarder.")
+    args = parser.parse_args()
+
+    with (sys.stdin if args.operations == "-" else open(args.operations, encoding='utf-8')) as f:
+        operations = json.load(f)
+    try:
+        diff = edit_planning(operations, args.csv_path, dry_run=args.dry_run)
+    except BatchEditError as e:
+        print(f"ERREUR : {e}")
+        sys.exit(1)
+    except PermissionError:
+        print("ERREUR CRITIQUE : Fermez le fichier Excel avant de lancer le script !")
+        sys.exit(1)
+    print(json.dumps(diff, indent=4, ensure_ascii=False))
@@ -1,34 +1,25 @@
-import pandas as pd
 import json
 import os
-import re
-from collections import defaultdict
-from datetime import datetime
 import argparse
+import glob
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Accès au package src/ (format compact des besoins)
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+from src.needs_templates import compress_needs
+from raw_planning import RawPlanning, load_raw_planning
 DEFAULT_INPUT_CSV = os.path.join(BASE_DIR, "planning_brut.csv")
 DEFAULT_OUTPUT_JSON = os.path.join(BASE_DIR, "04_daily_needs_DEBUG.json")
 
 class NeedExtractorDebug:
-    def __init__(self, input_csv_path=DEFAULT_INPUT_CSV, output_json_path=DEFAULT_OUTPUT_JSON):
+    def __init__(self, input_csv_path=DEFAULT_INPUT_CSV, output_json_path=DEFAULT_OUTPUT_JSON, output_format="flat"):
         self.input_csv = input_csv_path
         self.output_json = output_json_path
-        self.daily_counts = defaultdict(lambda: defaultdict(int))
-
-    def is_date(self, text):
-        """Vérifie si un texte ressemble à une date."""
-        text = str(text).strip()
-        # Patterns : JJ/MM/AA, JJ/MM/AAAA, AAAA-MM-JJ
-        patterns = [
-            r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}", # 01/12/25
-            r"\d{4}[/-]\d{1,2}[/-]\d{1,2}"    # 2025-12-01
-        ]
-        for p in patterns:
-            if re.match(p, text):
-                return True
-        return False
+        # "flat" : liste {date_str, shift_id, count} ; "templates" : modèles par jour de semaine + exceptions
+        self.output_format = output_format
 
     def run(self):
         print(f"\n--- DÉBUT DU DIAGNOSTIC ---", flush=True)
@@ -38,63 +29,32 @@ class NeedExtractorDebug:
             print(f"ERREUR FATALE : Le fichier {self.input_csv} n'est pas trouvé.", flush=True)
             return
 
-        # 1. Lecture brute pour trouver la ligne des dates
+        # 1. Lecture unique : ligne des dates et colonnes dates (tool/raw_planning.py)
         print("1. Recherche de la ligne des dates...", flush=True)
-        df_raw = pd.read_csv(self.input_csv, header=None, dtype=str, sep=None, engine='python')
-        
-        date_row_index = -1
-        for idx, row in df_raw.iterrows():
-            # Compte combien de cellules ressemblent à des dates sur cette ligne
-            date_count = sum(1 for cell in row if self.is_date(cell))
-            print(f"   Ligne {idx} : {list(row.values)[:4]}... -> {date_count} dates trouvées.", flush=True)
-            
-            if date_count > 5: # Si plus de 5 dates sur la ligne, c'est la bonne !
-                date_row_index = idx
-                print(f"   >>> TROUVÉ ! Les dates sont à la ligne {idx}.", flush=True)
-                break
-        
-        if date_row_index == -1:
+        planning = load_raw_planning(self.input_csv)
+
+        if not planning.found:
             print("ERREUR : Impossible de trouver une ligne contenant des dates (JJ/MM/AA).", flush=True)
             print("Vérifiez que votre Excel contient bien des vraies dates (ex: 01/12/2025).", flush=True)
             return
+        print(f"   >>> TROUVÉ ! Les dates sont à la ligne {planning.header_row} ({len(planning.date_map)} jours).", flush=True)
 
-        # 2. Rechargement propre avec la bonne ligne d'en-tête
-        print(f"\n2. Extraction des shifts à partir de la ligne {date_row_index}...", flush=True)
-        df = pd.read_csv(self.input_csv, header=date_row_index, dtype=str, sep=None, engine='python')
-        
-        valid_days = 0
-        for col in df.columns:
-            # Tentative de parsing de date
-            try:
-                date_obj = pd.to_datetime(col, dayfirst=True, errors='coerce')
-                if pd.isna(date_obj): continue
-                
-                date_str = date_obj.strftime("%Y-%m-%d")
-                
-                # Extraction des shifts
-                shifts = df[col].dropna()
-                count = 0
-                for s in shifts:
-                    s = str(s).strip()
-                    if s.upper() not in ["OFF", "RH", "NAN", ""]:
-                        self.daily_counts[date_str][s] += 1
-                        count += 1
-                
-                if count > 0: valid_days += 1
-                
-            except: pass
-
+        # 2. Comptage des shifts par (jour, shift)
+        print(f"\n2. Extraction des shifts à partir de la ligne {planning.header_row}...", flush=True)
+        counts = planning.shift_counts()
+        valid_days = counts["date_str"].nunique()
         print(f"   -> {valid_days} jours avec des shifts trouvés.", flush=True)
 
         # 3. Export
-        final_list = []
-        for d, shifts in self.daily_counts.items():
-            for s, c in shifts.items():
-                final_list.append({"date_str": d, "shift_id": s, "count": c})
+        final_list = [
+            {"date_str": d, "shift_id": shift_id, "count": int(c)}
+            for d, shift_id, c in counts.itertuples(index=False, name=None)
+        ]
+        output = compress_needs(final_list) if self.output_format == "templates" else final_list
         
         if self.output_json:
             with open(self.output_json, 'w', encoding='utf-8') as f:
-                json.dump(final_list, f, indent=4)
+                json.dump(output, f, indent=4)
                 
             print(f"\n3. Résultat :", flush=True)
             print(f"   Fichier généré : {self.output_json}", flush=True)
@@ -105,15 +65,143 @@ class NeedExtractorDebug:
             else:
                 print("   SUCCÈS ! Copiez le contenu de ce fichier DEBUG vers votre vrai fichier daily_needs.", flush=True)
         else:
-            print(json.dumps(final_list, indent=4), flush=True) # Print to stdout for web app
+            print(json.dumps(output, indent=4), flush=True) # Print to stdout for web app
             print("\n--- FIN DU DIAGNOSTIC (JSON imprimé sur stdout) ---", flush=True)
 
+
+# --- MODE LOT ---
+
+def find_csv_files(pattern):
+    """Fichiers CSV d'un dossier (récursif) ou d'un motif glob, triés."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "**", "*.csv")
+    return sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+
+def extract_file(path):
+    """
+    Extrait les besoins d'un fichier, dans un processus du pool : rien n'est
+    affiché, le résultat est un résumé (avec "dates" : jours couverts par
+    le fichier, même sans besoin) et la liste (date_str, shift_id, count).
+    """
+    summary = {"file": path, "ok": False, "days": 0, "needs": 0, "error": None}
+    try:
+        summary["mtime"] = os.path.getmtime(path)
+        planning = RawPlanning(path)
+        if not planning.found:
+            summary["error"] = "Aucune ligne de dates trouvée."
+            return summary, []
+        needs = [(d, shift_id, int(c)) for d, shift_id, c in planning.shift_counts().itertuples(index=False, name=None)]
+        summary.update(ok=True, days=len({d for d, _, _ in needs}), needs=len(needs), dates=sorted(planning.date_map))
+        return summary, needs
+    except Exception as e:
+        summary["error"] = f"{type(e).__name__}: {e}"
+        return summary, []
+
+def merge_needs(results, merge="latest"):
+    """
+    Fusionne les besoins de plusieurs fichiers en un seul jeu sans doublon
+    (date, shift). "latest" : chaque jour vient en entier du fichier le plus
+    récent qui le couvre (un shift absent de ce fichier n'est plus demandé),
+    un conflit est un jour dont les besoins diffèrent d'un fichier plus
+    ancien ; "sum" : les nombres sont additionnés (sites distincts partageant
+    des shifts). Retourne (liste triée par date puis shift, nombre de conflits).
+    """
+    cells = {}
+    if merge == "sum":
+        for _, needs in results:
+            for d, shift_id, count in needs:
+                cells[(d, shift_id)] = cells.get((d, shift_id), 0) + count
+        merged = [{"date_str": d, "shift_id": shift_id, "count": count} for (d, shift_id), count in sorted(cells.items())]
+        return merged, 0
+
+    days = {}  # date -> {shift_id: count} du fichier le plus récent qui la couvre
+    conflicts = set()
+    for summary, needs in sorted(results, key=lambda result: (result[0].get("mtime", 0), result[0]["file"])):
+        by_day = {d: {} for d in summary.get("dates", ())}
+        for d, shift_id, count in needs:
+            by_day.setdefault(d, {})[shift_id] = count
+        for d, counts in by_day.items():
+            if d in days and days[d] != counts:
+                conflicts.add(d)
+            days[d] = counts
+    cells = {(d, shift_id): count for d, counts in days.items() for shift_id, count in counts.items()}
+    conflicts = len(conflicts)
+    merged = [{"date_str": d, "shift_id": shift_id, "count": count} for (d, shift_id), count in sorted(cells.items())]
+    return merged, conflicts
+
+class BatchNeedExtractor:
+    def __init__(self, pattern, output_json_path=None, output_format="flat", workers=None,
+                 merge="latest", summary_json_path=None):
+        self.pattern = pattern
+        self.output_json = output_json_path
+        self.output_format = output_format
+        self.workers = workers
+        self.merge = merge
+        self.summary_json = summary_json_path
+
+    def run(self):
+        paths = find_csv_files(self.pattern)
+        if not paths:
+            print(f"[Batch] ERREUR : aucun fichier CSV pour {self.pattern}.", flush=True)
+            return None
+        print(f"[Batch] {len(paths)} fichier(s) à traiter.", flush=True)
+
+        # Une ligne par fichier, dans l'ordre de fin de traitement
+        results = []
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(extract_file, path) for path in paths]
+            for future in as_completed(futures):
+                summary, needs = future.result()
+                results.append((summary, needs))
+                if summary["ok"]:
+                    print(f"[Batch] OK     {summary['file']} : {summary['days']} jours, {summary['needs']} besoins.", flush=True)
+                else:
+                    print(f"[Batch] ERREUR {summary['file']} : {summary['error']}", flush=True)
+
+        merged, conflicts = merge_needs(results, self.merge)
+        summaries = sorted((summary for summary, _ in results), key=lambda summary: summary["file"])
+        report = {
+            "files": summaries,
+            "ok": sum(summary["ok"] for summary in summaries),
+            "failed": sum(not summary["ok"] for summary in summaries),
+            "merged_needs": len(merged),
+            "conflicts": conflicts,
+            "merge": self.merge,
+        }
+        print(f"[Batch] Résumé : {report['ok']}/{len(summaries)} fichier(s) OK, {len(merged)} besoins fusionnés, "
+              f"{conflicts} conflit(s) résolu(s) ({self.merge}).", flush=True)
+
+        output = compress_needs(merged) if self.output_format == "templates" else merged
+        if self.output_json:
+            with open(self.output_json, 'w', encoding='utf-8') as f:
+                json.dump(output, f, indent=4)
+            print(f"[Batch] Fichier généré : {self.output_json}", flush=True)
+        else:
+            print(json.dumps(output, indent=4), flush=True) # Print to stdout for web app
+        if self.summary_json:
+            with open(self.summary_json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=4, ensure_ascii=False)
+        return report
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extrait les besoins quotidiens d'un fichier CSV de planning.")
     parser.add_argument("--csv_path", default=DEFAULT_INPUT_CSV, help="Chemin vers le fichier CSV de planning (ex: tool/planning_brut.csv).")
     parser.add_argument("--output_json_path", default=None, help="Chemin vers le fichier JSON de sortie. Si non spécifié, imprime sur stdout.")
+    parser.add_argument("--format", choices=["flat", "templates"], default="flat", help="Format de sortie : liste plate ou modèles hebdomadaires + exceptions.")
+
+    parser.add_argument("--batch", default=None, help="Dossier ou motif glob de fichiers CSV (ex: 'archives/2024-*.csv') : extraction en parallèle et fusion.")
+    parser.add_argument("--workers", type=int, default=None, help="Mode lot : nombre de processus (défaut : nombre de CPU).")
+    parser.add_argument("--merge", choices=["latest", "sum"], default="latest", help="Mode lot : même jour dans plusieurs fichiers, il vient en entier du plus récent (latest) ou les nombres s'additionnent par shift (sum).")
+    parser.add_argument("--summary_json_path", default=None, help="Mode lot : fichier JSON du résumé par fichier.")
 
     args = parser.parse_args()
 
-    extractor = NeedExtractorDebug(input_csv_path=args.csv_path, output_json_path=args.output_json_path)
+    if args.batch:
+        report = BatchNeedExtractor(args.batch, output_json_path=args.output_json_path, output_format=args.format,
+                                    workers=args.workers, merge=args.merge,
+                                    summary_json_path=args.summary_json_path).run()
+        sys.exit(0 if report and report["ok"] else 1)
+
+    extractor = NeedExtractorDebug(input_csv_path=args.csv_path, output_json_path=args.output_json_path,
+                                   output_format=args.format)
     extractor.run()
@@ -1,9 +1,10 @@
-import pandas as pd
+import json
 import os
-import re
-from datetime import datetime, timedelta
 import argparse
 
+from batch_edit import BatchEditError, apply_operations, save_planning
+from raw_planning import load_raw_planning
+
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CSV_PATH = os.path.join(BASE_DIR, "planning_brut.csv")
@@ -27,24 +28,12 @@ class MassShiftManager:
             return False
 
         try:
-            # 1. Détection en-tête
-            df_raw = pd.read_csv(self.csv_path, header=None, dtype=str, sep=None, engine='python')
-            for idx, row in df_raw.iterrows():
-                dates_found = sum(1 for cell in row if self._is_date(cell))
-                if dates_found > 5:
-                    self.header_row_idx = idx
-                    break
-            
-            # 2. Chargement
-            self.df = pd.read_csv(self.csv_path, header=self.header_row_idx, dtype=str, sep=None, engine='python')
-            
-            # 3. Mapping dates
-            for col in self.df.columns:
-                try:
-                    d_obj = pd.to_datetime(col, dayfirst=True, errors='coerce')
-                    if not pd.isna(d_obj):
-                        self.date_map[d_obj.strftime("%Y-%m-%d")] = col
-                except: pass
+            # Lecture unique, en-tête et colonnes dates détectés par tool/raw_planning.py
+            planning = load_raw_planning(self.csv_path)
+            self.header_row_idx = max(planning.header_row, 0)
+            # Copie : le cache partagé reste intact jusqu'à la sauvegarde
+            self.df = planning.frame.copy()
+            self.date_map = dict(planning.date_map)
             
             print(f"Planning chargé : {len(self.date_map)} jours identifiés.")
             return True
@@ -52,49 +41,23 @@ class MassShiftManager:
             print(f"Erreur chargement : {e}")
             return False
 
-    def _is_date(self, text):
-        return bool(re.match(r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}", str(text).strip()))
-
-    def _add_single_shift(self, date_str, shift_code):
-        col_name = self.date_map[date_str]
-        series = self.df[col_name]
-        
-        # Cherche le premier trou vide
-        empty_indices = series[series.isna() | (series == "")].index.tolist()
-        
-        if empty_indices:
-            self.df.at[empty_indices[0], col_name] = shift_code
-        else:
-            # Crée nouvelle ligne
-            new_idx = len(self.df)
-            self.df.loc[new_idx] = ""
-            self.df.at[new_idx, col_name] = shift_code
+    def apply_batch(self, operations):
+        """Applique une liste d'opérations (voir batch_edit.apply_operations) en une fois. Retourne le diff."""
+        self.df, diff = apply_operations(self.df, self.date_map, operations)
+        for miss in diff["missing"]:
+            print(f"  [!] {miss['shift_id']} le {miss['date_str']} : {miss['found']}/{miss['requested']} trouvé(s).")
+        return diff
 
     def add_shift_for_month(self, shift_code, count_per_day, year_month):
         try:
-            year, month = map(int, year_month.split('-'))
-            start_date = datetime(year, month, 1)
-            # Calculate the last day of the month
-            end_date = datetime(year, month, 1) + timedelta(days=31)
-            end_date = end_date.replace(day=1) - timedelta(days=1)
-            
-            current_date = start_date
-            total_added = 0
-
-            while current_date <= end_date:
-                date_str_formatted = current_date.strftime("%Y-%m-%d")
-                if date_str_formatted in self.date_map:
-                    for _ in range(count_per_day):
-                        self._add_single_shift(date_str_formatted, shift_code)
-                        total_added += 1
-                current_date += timedelta(days=1)
-            print(f"[MASS ADD] Ajouté '{shift_code}' {count_per_day} fois par jour pour {year_month}. Total: {total_added} shifts.")
-        except Exception as e:
+            diff = self.apply_batch([{"op": "add", "shift_id": shift_code, "count": count_per_day, "month": year_month}])
+            print(f"[MASS ADD] Ajouté '{shift_code}' {count_per_day} fois par jour pour {year_month}. Total: {diff['added']} shifts.")
+        except BatchEditError as e:
             print(f"ERREUR lors de l'ajout en masse de shifts : {e}")
 
     def save(self):
         try:
-            self.df.to_csv(self.csv_path, index=False, sep=',')
+            save_planning(self.df, self.csv_path)
             print(f"--- Sauvegarde réussie dans {self.csv_path} ---")
         except PermissionError:
             print("ERREUR CRITIQUE : Fermez le fichier Excel avant de lancer le script !")
@@ -104,10 +67,11 @@ class MassShiftManager:
 # ==========================================
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Gérer les shifts en masse dans le fichier planning_brut.csv.")
-    parser.add_argument("--action", required=True, choices=["add_month"], help="Action à effectuer (add_month).")
+    parser.add_argument("--action", required=True, choices=["add_month", "batch"], help="Action à effectuer (add_month, ou batch : liste d'opérations JSON).")
     parser.add_argument("--shift_id", help="ID du shift à ajouter (ex: A10-GS).")
     parser.add_argument("--count", type=int, default=1, help="Nombre de fois où ajouter le shift par jour.")
     parser.add_argument("--month", help="Mois au format YYYY-MM pour l'ajout en masse.")
+    parser.add_argument("--operations", help="Action batch : fichier JSON de la liste d'opérations (voir tool/batch_edit.py).")
 
     args = parser.parse_args()
 
@@ -119,4 +83,15 @@ if __name__ == "__main__":
                 print("ERREUR : --shift_id et --month sont requis pour l'action add_month.")
             else:
                 manager.add_shift_for_month(args.shift_id, args.count, args.month)
+        elif args.action == "batch":
+            if not args.operations:
+                print("ERREUR : --operations est requis pour l'action batch.")
+            else:
+                with open(args.operations, encoding='utf-8') as f:
+                    operations = json.load(f)
+                try:
+                    diff = manager.apply_batch(operations)
+                    print(f"[BATCH] {diff['added']} shift(s) ajouté(s), {diff['removed']} supprimé(s).")
+                except BatchEditError as e:
+                    print(f"ERREUR : {e}. Aucune modification.")
         manager.save()
@@ -0,0 +1,95 @@
+import os
+import threading
+
+import pandas as pd
+
+# Une cellule ressemble à une date : JJ/MM/AA, JJ/MM/AAAA, JJ-MM-AA, AAAA-MM-JJ
+DATE_PATTERN = r"^\s*(?:\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}[/-]\d{1,2}[/-]\d{1,2})"
+# Il faut plus de dates que cela sur une ligne pour en faire la ligne d'en-tête
+MIN_HEADER_DATES = 5
+# Cellules qui ne sont pas des shifts à couvrir
+IGNORED_SHIFTS = ("OFF", "RH", "NAN", "")
+
+
+def _column_names(values):
+    """Noms de colonnes tels que pd.read_csv(header=...) les produit (vides -> 'Unnamed: i', doublons -> 'x.1')."""
+    names, seen = [], {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if pd.isna(value) else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+class RawPlanning:
+    """
+    planning_brut.csv lu en une seule passe : la ligne d'en-tête est la
+    première qui contient plus de MIN_HEADER_DATES dates, détectée par une
+    recherche vectorisée sur toutes les cellules. `frame` contient les lignes
+    sous l'en-tête, `date_map` associe chaque date ISO à sa colonne.
+    """
+
+    def __init__(self, path, stat_key=None):
+        self.path = path
+        self.stat_key = stat_key
+        raw = pd.read_csv(path, header=None, dtype=str, sep=None, engine='python')
+
+        # 1. Ligne d'en-tête : nombre de cellules "date" par ligne, en une passe
+        date_counts = raw.apply(lambda column: column.str.match(DATE_PATTERN, na=False)).sum(axis=1)
+        header_rows = date_counts.index[date_counts > MIN_HEADER_DATES]
+        # Sans ligne de dates, la première ligne sert d'en-tête (found = False)
+        self.header_row = int(header_rows[0]) if len(header_rows) else -1
+        position = raw.index.get_loc(self.header_row) if self.header_row >= 0 else 0
+        self.frame = raw.iloc[position + 1:].reset_index(drop=True)
+        self.frame.columns = _column_names(raw.iloc[position].tolist())
+
+        # 2. Colonnes dates, parsées en un seul appel
+        columns = pd.Series(self.frame.columns)
+        parsed = pd.to_datetime(columns.where(columns.str.match(DATE_PATTERN)), dayfirst=True,
+                                errors='coerce', format='mixed')
+        self.date_map = {
+            day.strftime("%Y-%m-%d"): col
+            for col, day in zip(columns, parsed) if not pd.isna(day)
+        }
+
+    @property
+    def found(self):
+        return self.header_row >= 0
+
+    def shift_counts(self):
+        """
+        DataFrame (date_str, shift_id, count) : nombre de shifts par jour, hors
+        OFF/RH/vides. Ordre : jours dans l'ordre des colonnes, shifts dans leur
+        ordre d'apparition dans la colonne.
+        """
+        if not self.date_map:
+            return pd.DataFrame(columns=["date_str", "shift_id", "count"])
+        date_of = {col: day for day, col in self.date_map.items()}
+        # melt parcourt les colonnes l'une après l'autre
+        cells = self.frame[list(date_of)].melt(var_name="column", value_name="shift_id").dropna()
+        cells["shift_id"] = cells["shift_id"].str.strip()
+        cells = cells[~cells["shift_id"].str.upper().isin(IGNORED_SHIFTS)]
+        cells["date_str"] = cells["column"].map(date_of)
+        return cells.groupby(["date_str", "shift_id"], sort=False).size().reset_index(name="count")
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def load_raw_planning(path):
+    """
+    RawPlanning de `path`, relu seulement si le fichier a changé (mtime,
+    taille). Objet partagé : copier `frame` avant de le modifier.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        planning = _cache.get(path)
+        if planning is None or planning.stat_key != key:
+            planning = _cache[path] = RawPlanning(path, key)
+        return planning
@@ -1,13 +1,22 @@
 from flask import Flask, render_template, jsonify, request, redirect, url_for, flash, Response
+from markupsafe import Markup
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 import data_manager
+import event_stream
+import excel_import
+import needs_matrix
+import planning_view
+import report_view
+import solver_pool
+import src.capacity as capacity
+from src.data_loader import DataLoader
 import os
-import pandas as pd
-import subprocess
 import sys
 import json
+import hashlib
 import re
-from collections import OrderedDict
+import uuid
+from datetime import date, timedelta
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your_secret_key' 
@@ -100,135 +109,199 @@ def tools_page():
 def run_solver_page():
     return render_template('run_solver.html')
 
+REPORT_JSON_PATH = os.path.join(app.root_path, os.pardir, 'data', 'output', 'Report.json')
+report_cache = report_view.ReportCache(REPORT_JSON_PATH)
+
 @app.route('/planning_report')
 @login_required
 def planning_report_page():
-    report_path = os.path.join(app.root_path, os.pardir, 'data', 'output', 'Report.txt')
-    report_content = "Rapport non disponible. Veuillez lancer le solveur."
-    if os.path.exists(report_path):
-        with open(report_path, 'r', encoding='utf-8') as f:
-            report_content = f.read()
-    return render_template('planning_report.html', report_content=report_content)
+    # Sections are fetched one by one from /api/report; Report.txt is the fallback for older runs
+    report = report_cache.get()
+    report_content = None
+    if report is None:
+        report_path = os.path.join(app.root_path, os.pardir, 'data', 'output', 'Report.txt')
+        report_content = "Rapport non disponible. Veuillez lancer le solveur."
+        if os.path.exists(report_path):
+            with open(report_path, 'r', encoding='utf-8') as f:
+                report_content = f.read()
+    return render_template('planning_report.html', report=report.outline() if report else None,
+                           report_content=report_content)
+
+@app.route('/api/report', methods=['GET'])
+@login_required
+def report_outline_api():
+    report = report_cache.get()
+    if report is None:
+        return jsonify({"error": "No report yet, run the solver."}), 404
+    response = jsonify(report.outline())
+    response.set_etag(report.version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/report/<string:section>', methods=['GET'])
+@login_required
+def report_section_api(section):
+    """One section of the latest report, optionally filtered by ?group= and/or ?agent= (id or part of a name)."""
+    report = report_cache.get()
+    if report is None:
+        return jsonify({"error": "No report yet, run the solver."}), 404
+    group, agent = request.args.get('group') or None, request.args.get('agent') or None
+    try:
+        text = report_cache.render(report, section, group=group, agent=agent)
+    except report_view.UnknownFilter as e:
+        return jsonify({"error": str(e)}), 404
+    response = jsonify({"version": report.version, "section": section, "group": group, "agent": agent,
+                        "text": text})
+    # The section only changes with the plan: the version is its tag
+    filters = hashlib.sha1(json.dumps([section, group, agent]).encode('utf-8')).hexdigest()[:16]
+    response.set_etag(f"{report.version}-{filters}")
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+PLANNING_CSV_PATH = os.path.join(app.root_path, os.pardir, 'data', 'output', 'Planning.csv')
+PLANNING_TABLE_PATH = os.path.join(app.root_path, os.pardir, 'data', 'output', 'Planning.arrow')
+planning_view_cache = planning_view.PlanningViewCache(PLANNING_CSV_PATH, PLANNING_TABLE_PATH)
+
+def render_planning_group(group_name, rows, dates_meta):
+    return Markup(render_template('_planning_group.html', group_name=group_name, rows=rows,
+                                  columns=len(dates_meta) + 1))
 
 @app.route('/planning_view/<string:planning_type>')
 @login_required
 def planning_view_page(planning_type):
-    file_name = 'Planning.csv'
-    planning_path = os.path.join(app.root_path, os.pardir, 'data', 'output', file_name)
-    
-    # Structures par défaut
-    dates_meta = []  # Liste de { 'col': '2025-12-01', 'short': '01', 'is_weekend': True }
-    grouped_data = OrderedDict() # { 'Groupe A': [ {row}, {row} ] }
-
-    if os.path.exists(planning_path):
-        try:
-            df = pd.read_csv(planning_path)
-            
-            # 1. Identifier les colonnes dates et construire les métadonnées
-            name_col = None
-            for col in df.columns:
-                # On cherche la colonne "Employee" ou "Nom"
-                if col.lower() in ['employee', 'employé', 'nom', 'name']:
-                    name_col = col
-                    continue
-                
-                # On tente de parser les autres comme des dates
-                try:
-                    date_obj = pd.to_datetime(col)
-                    is_we = date_obj.weekday() >= 5
-                    dates_meta.append({
-                        'original_col': col,
-                        'short_name': date_obj.strftime("%d"), # "01"
-                        'is_weekend': is_we
-                    })
-                except:
-                    pass # Colonne ignorée si pas une date
-
-            # 2. Charger les groupes pour le mapping
-            groups_data = data_manager.get_groups() # {'Groupe A': ['E01',...]}
-            employees_data = data_manager.get_employees() # [{'id':'E01', 'name':'Toto'}]
-            
-            # Map Nom -> Groupe
-            id_to_group = {}
-            for g_name, members in groups_data.items():
-                for emp_id in members:
-                    id_to_group[emp_id] = g_name
-            
-            name_to_group = {}
-            for emp in employees_data:
-                grp = id_to_group.get(emp['id'], "11. Autres")
-                name_to_group[emp['name']] = grp
-
-            # 3. Organiser les données par groupe
-            # On convertit le DF en liste de dicts pour faciliter le tri
-            records = df.to_dict(orient='records')
-            
-            # On pré-remplit grouped_data avec l'ordre des groupes défini dans groups_data
-            for g_name in sorted(groups_data.keys()):
-                grouped_data[g_name] = []
-            grouped_data["11. Autres"] = []
-
-            for row in records:
-                agent_name = row.get(name_col, "Inconnu")
-                group = name_to_group.get(agent_name, "11. Autres")
-                
-                # Si le groupe n'existe pas dans la structure (ex: nouveau groupe), on l'ajoute
-                if group not in grouped_data:
-                    grouped_data[group] = []
-                
-                grouped_data[group].append(row)
-
-            # Nettoyage des groupes vides
-            grouped_data = {k: v for k, v in grouped_data.items() if v}
-            
-        except Exception as e:
-            print(f"Erreur processing planning: {e}")
-
-    return render_template('planning_view.html', 
+    # Grouped rows and their HTML are cached until Planning.csv, the groups or the employees change
+    view_model = None
+    try:
+        view_model = planning_view_cache.get(data_manager.get_document(data_manager.GROUPS_FILE),
+                                             data_manager.get_document(data_manager.EMPLOYEES_FILE),
+                                             render_group=render_planning_group)
+    except Exception as e:
+        print(f"Erreur processing planning: {e}")
+
+    return render_template('planning_view.html',
                            planning_type=planning_type.capitalize(),
-                           grouped_data=grouped_data,
-                           dates_meta=dates_meta,
-                           name_col="Employee") # Nom générique pour l'affichage
+                           view_model=view_model)
 
 # --- API ENDPOINTS ---
 
+OUTPUT_DIR = os.path.join(app.root_path, os.pardir, 'data', 'output')
+
+def get_solver_pool():
+    pool_settings = data_manager.get_settings().get("solver_pool", {})
+    return solver_pool.get_pool(workers=pool_settings.get("workers", 1),
+                                max_queued=pool_settings.get("max_queued_jobs", 4))
+
+def submit_solver_job():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    output_paths = (os.path.join(OUTPUT_DIR, 'Planning.csv'), os.path.join(OUTPUT_DIR, 'Report.txt'),
+                    data_manager.plan_store_path(), os.path.join(OUTPUT_DIR, 'Planning.arrow'),
+                    os.path.join(OUTPUT_DIR, 'Report.json'))
+    return get_solver_pool().submit(data_manager.get_solver_inputs(), output_paths)
+
+def sse_response(stream):
+    response = Response(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def channel_response(channel, last_event_id=0):
+    """
+    Streams `channel` from `last_event_id`. A stream follows the channel for
+    at most event_stream.MAX_FOLLOW_SECONDS, and only MAX_SUBSCRIBERS follow
+    at once (beyond that, the events so far are replayed and the stream ends
+    at once): the browser's EventSource reconnects after the retry: delay and
+    resumes from its Last-Event-ID, so no open tab keeps a worker thread.
+    """
+    return sse_response(channel.subscribe(last_event_id))
+
 @app.route('/api/run_solver', methods=['GET'])
 @login_required
 def api_run_solver():
     print("API /api/run_solver called.", flush=True)
-    def generate():
-        main_script_path = os.path.join(app.root_path, os.pardir, 'main.py')
-        try:
-            print(f"Attempting to run solver script: {main_script_path}", flush=True)
-            process = subprocess.Popen(
-                [sys.executable, '-u', main_script_path], 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE, 
-                encoding='latin-1' 
-            )
-
-            for line in iter(process.stdout.readline, ''):
-                print(f"Stdout: {line.strip()}", flush=True)
-                yield f"data: {line.strip()}\n\n"
-
-            stderr_output = []
-            for line in iter(process.stderr.readline, ''):
-                print(f"Stderr: {line.strip()}", flush=True)
-                stderr_output.append(line.strip())
-                yield f"data: {line.strip()}\n\n"
-
-            process.wait()
-
-            if process.returncode != 0:
-                error_msg = f"ERROR: Code de retour {process.returncode}."
-                if stderr_output: error_msg += f" {str(stderr_output)}"
-                yield f"data: \n{error_msg}\n\n"
-            else:
-                yield f"data: \nLe script du solveur a terminé avec succès.\n\n"
-        except Exception as e:
-            yield f"data: \nERROR: Exception: {str(e)}\n\n"
-
-    return Response(generate(), mimetype='text/event-stream')
+    try:
+        job = submit_solver_job()
+    except solver_pool.QueueFullError as e:
+        return sse_response(event_stream.format_sse(f"ERROR: Solveur occupé, réessayez plus tard. {e}"))
+    # EventSource reconnects to the redirected URL: a reconnect resumes this job instead of submitting another
+    return redirect(url_for('job_events_api', job_id=job.id))
+
+@app.route('/api/jobs/<string:job_id>/events', methods=['GET'])
+@login_required
+def job_events_api(job_id):
+    """Progress of a solver job (SSE); resumable, see channel_response for its limits."""
+    job = get_solver_pool().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return channel_response(job.events, event_stream.last_event_id_from(request))
+
+@app.route('/api/jobs', methods=['GET', 'POST'])
+@login_required
+def jobs_api():
+    if request.method == 'GET':
+        return jsonify([job.to_dict() for job in get_solver_pool().jobs()])
+    try:
+        job = submit_solver_job()
+    except solver_pool.QueueFullError as e:
+        return jsonify({"error": f"Solver queue is full. {e}"}), 429
+    return jsonify(job.to_dict()), 202
+
+@app.route('/api/jobs/<string:job_id>', methods=['GET', 'DELETE'])
+@login_required
+def job_api(job_id):
+    pool = get_solver_pool()
+    job = pool.cancel(job_id) if request.method == 'DELETE' else pool.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<string:job_id>/result', methods=['GET'])
+@login_required
+def job_result_api(job_id):
+    job = get_solver_pool().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    if job.result is None:
+        return jsonify({"error": f"Job is {job.status}.", **job.to_dict()}), 409
+    return jsonify({**job.to_dict(), **job.result})
+
+@app.route('/api/capacity', methods=['GET'])
+@login_required
+def capacity_api():
+    """Guaranteed shortfall of the current data (max-flow per day), without running the solver."""
+    loader = DataLoader.from_data(**data_manager.get_solver_inputs())
+    report = capacity.check_capacity(loader)
+    if report is None:
+        return jsonify({"error": "Invalid data.", "issues": [issue.to_dict() for issue in loader.issues]}), 422
+    return jsonify({"summary": report.summary(), **report.to_dict()})
+
+TIME_PATTERN = r'^([01]\d|2[0-3]):([0-5]\d)$'
+
+def shift_master_edit(values):
+    """Checks one tool edit ({action, shift_id, duration, start_time, end_time}) for data_manager.edit_shifts_master."""
+    action = values.get('action')
+    shift_id = values.get('shift_id')
+    if not shift_id:
+        raise data_manager.PatchError("Shift ID required.")
+    if action == 'delete':
+        return {"action": "delete", "shift_id": shift_id}
+    if action != 'add_update':
+        raise data_manager.PatchError("Invalid action.")
+    duration, start_time, end_time = values.get('duration'), values.get('start_time'), values.get('end_time')
+    if not duration or not start_time or not end_time:
+        raise data_manager.PatchError(f"Missing fields for add/update of {shift_id}.")
+    if not re.fullmatch(TIME_PATTERN, start_time) or not re.fullmatch(TIME_PATTERN, end_time):
+        raise data_manager.PatchError(f"Invalid start_time/end_time format (HH:MM) for {shift_id}.")
+    try:
+        duration = int(duration)
+    except (TypeError, ValueError):
+        raise data_manager.PatchError(f"Invalid duration for {shift_id}.")
+    return {"action": "add_update", "shift": {
+        "id": shift_id,
+        "name": shift_id,
+        "start_time": start_time,
+        "end_time": end_time,
+        "duration_minutes": duration
+    }}
 
 @app.route('/api/tool/manage_shift_master', methods=['GET'])
 @login_required
@@ -236,198 +309,345 @@ def api_manage_shift_master():
     def generate_msg(msg, status="SUCCESS"):
         yield f"data: [Manage Shifts] {status}: {msg}\n\n"
 
-    action = request.args.get('action')
+    try:
+        edit = shift_master_edit(request.args)
+    except data_manager.PatchError as e:
+        return Response(generate_msg(str(e), "ERROR"), mimetype='text/event-stream')
+    # One staged patch instead of rewriting the whole shift master
+    diff, _ = data_manager.edit_shifts_master([edit])
     shift_id = request.args.get('shift_id')
-    duration = request.args.get('duration', type=int)
-    start_time = request.args.get('start_time')
-    end_time = request.args.get('end_time')
+    if diff["not_found"]:
+        return Response(generate_msg(f"Shift {shift_id} not found.", "ERROR"), mimetype='text/event-stream')
+    verb = "deleted" if diff["deleted"] else "saved"
+    return Response(generate_msg(f"Shift {shift_id} {verb}."), mimetype='text/event-stream')
 
-    if not shift_id:
-        return Response(generate_msg("Shift ID required.", "ERROR"), mimetype='text/event-stream')
-
-    shifts_master = data_manager.get_shifts_master()
-
-    if action == 'add_update':
-        if not duration or not start_time or not end_time:
-            return Response(generate_msg("Missing fields for add/update.", "ERROR"), mimetype='text/event-stream')
-        
-        if not re.fullmatch(r'^([01]\d|2[0-3]):([0-5]\d)$', start_time):
-             return Response(generate_msg("Invalid start_time format (HH:MM).", "ERROR"), mimetype='text/event-stream')
-
-        shifts_master[shift_id] = {
-            "id": shift_id,
-            "name": shift_id, 
-            "start_time": start_time,
-            "end_time": end_time,
-            "duration_minutes": duration
-        }
-        data_manager.save_shifts_master(shifts_master)
-        return Response(generate_msg(f"Shift {shift_id} saved."), mimetype='text/event-stream')
-
-    elif action == 'delete':
-        if shift_id in shifts_master:
-            del shifts_master[shift_id]
-            data_manager.save_shifts_master(shifts_master)
-            return Response(generate_msg(f"Shift {shift_id} deleted."), mimetype='text/event-stream')
-        else:
-            return Response(generate_msg(f"Shift {shift_id} not found.", "ERROR"), mimetype='text/event-stream')
-
-    return Response(generate_msg("Invalid action.", "ERROR"), mimetype='text/event-stream')
+@app.route('/api/tool/manage_shift_master/batch', methods=['POST'])
+@login_required
+def api_manage_shift_master_batch():
+    """
+    Applies a list of tool edits ([{action, shift_id, duration, start_time,
+    end_time}, ...]) in order and in one write, all or nothing. Answers with
+    the ids added, updated, deleted and not found.
+    """
+    edits = request.get_json()
+    if not isinstance(edits, list) or not edits:
+        return jsonify({"error": "Expected a non-empty list of edits."}), 400
+    try:
+        edits = [shift_master_edit(values if isinstance(values, dict) else {}) for values in edits]
+    except data_manager.PatchError as e:
+        return jsonify({"error": str(e)}), e.status
+    diff, etag = data_manager.edit_shifts_master(edits)
+    response = jsonify({"message": f"{len(edits)} edit(s) applied.", **diff})
+    response.set_etag(etag)
+    return response
 
 @app.route('/api/tool/extract_needs', methods=['GET'])
 @login_required
 def api_extract_needs():
+    """Runs tool/extract_needs.py and streams its output (SSE); resumable, see channel_response for its limits."""
+    # Reconnecting clients pass the stream id they got in the first "stream" event
+    stream_id = request.args.get('stream')
+    if stream_id:
+        channel = event_stream.registry.get(stream_id)
+        if channel is None:
+            return jsonify({"error": "Unknown stream."}), 404
+        return channel_response(channel, event_stream.last_event_id_from(request))
+
     csv_path = request.args.get('csv_path')
-    def generate():
-        tool_script_path = os.path.join(app.root_path, os.pardir, 'tool', 'extract_needs.py')
-        command = [sys.executable, '-u', tool_script_path]
-        if csv_path:
-            command.extend(['--csv_path', csv_path])
-        command.extend(['--output_json_path', '']) 
-        
-        try:
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding='latin-1')
-            for line in iter(process.stdout.readline, ''):
-                yield f"data: {line.strip()}\n\n"
-            
-            stderr_output = []
-            for line in iter(process.stderr.readline, ''):
-                stderr_output.append(line.strip())
-                yield f"data: {line.strip()}\n\n"
-
-            process.wait()
-            if process.returncode == 0:
-                yield "data: \nExtract Needs finished successfully.\n\n"
-            else:
-                yield f"data: \nERROR: Code {process.returncode}. {stderr_output}\n\n"
-        except Exception as e:
-            yield f"data: \nERROR: {str(e)}\n\n"
-
-    return Response(generate(), mimetype='text/event-stream')
+    tool_script_path = os.path.join(app.root_path, os.pardir, 'tool', 'extract_needs.py')
+    command = [sys.executable, '-u', tool_script_path]
+    batch = request.args.get('batch')
+    if batch:
+        # Directory or glob of raw plannings, extracted in parallel and merged
+        command.extend(['--batch', batch])
+    elif csv_path:
+        command.extend(['--csv_path', csv_path])
+    command.extend(['--output_json_path', ''])
+    if request.args.get('format') == 'templates':
+        command.extend(['--format', 'templates'])
+
+    channel = event_stream.registry.create()
+    channel.publish(channel.id, event="stream")
+
+    def on_exit(returncode):
+        if returncode == 0:
+            channel.publish("Extract Needs finished successfully.")
+        else:
+            channel.publish(f"ERROR: Code {returncode}.")
+
+    try:
+        event_stream.stream_process(command, channel, on_exit=on_exit)
+    except Exception as e:
+        channel.publish(f"ERROR: {str(e)}")
+        channel.close()
+    # EventSource reconnects to the redirected URL: a reconnect resumes this run instead of starting another
+    return redirect(url_for('api_extract_needs', stream=channel.id))
 
 # --- DATA API ---
 
+def patch_response(patch):
+    """
+    Applies a list of per-record operations (see data_manager._apply_operations).
+    The change is visible immediately and written to disk by the write-behind
+    flush; run /api/validation for the consistency issues.
+    """
+    try:
+        etag = patch(request.get_json())
+    except data_manager.PatchError as e:
+        return jsonify({"error": str(e)}), e.status
+    response = jsonify({"message": "Changes applied."})
+    response.set_etag(etag)
+    return response
+
+def list_arg(name):
+    """Values of a query parameter given repeated (?a=x&a=y) or comma-separated (?a=x,y)."""
+    return [v.strip() for value in request.args.getlist(name) for v in value.split(',') if v.strip()]
+
+def document_response(document):
+    """
+    Serves a cached input document (data_manager.CachedDocument) as JSON with
+    an ETag, answering conditional GETs with 304 and gzip-compressing large
+    bodies when the client accepts it.
+    """
+    body, etag = document.body, document.etag
+    use_gzip = len(body) >= data_manager.GZIP_MIN_BYTES and 'gzip' in request.accept_encodings
+    if use_gzip:
+        # Each encoding is a distinct representation, hence a distinct tag
+        body, etag = document.gzipped(), f"{etag}-gz"
+
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response.make_conditional(request)
+
 @app.route('/api/settings', methods=['GET', 'POST'])
 @login_required
 def settings_api():
     if request.method == 'GET':
-        return jsonify(data_manager.get_settings())
+        return document_response(data_manager.get_document(data_manager.SETTINGS_FILE))
     elif request.method == 'POST':
         data_manager.save_settings(request.get_json())
         return jsonify({"message": "Settings updated!"})
 
-@app.route('/api/employees', methods=['GET', 'POST'])
+@app.route('/api/validation', methods=['GET'])
+@login_required
+def validation_api():
+    issues = data_manager.validate_inputs()
+    return jsonify({"valid": not issues, "issues": issues})
+
+@app.route('/api/employees', methods=['GET', 'POST', 'PATCH'])
 @login_required
 def employees_api():
     if request.method == 'GET':
-        return jsonify(data_manager.get_employees())
+        return document_response(data_manager.get_document(data_manager.EMPLOYEES_FILE))
     elif request.method == 'POST':
         data_manager.save_employees(request.get_json())
-        return jsonify({"message": "Employees updated!"})
+        return jsonify({"message": "Employees updated!", "issues": data_manager.validate_inputs()})
+    elif request.method == 'PATCH':
+        return patch_response(data_manager.patch_employees)
 
-@app.route('/api/fonctions', methods=['GET', 'POST'])
+@app.route('/api/fonctions', methods=['GET', 'POST', 'PATCH'])
 @login_required
 def fonctions_api():
     if request.method == 'GET':
-        return jsonify(data_manager.get_fonctions())
+        return document_response(data_manager.get_document(data_manager.FONCTIONS_FILE))
     elif request.method == 'POST':
         data_manager.save_fonctions(request.get_json())
-        return jsonify({"message": "Fonctions updated!"})
+        return jsonify({"message": "Fonctions updated!", "issues": data_manager.validate_inputs()})
+    elif request.method == 'PATCH':
+        return patch_response(data_manager.patch_fonctions)
 
-@app.route('/api/shifts_master', methods=['GET', 'POST'])
+@app.route('/api/shifts_master', methods=['GET', 'POST', 'PATCH'])
 @login_required
 def shifts_master_api():
     if request.method == 'GET':
-        return jsonify(data_manager.get_shifts_master())
+        return document_response(data_manager.get_document(data_manager.SHIFTS_MASTER_FILE))
     elif request.method == 'POST':
         data_manager.save_shifts_master(request.get_json())
-        return jsonify({"message": "Shifts master updated!"})
+        return jsonify({"message": "Shifts master updated!", "issues": data_manager.validate_inputs()})
+    elif request.method == 'PATCH':
+        return patch_response(data_manager.patch_shifts_master)
 
-@app.route('/api/daily_needs', methods=['GET', 'POST'])
+@app.route('/api/daily_needs', methods=['GET', 'POST', 'PATCH'])
 @login_required
 def daily_needs_api():
     if request.method == 'GET':
-        return jsonify(data_manager.get_daily_needs())
+        # Flat list by default (what the pages edit), ?format=templates for the stored compact form
+        if request.args.get('format') == 'templates':
+            return document_response(data_manager.get_document(data_manager.DAILY_NEEDS_FILE))
+        return document_response(data_manager.get_flat_needs_document())
     elif request.method == 'POST':
         data_manager.save_daily_needs(request.get_json())
-        return jsonify({"message": "Daily needs updated!"})
+        return jsonify({"message": "Daily needs updated!", "issues": data_manager.validate_inputs()})
+    elif request.method == 'PATCH':
+        return patch_response(data_manager.patch_daily_needs)
+
+@app.route('/api/daily_needs/format', methods=['POST'])
+@login_required
+def daily_needs_format_api():
+    """Stores the daily needs as weekly templates + exceptions, or back as the flat list."""
+    needs_format = (request.get_json() or {}).get('format')
+    if needs_format not in ('templates', 'flat'):
+        return jsonify({"error": "format must be 'templates' or 'flat'."}), 400
+    data_manager.set_daily_needs_format(needs_format)
+    return jsonify({"message": f"Daily needs stored as {needs_format}.",
+                    "size": len(data_manager.get_document(data_manager.DAILY_NEEDS_FILE).body)})
+
+@app.route('/api/daily_needs/matrix', methods=['GET', 'PATCH'])
+@login_required
+def daily_needs_matrix_api():
+    """
+    Daily needs as a date x shift matrix. GET takes start/end (YYYY-MM-DD) and
+    shift filters, at most one year (a missing bound is clamped to it); PATCH takes {"cells": [[date, shift_id, count], ...],
+    "copy_week": {...}, "fill_pattern": {...}} (see needs_matrix.patch_matrix).
+    """
+    if request.method == 'PATCH':
+        try:
+            changed, etag = needs_matrix.patch_matrix(request.get_json())
+        except data_manager.PatchError as e:
+            return jsonify({"error": str(e)}), e.status
+        response = jsonify({"message": f"{changed} cell(s) updated.", "changed": changed})
+        response.set_etag(etag)
+        return response
+
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = date.fromisoformat(start) if start else None
+        end = date.fromisoformat(end) if end else None
+    except ValueError:
+        return jsonify({"error": "Dates must use YYYY-MM-DD."}), 400
+    # One grid for both the body and the ETag, even if the needs change meanwhile
+    grid = needs_matrix.get_grid()
+    try:
+        body = grid.window(start, end, list_arg('shift'))
+    except needs_matrix.WindowError as e:
+        return jsonify({"error": str(e)}), 400
+    response = jsonify(body)
+    response.set_etag(grid.etag)
+    return response.make_conditional(request)
 
 @app.route('/api/groups', methods=['GET', 'POST'])
 @login_required
 def groups_api():
     if request.method == 'GET':
-        return jsonify(data_manager.get_groups())
+        return document_response(data_manager.get_document(data_manager.GROUPS_FILE))
     elif request.method == 'POST':
         data_manager.save_groups(request.get_json())
         return jsonify({"message": "Groups updated!"})
 
+PLANNING_PAGE_SIZE = 100
+PLANNING_MAX_PAGE_SIZE = 1000
+
+@app.route('/api/planning', methods=['GET'])
+@login_required
+def planning_api():
+    """
+    Latest plan as JSON, served from the in-memory PlanIndex.
+    Filters: start/end (YYYY-MM-DD) or days=N from start (default today),
+    group, employee (id or name), shift, fonction (its shifts).
+    Projection: fields=employee,id,group,shifts. Paging: offset, limit.
+    """
+    index = planning_view_cache.get_index(data_manager.get_document(data_manager.GROUPS_FILE),
+                                          data_manager.get_document(data_manager.EMPLOYEES_FILE))
+    if index is None:
+        return jsonify({"error": "No plan yet, run the solver first."}), 404
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = date.fromisoformat(start) if start else None
+        end = date.fromisoformat(end) if end else None
+        days = request.args.get('days', type=int)
+        if days:
+            start = start or date.today()
+            end = start + timedelta(days=days - 1)
+    except ValueError:
+        return jsonify({"error": "Dates must use YYYY-MM-DD."}), 400
+
+    shifts = list_arg('shift')
+    fonctions = list_arg('fonction')
+    if fonctions:
+        qualifications = {f.get("id"): f.get("qualifications", []) for f in data_manager.get_fonctions().get("functions", [])}
+        shifts += [shift_id for fonction in fonctions for shift_id in qualifications.get(fonction, [])]
+        if not shifts:
+            return jsonify({"error": f"Unknown fonction: {', '.join(fonctions)}."}), 404
+
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(max(1, request.args.get('limit', PLANNING_PAGE_SIZE, type=int)), PLANNING_MAX_PAGE_SIZE)
+    result = index.query(start=start, end=end, groups=list_arg('group'), employees=list_arg('employee'),
+                         shifts=shifts, fields=list_arg('fields'), offset=offset, limit=limit)
+    if offset + limit < result["total"]:
+        result["next_offset"] = offset + limit
+    return jsonify(result)
+
+@app.route('/api/plans', methods=['GET'])
+@login_required
+def plans_api():
+    store = data_manager.get_store()
+    if store is None:
+        return jsonify({"error": "Plan history requires the SQLite storage backend."}), 404
+    return jsonify(store.plans())
+
+@app.route('/api/plans/<int:version>', methods=['GET'])
+@login_required
+def plan_api(version):
+    """One saved plan; ?employee=<id or name> or ?start=/&end= (YYYY-MM-DD) narrow it down."""
+    store = data_manager.get_store()
+    if store is None:
+        return jsonify({"error": "Plan history requires the SQLite storage backend."}), 404
+    employee = request.args.get('employee')
+    if employee:
+        return jsonify({employee: store.plan_for(employee, version)})
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = date.fromisoformat(start) if start else None
+        end = date.fromisoformat(end) if end else None
+    except ValueError:
+        return jsonify({"error": "Dates must use YYYY-MM-DD."}), 400
+    return jsonify(store.plan(version, start, end))
+
 @app.route('/api/upload_excel', methods=['POST'])
 @login_required
 def upload_excel():
+    """
+    Starts a background import of the workbook and answers 202 with the job.
+    Progress is streamed by /api/imports/<job_id>/events; sheets are saved
+    together, only if every row is valid (see excel_import).
+    """
     if 'excel_file' not in request.files:
         return jsonify({"error": "No file part"}), 400
     file = request.files['excel_file']
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
-    if file:
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-        file.save(filepath)
-        try:
-            xls = pd.ExcelFile(filepath)
-            messages = []
-            
-            if 'Employees' in xls.sheet_names:
-                df = pd.read_excel(filepath, sheet_name='Employees')
-                data = df.to_dict(orient='records')
-                for emp in data:
-                    if 'fonctions' in emp and isinstance(emp['fonctions'], str):
-                        emp['fonctions'] = [f.strip() for f in emp['fonctions'].split(',') if f.strip()]
-                    else: emp['fonctions'] = []
-                    
-                    if 'constraints' in emp and isinstance(emp['constraints'], str):
-                        try: emp['constraints'] = json.loads(emp['constraints'])
-                        except: emp['constraints'] = []
-                    else: emp['constraints'] = []
-                data_manager.save_employees(data)
-                messages.append('Employees updated.')
-
-            if 'Functions' in xls.sheet_names:
-                df = pd.read_excel(filepath, sheet_name='Functions')
-                data = {"functions": df.to_dict(orient='records')}
-                for f in data['functions']:
-                    if 'qualifications' in f and isinstance(f['qualifications'], str):
-                        f['qualifications'] = [q.strip() for q in f['qualifications'].split(',') if q.strip()]
-                    else: f['qualifications'] = []
-                data_manager.save_fonctions(data)
-                messages.append('Functions updated.')
-            
-            if 'Shifts' in xls.sheet_names:
-                df = pd.read_excel(filepath, sheet_name='Shifts')
-                data = {row['id']: row.to_dict() for _, row in df.iterrows()}
-                data_manager.save_shifts_master(data)
-                messages.append('Shifts updated.')
-
-            if 'Daily Needs' in xls.sheet_names:
-                df = pd.read_excel(filepath, sheet_name='Daily Needs')
-                data_manager.save_daily_needs(df.to_dict(orient='records'))
-                messages.append('Daily Needs updated.')
-
-            if 'Groups' in xls.sheet_names:
-                df = pd.read_excel(filepath, sheet_name='Groups')
-                groups = {}
-                for _, row in df.iterrows():
-                    g = str(row['group_name']).strip()
-                    e = str(row['employee_id']).strip()
-                    if g not in groups: groups[g] = []
-                    if e: groups[g].append(e)
-                data_manager.save_groups(groups)
-                messages.append('Groups updated.')
-
-            os.remove(filepath)
-            if not messages: messages.append("No valid sheets found.")
-            return jsonify({"message": " ".join(messages)}), 200
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
+    extension = os.path.splitext(file.filename)[1].lower()
+    if extension not in ('.xlsx', '.xlsm', '.xls'):
+        return jsonify({"error": "Expected an .xlsx or .xls workbook."}), 400
+    # Stored under a unique name: two uploads of the same file never collide
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}{extension}")
+    file.save(filepath)
+    job = excel_import.imports.submit(filepath, file.filename)
+    return jsonify(job.to_dict()), 202
+
+@app.route('/api/imports/<string:job_id>', methods=['GET'])
+@login_required
+def import_api(job_id):
+    job = excel_import.imports.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown import."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/imports/<string:job_id>/events', methods=['GET'])
+@login_required
+def import_events_api(job_id):
+    """Progress of an Excel import (SSE); resumable, see channel_response for its limits."""
+    job = excel_import.imports.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown import."}), 404
+    return channel_response(job.events, event_stream.last_event_id_from(request))
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -1,9 +1,22 @@
+import gzip
+import hashlib
 import json
 import os
+import sys
+import threading
+import atexit
 
 # Assuming data_manager.py is in web_app/
 # And JSON files are in data/input/ relative to the project root
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from src.needs_reader import DateParser
+from src.needs_templates import compress_needs, is_template_document, to_flat
+from src.storage import store_from_config
+from src.utils import temp_path_for, write_json_atomic
+from src.validation import validate_documents, validate_files
 DATA_DIR = os.path.join(BASE_DIR, 'data', 'input')
 
 EMPLOYEES_FILE = os.path.join(DATA_DIR, '01_employees.json')
@@ -12,16 +25,313 @@ SHIFTS_MASTER_FILE = os.path.join(DATA_DIR, '03_shifts_master.json')
 DAILY_NEEDS_FILE = os.path.join(DATA_DIR, '04_daily_needs.json')
 GROUPS_FILE = os.path.join(DATA_DIR, '05_groups.json')
 SETTINGS_FILE = os.path.join(BASE_DIR, 'config', 'settings.json')
+VALIDATION_CACHE_FILE = os.path.join(BASE_DIR, 'data', 'cache', 'validation_cache.json')
+
+# Input documents that can live in the SQLite store instead of their JSON file
+STORE_ROLES = {
+    EMPLOYEES_FILE: "employees",
+    FONCTIONS_FILE: "fonctions",
+    SHIFTS_MASTER_FILE: "shifts",
+    DAILY_NEEDS_FILE: "needs",
+    GROUPS_FILE: "groups",
+}
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+# Patched documents are written to disk at most this many seconds after the first change
+WRITE_BEHIND_DELAY = 1.0
+
+
+class CachedDocument:
+    """
+    A parsed JSON file kept in memory with its raw bytes, so GET endpoints can
+    serve the file as-is (and gzip it once) instead of re-parsing and
+    re-serializing it on every request.
+    """
+    __slots__ = ("stat_key", "data", "body", "etag", "_gzipped")
+
+    def __init__(self, stat_key, body, data=None):
+        self.stat_key = stat_key
+        self.body = body
+        if data is None:
+            data = json.loads(body) if body.strip() else {}
+        self.data = data
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self._gzipped = None
+
+    @classmethod
+    def from_data(cls, data):
+        """Document not written yet: serialized the way save_json_file writes it."""
+        body = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+        return cls(None, body, data)
+
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6)
+        return self._gzipped
+
+
+_documents = {}
+# Patched documents waiting for the write-behind flush, by path
+_unwritten = {}
+_documents_lock = threading.RLock()
+_flush_timer = None
+_MISSING_DOCUMENT = CachedDocument(None, b"{}")
+
+def _stat_key(filepath):
+    try:
+        st = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def get_document(filepath):
+    """
+    Cached document for `filepath`. The file is only read again when its
+    mtime or size changed (edited by hand, by a tool...) or after a save.
+    Patches not flushed yet are already visible here.
+    """
+    with _documents_lock:
+        document = _unwritten.get(filepath)
+        if document is not None:
+            return document
+        role = STORE_ROLES.get(filepath)
+        store = get_store() if role else None
+        if store is not None:
+            return _get_stored_document(store, role, filepath)
+        key = _stat_key(filepath)
+        if key is None:
+            return _MISSING_DOCUMENT
+        document = _documents.get(filepath)
+        if document is None or document.stat_key != key:
+            with open(filepath, 'rb') as f:
+                body = f.read()
+            # The file may have changed between stat() and read()
+            document = CachedDocument(_stat_key(filepath), body)
+            _documents[filepath] = document
+        return document
+
+def _get_stored_document(store, role, filepath):
+    # The store revision plays the part of the file mtime
+    key = ("sqlite", store.revision(role))
+    document = _documents.get(filepath)
+    if document is None or document.stat_key != key:
+        document = CachedDocument.from_data(store.get_document(role))
+        document.stat_key = key
+        _documents[filepath] = document
+    return document
 
 def load_json_file(filepath):
-    if not os.path.exists(filepath):
-        return {}
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    # Shared cached object: callers must copy it before modifying it
+    return get_document(filepath).data
+
+def _write_atomic(filepath, body):
+    """Writes to a unique temp file in the same directory, then renames it over the target."""
+    write_json_atomic(filepath, body, fsync=True)
+
+def _persist(filepath, document):
+    role = STORE_ROLES.get(filepath)
+    store = get_store() if role else None
+    if store is not None:
+        store.replace_document(role, document.data)
+        document.stat_key = ("sqlite", store.revision(role))
+    else:
+        _write_atomic(filepath, document.body)
+        document.stat_key = _stat_key(filepath)
+    _documents[filepath] = document
 
 def save_json_file(filepath, data):
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    document = CachedDocument.from_data(data)
+    with _documents_lock:
+        # A full save supersedes any patch still waiting for the flush
+        _unwritten.pop(filepath, None)
+        _persist(filepath, document)
+
+def save_json_files(documents):
+    """
+    Saves several documents ({filepath: data}) all or none (Excel import).
+    With the SQLite backend this is one transaction; with JSON files every
+    temp file is written first, and files already replaced are restored if
+    a later rename fails.
+    """
+    prepared = {filepath: CachedDocument.from_data(data) for filepath, data in documents.items()}
+    with _documents_lock:
+        # Pending patches are written first, an import replaces them anyway
+        flush()
+        store = get_store()
+        if store is not None and all(filepath in STORE_ROLES for filepath in prepared):
+            store.replace_documents({STORE_ROLES[filepath]: document.data for filepath, document in prepared.items()})
+            for filepath, document in prepared.items():
+                document.stat_key = ("sqlite", store.revision(STORE_ROLES[filepath]))
+                _documents[filepath] = document
+            return
+
+        previous = {}
+        tmp_paths = {}
+        try:
+            for filepath, document in prepared.items():
+                try:
+                    with open(filepath, 'rb') as f:
+                        previous[filepath] = f.read()
+                except FileNotFoundError:
+                    previous[filepath] = None
+                tmp_paths[filepath] = temp_path_for(filepath)
+                with open(tmp_paths[filepath], 'wb') as f:
+                    f.write(document.body)
+                    f.flush()
+                    os.fsync(f.fileno())
+        except OSError:
+            _remove_temp_files(tmp_paths.values())
+            raise
+
+        replaced = []
+        try:
+            for filepath in prepared:
+                os.replace(tmp_paths[filepath], filepath)
+                replaced.append(filepath)
+        except OSError:
+            for filepath in replaced:
+                if previous[filepath] is None:
+                    os.remove(filepath)
+                else:
+                    _write_atomic(filepath, previous[filepath])
+            _remove_temp_files(tmp_paths[filepath] for filepath in prepared if filepath not in replaced)
+            raise
+        for filepath, document in prepared.items():
+            document.stat_key = _stat_key(filepath)
+            _documents[filepath] = document
+
+def _remove_temp_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _stage(filepath, data):
+    """Makes `data` the current version of `filepath` and schedules the write."""
+    global _flush_timer
+    with _documents_lock:
+        document = _unwritten[filepath] = CachedDocument.from_data(data)
+        if _flush_timer is None:
+            # Not re-armed by later patches: a burst of edits costs one write
+            _flush_timer = threading.Timer(WRITE_BEHIND_DELAY, flush)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+        return document
+
+def flush():
+    """Writes every pending patched document to disk (timer, exit, before solves)."""
+    global _flush_timer
+    with _documents_lock:
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+        for filepath, document in list(_unwritten.items()):
+            _persist(filepath, document)
+            del _unwritten[filepath]
+
+atexit.register(flush)
+
+
+_store = None
+_store_config = None
+
+def get_store():
+    """
+    SqliteStore when settings.json selects the SQLite backend, else None (JSON files).
+    An empty database is seeded from data/input/ on first use.
+    """
+    global _store, _store_config
+    storage = (get_settings() or {}).get("storage")
+    if storage != _store_config:
+        _store_config = storage
+        _store = store_from_config(get_settings(), BASE_DIR, seed_dir=DATA_DIR)
+    return _store
+
+
+# --- PER-RECORD PATCHES ---
+
+class PatchError(Exception):
+    """A patch operation that cannot be applied. `status` is the HTTP status to answer."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+_date_parser = DateParser()
+
+def _need_key(record):
+    if not isinstance(record, dict):
+        raise PatchError("A need is identified by 'date_str' and 'shift_id'.")
+    date_str, shift_id = record.get("date_str"), record.get("shift_id")
+    if not date_str or not shift_id:
+        raise PatchError("A need is identified by 'date_str' and 'shift_id'.")
+    # Dates are compared as days, whatever their format in the file
+    day = _date_parser.to_ordinal(str(date_str))
+    if day is None:
+        raise PatchError(f"Unknown date format: '{date_str}'.")
+    return (day, shift_id)
+
+def _id_key(record):
+    if isinstance(record, dict):
+        record = record.get("id")
+    if not record:
+        raise PatchError("Record 'id' is required.")
+    return record
+
+def _apply_operations(records, operations, key_of, prepare=lambda record: record):
+    """
+    Applies add/update/delete operations to a list of records (a copy), all
+    or nothing. Each operation is {"op": "add", "record": {...}},
+    {"op": "update", "key": ..., "changes": {...}} or {"op": "delete", "key": ...}.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise PatchError("Expected a non-empty list of operations.")
+    positions = {}
+    for i, record in enumerate(records):
+        try:
+            positions[key_of(record)] = i
+        except PatchError:
+            pass  # Malformed record already in the file: kept as is, not addressable
+    for operation in operations:
+        op = operation.get("op") if isinstance(operation, dict) else None
+        if op == "add":
+            record = prepare(dict(operation.get("record") or {}))
+            key = key_of(record)
+            if key in positions:
+                raise PatchError(f"Record {operation['record']} already exists.", status=409)
+            positions[key] = len(records)
+            records.append(record)
+        elif op in ("update", "delete"):
+            key = key_of(operation.get("key"))
+            position = positions.get(key)
+            if position is None:
+                raise PatchError(f"Record {operation.get('key')} not found.", status=404)
+            if op == "delete":
+                records[position] = None
+                del positions[key]
+                continue
+            record = {**records[position], **prepare(dict(operation.get("changes") or {}))}
+            new_key = key_of(record)
+            if new_key != key:
+                raise PatchError("Identifying fields cannot be changed, delete and add the record instead.")
+            records[position] = record
+        else:
+            raise PatchError(f"Unknown operation: {operation!r}.")
+    return [record for record in records if record is not None]
+
+def _patch(filepath, transform):
+    """
+    Applies `transform` to a private copy of the current document and stages
+    the result for the write-behind flush. Returns the new ETag.
+    """
+    with _documents_lock:
+        document = get_document(filepath)
+        # Re-parsing the raw bytes gives a private copy of the cached data
+        data = transform(json.loads(document.body))
+        return _stage(filepath, data).etag
 
 def get_settings():
     return load_json_file(SETTINGS_FILE)
@@ -32,20 +342,23 @@ def save_settings(settings_data):
 def get_employees():
     return load_json_file(EMPLOYEES_FILE)
 
-def save_employees(employees_data):
+def _stored_employee(emp):
     # Transformer les données pour que 'fonctions' soit stocké comme 'qualifications'
     # pour la compatibilité avec data_loader.py
-    transformed_employees_data = []
-    for emp in employees_data:
-        transformed_emp = emp.copy()
-        if "fonctions" in transformed_emp:
-            # Copier la liste des fonctions sous la clé 'qualifications'
-            transformed_emp["qualifications"] = transformed_emp["fonctions"]
-            # Supprimer la clé 'fonctions' si elle ne doit pas être persistée séparément
-            del transformed_emp["fonctions"]
-        transformed_employees_data.append(transformed_emp)
-    
-    save_json_file(EMPLOYEES_FILE, transformed_employees_data)
+    transformed_emp = emp.copy()
+    if "fonctions" in transformed_emp:
+        # Copier la liste des fonctions sous la clé 'qualifications'
+        transformed_emp["qualifications"] = transformed_emp["fonctions"]
+        # Supprimer la clé 'fonctions' si elle ne doit pas être persistée séparément
+        del transformed_emp["fonctions"]
+    return transformed_emp
+
+def save_employees(employees_data):
+    save_json_file(EMPLOYEES_FILE, [_stored_employee(emp) for emp in employees_data])
+
+def patch_employees(operations):
+    return _patch(EMPLOYEES_FILE, lambda employees: _apply_operations(
+        employees or [], operations, _id_key, prepare=_stored_employee))
 
 def get_fonctions():
     return load_json_file(FONCTIONS_FILE)
@@ -53,20 +366,129 @@ def get_fonctions():
 def save_fonctions(fonctions_data):
     save_json_file(FONCTIONS_FILE, fonctions_data)
 
+def patch_fonctions(operations):
+    def _transform(fonctions):
+        fonctions = fonctions or {}
+        fonctions["functions"] = _apply_operations(fonctions.get("functions", []), operations, _id_key)
+        return fonctions
+    return _patch(FONCTIONS_FILE, _transform)
+
 def get_shifts_master():
     return load_json_file(SHIFTS_MASTER_FILE)
 
 def save_shifts_master(shifts_master_data):
     save_json_file(SHIFTS_MASTER_FILE, shifts_master_data)
 
+def patch_shifts_master(operations):
+    # Stored as {id: shift}, patched as a list of shifts to share the operation logic
+    return _patch(SHIFTS_MASTER_FILE, lambda shifts: {
+        shift["id"]: shift
+        for shift in _apply_operations(list((shifts or {}).values()), operations, _id_key)
+    })
+
+def edit_shifts_master(edits):
+    """
+    Upserts ({"action": "add_update", "shift": {...}}) and deletes
+    ({"action": "delete", "shift_id": ...}) shifts in one staged write, in
+    order. Returns the diff ({added, updated, deleted, not_found} ids) and the new ETag.
+    """
+    diff = {"added": [], "updated": [], "deleted": [], "not_found": []}
+    def _transform(shifts):
+        shifts = shifts or {}
+        for edit in edits:
+            if edit["action"] == "delete":
+                found = shifts.pop(edit["shift_id"], None) is not None
+                diff["deleted" if found else "not_found"].append(edit["shift_id"])
+            else:
+                shift = edit["shift"]
+                diff["updated" if shift["id"] in shifts else "added"].append(shift["id"])
+                shifts[shift["id"]] = shift
+        return shifts
+    etag = _patch(SHIFTS_MASTER_FILE, _transform)
+    return diff, etag
+
 def get_daily_needs():
     return load_json_file(DAILY_NEEDS_FILE)
 
 def save_daily_needs(daily_needs_data):
     save_json_file(DAILY_NEEDS_FILE, daily_needs_data)
 
+def _patch_needs(transform):
+    # Patches work on the flat list; a weekly templates document is re-compressed afterwards
+    def _on_flat(needs):
+        if is_template_document(needs):
+            return compress_needs(transform(to_flat(needs)))
+        return transform(needs or [])
+    return _patch(DAILY_NEEDS_FILE, _on_flat)
+
+def patch_daily_needs(operations):
+    return _patch_needs(lambda needs: _apply_operations(needs, operations, _need_key))
+
+def patch_needs_cells(transform):
+    """Stages `transform(needs list copy)` as the new daily needs (see needs_matrix)."""
+    return _patch_needs(transform)
+
+_flat_needs = None
+
+def get_flat_needs_document():
+    """
+    The daily needs as a flat list document, whatever the stored format
+    (weekly templates are expanded once per version).
+    """
+    global _flat_needs
+    document = get_document(DAILY_NEEDS_FILE)
+    if not is_template_document(document.data):
+        return document
+    with _documents_lock:
+        if _flat_needs is None or _flat_needs[0] != document.etag:
+            _flat_needs = (document.etag, CachedDocument.from_data(to_flat(document.data)))
+        return _flat_needs[1]
+
+def set_daily_needs_format(needs_format):
+    """Rewrites the stored daily needs as "templates" (weekly templates + exceptions) or "flat"."""
+    flush()
+    needs = to_flat(get_daily_needs())
+    save_daily_needs(compress_needs(needs) if needs_format == "templates" else needs)
+
 def get_groups():
     return load_json_file(GROUPS_FILE)
 
 def save_groups(groups_data):
     save_json_file(GROUPS_FILE, groups_data)
+
+
+def validate_inputs():
+    """
+    Structured consistency issues ({file, path, code, message}) for the input files.
+    Shares its cache with main.py, so only rules touching changed files are re-run.
+    """
+    flush()
+    store = get_store()
+    if store is not None:
+        documents = {role: load_json_file(filepath) for filepath, role in STORE_ROLES.items()}
+        return [issue.to_dict() for issue in validate_documents(documents, VALIDATION_CACHE_FILE)]
+    paths = {
+        "employees": EMPLOYEES_FILE,
+        "fonctions": FONCTIONS_FILE,
+        "shifts": SHIFTS_MASTER_FILE,
+        "needs": DAILY_NEEDS_FILE,
+    }
+    return [issue.to_dict() for issue in validate_files(paths, VALIDATION_CACHE_FILE)]
+
+def get_solver_inputs():
+    """Keyword arguments for src.planner.solve_from_data, read from the current data."""
+    # Pending patches reach the disk before a solve, so Planning.csv matches the input files
+    flush()
+    return {
+        "config": get_settings(),
+        "employees": get_employees(),
+        "fonctions": get_fonctions(),
+        "shifts": get_shifts_master(),
+        "needs": get_daily_needs(),
+        "groups": get_groups(),
+    }
+
+def plan_store_path():
+    """Database receiving the plan history of web solves, None with the JSON backend."""
+    store = get_store()
+    return store.db_path if store is not None else None
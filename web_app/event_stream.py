@@ -0,0 +1,208 @@
+import json
+import subprocess
+import threading
+import time
+import uuid
+
+# Seconds between two heartbeat comments on an idle stream
+HEARTBEAT_SECONDS = 15
+# Events kept per channel for late subscribers and reconnects
+MAX_EVENTS_PER_CHANNEL = 20000
+# Closed channels stay resumable for this long
+CLOSED_CHANNEL_TTL_SECONDS = 600
+# A following stream holds a server worker thread: at most this many follow at once, across all channels
+MAX_SUBSCRIBERS = 16
+# A following stream is ended after this long, so that an open tab gives its thread back
+MAX_FOLLOW_SECONDS = 60
+# Reconnection delay sent to EventSource when the server ends a stream (it resumes from its Last-Event-ID)
+RETRY_MS = 3000
+
+_subscriber_slots = threading.BoundedSemaphore(MAX_SUBSCRIBERS)
+
+
+def format_sse(data, event=None, event_id=None):
+    """Formats one Server-Sent Event. Multi-line data is split over several data: fields."""
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False)
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+class EventChannel:
+    """
+    Append-only event log shared by any number of subscribers.
+
+    Producers (pipe readers, the solver pool listener) publish without ever
+    waiting on a client; each subscriber replays from its own position, so a
+    reconnecting browser resumes from its Last-Event-ID. Plain log lines use
+    the default "message" event so existing EventSource.onmessage handlers
+    keep working; structured events (progress, end...) are named.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self._events = []  # (event_id, event, data)
+        self._first_id = 1
+        self._next_id = 1
+        self._closed_at = None
+        self._changed = threading.Condition()
+
+    @property
+    def closed(self):
+        return self._closed_at is not None
+
+    @property
+    def last_event_id(self):
+        return self._next_id - 1
+
+    def publish(self, data, event=None):
+        with self._changed:
+            if self.closed:
+                return
+            self._events.append((self._next_id, event, data))
+            self._next_id += 1
+            if len(self._events) > MAX_EVENTS_PER_CHANNEL:
+                del self._events[0]
+                self._first_id = self._events[0][0]
+            self._changed.notify_all()
+
+    def close(self):
+        with self._changed:
+            if self._closed_at is None:
+                self._closed_at = time.time()
+            self._changed.notify_all()
+
+    def expired(self):
+        return self.closed and time.time() - self._closed_at > CLOSED_CHANNEL_TTL_SECONDS
+
+    def subscribe(self, last_event_id=0, heartbeat=HEARTBEAT_SECONDS, max_seconds=MAX_FOLLOW_SECONDS):
+        """
+        SSE stream: replays events after `last_event_id`, then follows the
+        channel for at most `max_seconds` while one of the MAX_SUBSCRIBERS
+        slots is free. When none is, only the replay is sent. Either way a
+        stream that ends before the channel closes carries a retry: field, so
+        the browser reconnects and resumes from its Last-Event-ID.
+        """
+        if not _subscriber_slots.acquire(blocking=False):
+            return self._follow(last_event_id or 0, heartbeat, 0)
+        return _Subscription(self._follow(last_event_id or 0, heartbeat, max_seconds))
+
+    def _follow(self, position, heartbeat, max_seconds):
+        deadline = time.monotonic() + max_seconds
+        while True:
+            with self._changed:
+                wait = min(heartbeat, deadline - time.monotonic())
+                if position >= self.last_event_id and not self.closed and wait > 0:
+                    self._changed.wait(timeout=wait)
+                start = max(0, position + 1 - self._first_id)
+                pending = self._events[start:]
+                finished = self.closed
+            for event_id, event, data in pending:
+                yield format_sse(data, event=event, event_id=event_id)
+                position = event_id
+            if finished and position >= self.last_event_id:
+                return
+            if time.monotonic() >= deadline:
+                yield f"retry: {RETRY_MS}\n\n"
+                return
+            if not pending:
+                yield ": heartbeat\n\n"
+
+
+class _Subscription:
+    """
+    Response iterable holding a subscriber slot. The WSGI server calls
+    close() when the stream ends or the client goes away, even if the
+    stream was never iterated, so the slot is always given back.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._stream)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        self._stream.close()
+        if not self._released:
+            self._released = True
+            _subscriber_slots.release()
+
+
+class ChannelRegistry:
+    """Channels addressable by id, so clients can resume a stream after a reconnect."""
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def create(self):
+        channel = EventChannel()
+        with self._lock:
+            for channel_id in [cid for cid, ch in self._channels.items() if ch.expired()]:
+                del self._channels[channel_id]
+            self._channels[channel.id] = channel
+        return channel
+
+    def get(self, channel_id):
+        with self._lock:
+            return self._channels.get(channel_id)
+
+
+registry = ChannelRegistry()
+
+
+def last_event_id_from(request):
+    """Reads the resume position from the Last-Event-ID header (or ?last_event_id=)."""
+    value = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        return int(value) if value else 0
+    except ValueError:
+        return 0
+
+
+def stream_process(command, channel, on_exit=None, encoding='latin-1'):
+    """
+    Runs `command` and publishes its stdout and stderr lines as they arrive.
+    Each pipe has its own reader thread, so a chatty stderr can never fill
+    up and block the child while stdout is being read. `on_exit(returncode)`
+    may publish closing messages before the channel is closed.
+    """
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding=encoding)
+
+    def _pump(pipe):
+        for line in iter(pipe.readline, ''):
+            channel.publish(line.rstrip("\r\n"))
+        pipe.close()
+
+    readers = [
+        threading.Thread(target=_pump, args=(process.stdout,), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr,), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    def _wait():
+        returncode = process.wait()
+        for reader in readers:
+            reader.join()
+        if on_exit:
+            on_exit(returncode)
+        channel.publish({"returncode": returncode}, event="end")
+        channel.close()
+
+    threading.Thread(target=_wait, daemon=True).start()
+    return process
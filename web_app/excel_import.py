@@ -0,0 +1,303 @@
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time
+
+import data_manager
+from event_stream import EventChannel
+from src.validation import ValidationIssue, validate_documents
+
+# Job states, as in solver_pool
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED_STATES = (DONE, FAILED)
+
+# Finished imports kept in memory for status polling
+MAX_FINISHED_JOBS = 20
+# A progress event every this many rows
+PROGRESS_EVERY_ROWS = 500
+# Row errors listed in the result; the count is always complete
+MAX_REPORTED_ERRORS = 200
+
+
+class ImportRejected(Exception):
+    """The workbook has errors: nothing was saved."""
+
+
+def _cell(value):
+    """Normalizes a cell value: trimmed strings, ISO dates, HH:MM times, integral floats as int."""
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, dt_time):
+        return value.strftime("%H:%M")
+    if isinstance(value, float):
+        if value != value:  # NaN, from the .xls fallback
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+def _split_list(value):
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return []
+
+def _count(value):
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid count {value!r}")
+    if count < 0:
+        raise ValueError(f"invalid count {value!r}")
+    return count
+
+
+# --- ROW CONVERTERS ---
+# Each sheet has its required columns, a row -> record converter (raising
+# ValueError for a bad row) and a builder of the stored document.
+
+def _employee(row):
+    employee = {k: v for k, v in row.items() if v is not None}
+    employee["fonctions"] = _split_list(row.get("fonctions"))
+    constraints = row.get("constraints")
+    if isinstance(constraints, str):
+        try:
+            constraints = json.loads(constraints)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"constraints is not valid JSON ({e.msg})")
+    employee["constraints"] = constraints if isinstance(constraints, list) else []
+    return data_manager._stored_employee(employee)
+
+def _function(row):
+    function = {k: v for k, v in row.items() if v is not None}
+    function["qualifications"] = _split_list(row.get("qualifications"))
+    return function
+
+def _shift(row):
+    shift = {k: v for k, v in row.items() if v is not None}
+    shift.setdefault("name", shift["id"])
+    if "duration_minutes" in shift:
+        shift["duration_minutes"] = _count(shift["duration_minutes"])
+    return shift
+
+def _need(row):
+    return {"date_str": str(row["date_str"]), "shift_id": str(row["shift_id"]), "count": _count(row["count"])}
+
+def _group_member(row):
+    return (str(row["group_name"]), str(row["employee_id"]))
+
+def _groups_document(members):
+    groups = {}
+    for group_name, employee_id in members:
+        groups.setdefault(group_name, []).append(employee_id)
+    return groups
+
+SHEETS = OrderedDict([
+    ("Employees", ("employees", data_manager.EMPLOYEES_FILE, ("id", "name"), _employee, list, "id")),
+    ("Functions", ("fonctions", data_manager.FONCTIONS_FILE, ("id",), _function,
+                   lambda records: {"functions": records}, "id")),
+    ("Shifts", ("shifts", data_manager.SHIFTS_MASTER_FILE, ("id", "start_time", "end_time"), _shift,
+                lambda records: {shift["id"]: shift for shift in records}, "id")),
+    ("Daily Needs", ("needs", data_manager.DAILY_NEEDS_FILE, ("date_str", "shift_id", "count"), _need, list, None)),
+    ("Groups", ("groups", data_manager.GROUPS_FILE, ("group_name", "employee_id"), _group_member,
+                _groups_document, None)),
+])
+
+
+def _open_workbook(path):
+    """
+    {sheet name: (row iterator, row count or None)} and a close() callback.
+    .xlsx files are streamed read-only by openpyxl, the file is opened once;
+    legacy .xls files go through pandas, which reads every sheet in one pass.
+    """
+    if path.lower().endswith('.xls'):
+        import pandas as pd
+        frames = pd.read_excel(path, sheet_name=None, header=None, dtype=object)
+        sheets = {name: (frame.itertuples(index=False, name=None), len(frame)) for name, frame in frames.items()}
+        return sheets, lambda: None
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    sheets = {}
+    for worksheet in workbook.worksheets:
+        # max_row comes from the sheet dimension, absent from some generated files
+        sheets[worksheet.title] = (worksheet.iter_rows(values_only=True), worksheet.max_row)
+    return sheets, workbook.close
+
+
+class ImportJob:
+    def __init__(self, path, filename):
+        self.id = uuid.uuid4().hex[:12]
+        self.status = QUEUED
+        self.path = path
+        self.filename = filename
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        # Log lines, progress and the final status, as for solver jobs
+        self.events = EventChannel()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "last_event_id": self.events.last_event_id,
+            "error": self.error,
+            "result": self.result,
+        }
+
+    # --- steps ---
+
+    def _read_sheet(self, sheet_name, rows, total, errors):
+        role, _, required, convert, build, unique = SHEETS[sheet_name]
+        header = [_cell(value) for value in next(rows, ())]
+        missing = [column for column in required if column not in header]
+        if missing:
+            errors.append(ValidationIssue(file=role, path=f"{sheet_name}!1", code="MISSING_COLUMN",
+                                          message=f"Missing column(s): {', '.join(missing)}."))
+            return None
+        columns = [(idx, name) for idx, name in enumerate(header) if name]
+
+        records, seen = [], set()
+        row_number = 1
+        for row_number, values in enumerate(rows, start=2):
+            row = {name: _cell(values[idx]) if idx < len(values) else None for idx, name in columns}
+            if all(value is None for value in row.values()):
+                continue
+            absent = [column for column in required if row.get(column) is None]
+            try:
+                if absent:
+                    raise ValueError(f"empty {', '.join(absent)}")
+                record = convert(row)
+                if unique:
+                    if record[unique] in seen:
+                        raise ValueError(f"duplicate {unique} '{record[unique]}'")
+                    seen.add(record[unique])
+                records.append(record)
+            except ValueError as e:
+                errors.append(ValidationIssue(file=role, path=f"{sheet_name}!{row_number}", code="INVALID_ROW",
+                                              message=f"Row {row_number}: {e}."))
+            if row_number % PROGRESS_EVERY_ROWS == 0:
+                self.events.publish({"sheet": sheet_name, "row": row_number, "total": total}, event="progress")
+        self.events.publish({"sheet": sheet_name, "row": row_number, "total": total}, event="progress")
+        self.events.publish(f"[Import] {sheet_name}: {len(records)} row(s) read.")
+        return build(records)
+
+    def run(self):
+        """Reads every known sheet, validates the result and saves it, all sheets or none."""
+        errors = []
+        imported = OrderedDict()  # filepath -> document
+        sheets, close = _open_workbook(self.path)
+        try:
+            known = [name for name in SHEETS if name in sheets]
+            if not known:
+                raise ImportRejected("No valid sheets found.")
+            self.events.publish(f"[Import] Sheets: {', '.join(known)}.")
+            for sheet_name in known:
+                rows, total = sheets[sheet_name]
+                document = self._read_sheet(sheet_name, rows, total, errors)
+                if document is not None:
+                    imported[SHEETS[sheet_name][1]] = document
+        finally:
+            close()
+
+        # Bulk consistency check of the workbook with the documents it does not replace
+        if not errors:
+            self.events.publish("[Import] Validating...")
+            documents = {role: data_manager.load_json_file(filepath) for filepath, role in data_manager.STORE_ROLES.items()}
+            for filepath, document in imported.items():
+                documents[data_manager.STORE_ROLES[filepath]] = document
+            errors = validate_documents(documents, data_manager.VALIDATION_CACHE_FILE)
+
+        self.result = {
+            "sheets": [name for name, spec in SHEETS.items() if spec[1] in imported],
+            "error_count": len(errors),
+            "issues": [issue.to_dict() for issue in errors[:MAX_REPORTED_ERRORS]],
+        }
+        if errors:
+            raise ImportRejected(f"{len(errors)} error(s), nothing was imported.")
+
+        data_manager.save_json_files(imported)
+        self.result["message"] = " ".join(f"{name} updated." for name in self.result["sheets"])
+
+
+class ImportQueue:
+    """
+    Runs Excel imports one at a time on a background thread. Each import
+    publishes its progress on the job's event channel.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._pending = []
+        self._running = False
+
+    def submit(self, path, filename):
+        job = ImportJob(path, filename)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            if not self._running:
+                self._running = True
+                threading.Thread(target=self._work, daemon=True).start()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _work(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return
+                job = self._pending.pop(0)
+            job.status = RUNNING
+            job.started_at = time.time()
+            job.events.publish({"job_id": job.id, "status": job.status}, event="status")
+            try:
+                job.run()
+                self._finish(job, DONE, job.result["message"])
+            except ImportRejected as e:
+                job.error = str(e)
+                self._finish(job, FAILED, f"ERROR: {e}")
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                self._finish(job, FAILED, f"ERROR: {job.error}")
+            finally:
+                if os.path.exists(job.path):
+                    os.remove(job.path)
+
+    def _finish(self, job, status, message):
+        job.status = status
+        job.finished_at = time.time()
+        job.events.publish(message)
+        job.events.publish({"job_id": job.id, "status": job.status, "error": job.error, "result": job.result},
+                          event="end")
+        job.events.close()
+        with self._lock:
+            finished = [j for j in self._jobs.values() if j.status in FINISHED_STATES]
+            for old in itertools.islice(finished, max(0, len(finished) - MAX_FINISHED_JOBS)):
+                del self._jobs[old.id]
+
+
+imports = ImportQueue()
@@ -0,0 +1,195 @@
+import threading
+from datetime import date
+
+import data_manager
+from data_manager import PatchError
+from src.needs_reader import DateParser
+from src.needs_templates import to_flat
+
+# Weekday order of fill_pattern lists, as in date.weekday()
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# Widest window served by GET or written by a PATCH, in days between its first and last date
+MAX_WINDOW_DAYS = 366
+
+
+class WindowError(ValueError):
+    """Both bounds were given and span more than MAX_WINDOW_DAYS."""
+
+
+class NeedsGrid:
+    """
+    04_daily_needs.json as a sparse date x shift matrix: {(day ordinal, shift_id): count}.
+    Built once per version of the needs document.
+    """
+    __slots__ = ("etag", "cells", "days", "shift_ids")
+
+    def __init__(self, etag, needs):
+        self.etag = etag
+        self.cells = {}
+        parser = DateParser()
+        for need in needs:
+            day = parser.to_ordinal(str(need.get("date_str")))
+            if day is None or not need.get("shift_id"):
+                continue
+            self.cells[(day, need["shift_id"])] = int(need.get("count", 0))
+        self.days = sorted({day for day, _ in self.cells})
+        self.shift_ids = sorted({shift_id for _, shift_id in self.cells})
+
+    def resolve(self, start=None, end=None):
+        """
+        (first, last) day ordinals of the window. A missing bound falls back to
+        the data extent, then the window is clamped to MAX_WINDOW_DAYS from the
+        bound that was given (from the first need if none was). Two explicit
+        bounds further apart raise WindowError.
+        """
+        if start and end and (end - start).days > MAX_WINDOW_DAYS:
+            raise WindowError(f"Window limited to {MAX_WINDOW_DAYS} days.")
+        first = start.toordinal() if start else None
+        last = end.toordinal() if end else None
+        if first is None:
+            first = self.days[0] if self.days else last
+        if last is None:
+            last = self.days[-1] if self.days else first
+        if first is None:
+            return 0, -1
+        if last - first > MAX_WINDOW_DAYS:
+            if end and not start:
+                first = last - MAX_WINDOW_DAYS
+            else:
+                last = first + MAX_WINDOW_DAYS
+        return first, last
+
+    def window(self, start=None, end=None, shift_ids=None):
+        """Dense matrix of the window (see resolve): rows are dates, columns shifts, 0 when there is no need."""
+        first, last = self.resolve(start, end)
+        shift_ids = shift_ids or self.shift_ids
+        days = range(first, last + 1)
+        return {
+            "etag": self.etag,
+            "dates": [date.fromordinal(day).isoformat() for day in days],
+            "shifts": list(shift_ids),
+            "counts": [[self.cells.get((day, shift_id), 0) for shift_id in shift_ids] for day in days],
+        }
+
+
+_grid = None
+_grid_lock = threading.Lock()
+
+def get_grid():
+    document = data_manager.get_document(data_manager.DAILY_NEEDS_FILE)
+    global _grid
+    with _grid_lock:
+        if _grid is None or _grid.etag != document.etag:
+            _grid = NeedsGrid(document.etag, to_flat(document.data))
+        return _grid
+
+
+def _parse_day(value, field):
+    try:
+        return date.fromisoformat(str(value)).toordinal()
+    except ValueError:
+        raise PatchError(f"'{field}' must be a YYYY-MM-DD date, got {value!r}.")
+
+def _parse_count(value):
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        raise PatchError(f"Invalid count: {value!r}.")
+    if count < 0:
+        raise PatchError(f"Invalid count: {value!r}.")
+    return count
+
+def _copy_week_updates(grid, spec):
+    """{"source": date, "target": date or [dates], "shifts": [...]}: copies a Monday-Sunday week."""
+    if not isinstance(spec, dict):
+        raise PatchError("copy_week must be an object {source, target, shifts}.")
+    source = _parse_day(spec.get("source"), "copy_week.source")
+    source -= date.fromordinal(source).weekday()
+    targets = spec.get("target")
+    targets = targets if isinstance(targets, list) else [targets]
+    if len(targets) * 7 > MAX_WINDOW_DAYS:
+        raise PatchError(f"copy_week writes at most {MAX_WINDOW_DAYS // 7} target weeks.")
+    only = set(spec.get("shifts") or ())
+    updates = {}
+    for target in targets:
+        target = _parse_day(target, "copy_week.target")
+        target -= date.fromordinal(target).weekday()
+        for offset in range(7):
+            # Target cells missing from the source week are cleared
+            shift_ids = {s for (day, s) in grid.cells if day in (source + offset, target + offset)}
+            for shift_id in shift_ids:
+                if not only or shift_id in only:
+                    updates[(target + offset, shift_id)] = grid.cells.get((source + offset, shift_id), 0)
+    return updates
+
+def _fill_pattern_updates(spec):
+    """{"start": date, "end": date, "pattern": {shift_id: [monday..sunday counts]}}."""
+    if not isinstance(spec, dict):
+        raise PatchError("fill_pattern must be an object {start, end, pattern}.")
+    start = _parse_day(spec.get("start"), "fill_pattern.start")
+    end = _parse_day(spec.get("end"), "fill_pattern.end")
+    pattern = spec.get("pattern") or {}
+    if end < start or not isinstance(pattern, dict):
+        raise PatchError("fill_pattern needs start <= end and a {shift_id: [7 counts]} pattern.")
+    if end - start > MAX_WINDOW_DAYS:
+        raise PatchError(f"fill_pattern is limited to {MAX_WINDOW_DAYS} days.")
+    updates = {}
+    for shift_id, counts in pattern.items():
+        if not isinstance(counts, list) or len(counts) != len(WEEKDAYS):
+            raise PatchError(f"Pattern of '{shift_id}' must list {len(WEEKDAYS)} counts, Monday first.")
+        counts = [_parse_count(count) for count in counts]
+        for day in range(start, end + 1):
+            updates[(day, shift_id)] = counts[date.fromordinal(day).weekday()]
+    return updates
+
+def _apply_cells(needs, updates):
+    """Sets counts in the flat list: 0 removes the need, unknown cells are appended."""
+    positions = {}
+    parser = DateParser()
+    for i, need in enumerate(needs):
+        day = parser.to_ordinal(str(need.get("date_str")))
+        if day is not None:
+            positions[(day, need.get("shift_id"))] = i
+    for (day, shift_id), count in sorted(updates.items()):
+        i = positions.get((day, shift_id))
+        if i is None:
+            if count > 0:
+                positions[(day, shift_id)] = len(needs)
+                needs.append({"date_str": date.fromordinal(day).isoformat(), "shift_id": shift_id, "count": count})
+        elif count > 0:
+            needs[i] = {**needs[i], "count": count}
+        else:
+            needs[i] = None
+    return [need for need in needs if need is not None]
+
+def patch_matrix(body):
+    """
+    Applies, in this order, copy_week, fill_pattern and cells
+    ([[date, shift_id, count], ...]) from `body`, all or nothing. Ranges are
+    limited to MAX_WINDOW_DAYS and counts > 0 to shifts of the master.
+    Returns the number of cells written and the new ETag.
+    """
+    if not isinstance(body, dict):
+        raise PatchError("Expected an object with 'cells', 'copy_week' and/or 'fill_pattern'.")
+    grid = get_grid()
+    updates = {}
+    if body.get("copy_week"):
+        updates.update(_copy_week_updates(grid, body["copy_week"]))
+    if body.get("fill_pattern"):
+        updates.update(_fill_pattern_updates(body["fill_pattern"]))
+    for cell in body.get("cells") or []:
+        if not isinstance(cell, list) or len(cell) != 3 or not cell[1]:
+            raise PatchError(f"A cell is [date, shift_id, count], got {cell!r}.")
+        updates[(_parse_day(cell[0], "cells.date"), str(cell[1]))] = _parse_count(cell[2])
+    if not updates:
+        raise PatchError("Nothing to update.")
+    # A need on a shift missing from the master would fail the next load (UNKNOWN_SHIFT); clearing one is allowed
+    known = set(data_manager.get_shifts_master() or {})
+    unknown = sorted({shift_id for (_, shift_id), count in updates.items() if count > 0 and shift_id not in known})
+    if unknown:
+        raise PatchError(f"Unknown shift(s): {', '.join(unknown)}.")
+    # Unchanged cells are not rewritten
+    updates = {key: count for key, count in updates.items() if grid.cells.get(key, 0) != count}
+    etag = data_manager.patch_needs_cells(lambda needs: _apply_cells(needs or [], updates)) if updates else grid.etag
+    return len(updates), etag
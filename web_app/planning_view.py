@@ -0,0 +1,270 @@
+import csv
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date
+
+from src import plan_table
+from src.needs_reader import DateParser
+
+# Group of the employees missing from 05_groups.json
+OTHER_GROUP = "11. Autres"
+NAME_COLUMNS = ('employee', 'employé', 'nom', 'name')
+# Columnar plan files (src.plan_table), read instead of the CSV when up to date
+TABLE_EXTENSIONS = ('.arrow', '.parquet')
+
+
+def _read_csv(planning_path):
+    """(ISO dates, column names, [(employee name, [cell per date])]) from Planning.csv."""
+    with open(planning_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        csv_rows = list(reader)
+
+    # Date columns, parsed once per column and kept in date order
+    name_idx = None
+    columns = []  # (ISO date, CSV column index, original column name)
+    parser = DateParser()
+    for idx, col in enumerate(header):
+        if name_idx is None and col.lower() in NAME_COLUMNS:
+            name_idx = idx
+            continue
+        day = parser.to_ordinal(col)
+        if day is not None:  # Other columns are not dates
+            columns.append((date.fromordinal(day).isoformat(), idx, col))
+    columns.sort()
+
+    rows = []
+    for row in csv_rows:
+        name = row[name_idx] if name_idx is not None and name_idx < len(row) else "Inconnu"
+        rows.append((name, [row[idx] if idx < len(row) else '' for _, idx, _ in columns]))
+    return [iso for iso, _, _ in columns], [col for _, _, col in columns], rows
+
+
+def _read_table(table_path):
+    """
+    Same result from the columnar plan (src.plan_table): the file is memory
+    mapped and typed, no text is parsed. A cell is the shift of a worked day,
+    the status (OFF, HOLIDAY...) otherwise.
+    """
+    table = plan_table.read_plan_table(table_path)
+    days = table.column("date").to_pylist()
+    dates = sorted(set(days))
+    position = {day: d for d, day in enumerate(dates)}
+    rows = OrderedDict()
+    for name, day, shift, status in zip(table.column("employee_name").to_pylist(), days,
+                                        table.column("shift_id").to_pylist(),
+                                        table.column("status").to_pylist()):
+        cells = rows.get(name)
+        if cells is None:
+            cells = rows[name] = [''] * len(dates)
+        cells[position[day]] = shift if shift is not None else status
+    iso_dates = [day.isoformat() for day in dates]
+    return iso_dates, iso_dates, list(rows.items())
+
+
+class PlanIndex:
+    """
+    The plan (Planning.csv or its columnar copy) loaded once into an indexed
+    grid: employees x days, plus lookups by employee (id or name), group and
+    (shift, day). Queries never touch the file again.
+    """
+
+    def __init__(self, key, planning_path, groups_data, employees_data):
+        self.key = key
+        # 1. Days in date order and one row of cells per employee
+        if planning_path.endswith(TABLE_EXTENSIONS):
+            self.dates, self.columns, plan_rows = _read_table(planning_path)
+        else:
+            self.dates, self.columns, plan_rows = _read_csv(planning_path)
+        self.weekends = [date.fromisoformat(iso).weekday() >= 5 for iso in self.dates]
+
+        # 2. Name -> id and group
+        id_to_group = {}
+        for g_name, members in groups_data.items():
+            for emp_id in members:
+                id_to_group[emp_id] = g_name
+        name_to_id = {emp['name']: emp['id'] for emp in employees_data}
+
+        # 3. One row of shifts per employee, and the indexes
+        self.names, self.ids, self.groups, self.grid = [], [], [], []
+        self.by_employee = {}
+        self.by_shift = {}  # (shift, day index) -> [employee index]
+        for name, shifts in plan_rows:
+            emp_id = name_to_id.get(name)
+            e = len(self.names)
+            self.names.append(name)
+            self.ids.append(emp_id)
+            self.groups.append(id_to_group.get(emp_id, OTHER_GROUP))
+            self.grid.append(shifts)
+            self.by_employee.setdefault(name, e)
+            if emp_id:
+                self.by_employee.setdefault(emp_id, e)
+            for d, shift in enumerate(shifts):
+                self.by_shift.setdefault((shift, d), []).append(e)
+
+        # Display order: groups of 05_groups.json (sorted), then the others, file order within a group
+        self.by_group = OrderedDict((g_name, []) for g_name in sorted(groups_data))
+        self.by_group[OTHER_GROUP] = []
+        for e, g_name in enumerate(self.groups):
+            self.by_group.setdefault(g_name, []).append(e)
+        self.by_group = OrderedDict((g_name, members) for g_name, members in self.by_group.items() if members)
+        self.position = {}
+        for members in self.by_group.values():
+            for e in members:
+                self.position[e] = len(self.position)
+
+    def day_range(self, start=None, end=None):
+        """Indexes of the days in [start, end] (date objects, both optional)."""
+        lo = bisect_left(self.dates, start.isoformat()) if start else 0
+        hi = bisect_right(self.dates, end.isoformat()) if end else len(self.dates)
+        return range(lo, hi)
+
+    def query(self, start=None, end=None, groups=None, employees=None, shifts=None,
+              fields=None, offset=0, limit=None):
+        """
+        Employees (in display order) with their shifts over [start, end].
+        With `shifts`, only the matching days are returned and employees
+        without any are skipped. `fields` restricts the keys of each item.
+        """
+        days = self.day_range(start, end)
+        selected = None
+        if employees:
+            selected = {self.by_employee[e] for e in employees if e in self.by_employee}
+        if groups:
+            in_groups = {e for g_name in groups for e in self.by_group.get(g_name, ())}
+            selected = in_groups if selected is None else selected & in_groups
+
+        if shifts:
+            matched = {}
+            for shift in shifts:
+                for d in days:
+                    for e in self.by_shift.get((shift, d), ()):
+                        if selected is None or e in selected:
+                            matched.setdefault(e, []).append(d)
+            rows = [(e, sorted(matched[e])) for e in sorted(matched, key=self.position.__getitem__)]
+        else:
+            order = sorted(selected, key=self.position.__getitem__) if selected is not None else self.position
+            rows = [(e, days) for e in order]
+
+        total = len(rows)
+        page = rows[offset:offset + limit] if limit is not None else rows[offset:]
+        items = []
+        for e, day_indexes in page:
+            item = {
+                "employee": self.names[e],
+                "id": self.ids[e],
+                "group": self.groups[e],
+                "shifts": {self.dates[d]: self.grid[e][d] for d in day_indexes},
+            }
+            items.append({k: v for k, v in item.items() if k in fields} if fields else item)
+        return {
+            "dates": self.dates[days.start:days.stop],
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "items": items,
+        }
+
+
+class PlanningViewModel:
+    """
+    The grouped rows of the planning page, with the CSS classes of every cell
+    already computed. `fragments` holds the rendered <tr> rows of each group,
+    so a page view only concatenates cached HTML.
+    """
+    __slots__ = ("key", "dates_meta", "groups", "fragments")
+
+    def __init__(self, key, dates_meta, groups):
+        self.key = key
+        self.dates_meta = dates_meta  # [{'original_col', 'short_name', 'is_weekend'}]
+        self.groups = groups          # {group: [{'name', 'cells': [(shift, css_class)]}]}
+        self.fragments = []           # [(group, html)]
+
+    def __bool__(self):
+        return bool(self.groups)
+
+
+def _cell_class(shift, is_weekend):
+    classes = []
+    if is_weekend:
+        classes.append('weekend-col')
+    if shift in ('OFF', 'FIXED_OFF'):
+        classes.append('cell-off')
+    elif shift == 'HOLIDAY':
+        classes.append('cell-holiday')
+    return ' '.join(classes)
+
+
+def build_view_model(index):
+    dates_meta = [
+        {'original_col': col, 'short_name': iso[8:10], 'is_weekend': is_weekend}
+        for iso, col, is_weekend in zip(index.dates, index.columns, index.weekends)
+    ]
+    groups = OrderedDict()
+    for g_name, members in index.by_group.items():
+        groups[g_name] = [{
+            'name': index.names[e],
+            'cells': [(shift, _cell_class(shift, is_weekend)) for shift, is_weekend in zip(index.grid[e], index.weekends)],
+        } for e in members]
+    return PlanningViewModel(index.key, dates_meta, groups)
+
+
+class PlanningViewCache:
+    """
+    Keeps the index of the latest plan and the page view model built from it,
+    keyed on the plan file (mtime, size) and the groups/employees versions:
+    both are rebuilt once per saved plan instead of on every request.
+    """
+
+    def __init__(self, planning_path, table_path=None):
+        self.planning_path = planning_path
+        self.table_path = table_path
+        self._index = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def get_index(self, groups_document, employees_document):
+        """`*_document` are data_manager.CachedDocument. None if there is no plan yet."""
+        source = self._source()
+        if source is None:
+            return None
+        path, st = source
+        key = (path, st.st_mtime_ns, st.st_size, groups_document.etag, employees_document.etag)
+        with self._lock:
+            if self._index is None or self._index.key != key:
+                self._index = PlanIndex(key, path, groups_document.data, employees_document.data)
+            return self._index
+
+    def _source(self):
+        """(path, stat) of the plan to read: the columnar file when pyarrow is there and it is not older than the CSV."""
+        try:
+            st = os.stat(self.planning_path)
+        except FileNotFoundError:
+            st = None
+        if self.table_path and plan_table.available():
+            try:
+                table_st = os.stat(self.table_path)
+                if st is None or table_st.st_mtime_ns >= st.st_mtime_ns:
+                    return self.table_path, table_st
+            except FileNotFoundError:
+                pass
+        return (self.planning_path, st) if st is not None else None
+
+    def get(self, groups_document, employees_document, render_group=None):
+        """
+        Page view model. `render_group(group, rows, dates_meta)` returns the
+        HTML of a group, rendered once per model.
+        """
+        index = self.get_index(groups_document, employees_document)
+        if index is None:
+            return None
+        with self._lock:
+            if self._model is None or self._model.key != index.key:
+                model = build_view_model(index)
+                if render_group is not None:
+                    model.fragments = [(g_name, render_group(g_name, rows, model.dates_meta))
+                                       for g_name, rows in model.groups.items()]
+                self._model = model
+            return self._model
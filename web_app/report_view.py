@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from src import reporter
+
+# Rendered sections kept per plan version, most recently used last
+MAX_RENDERED_SECTIONS = 256
+
+
+class UnknownFilter(LookupError):
+    """The requested section, group or agent is not in the report."""
+
+
+class ReportDocument:
+    """Report.json of one plan version, plus the sections rendered from it so far."""
+
+    def __init__(self, version, data):
+        self.version = version
+        self.data = data
+        self.rendered = OrderedDict()  # (section, group, agent) -> text
+        self.groups = {name: family["members"] for name, family in data.get("family_equity", {}).items()}
+        self.ids = data.get("employee_ids", {})
+
+    def outline(self):
+        return {
+            "version": self.version,
+            "metadata": self.data.get("metadata", {}),
+            "score": self.data.get("score"),
+            "total_uncovered": self.data.get("total_uncovered"),
+            "sections": [{"id": section, "title": title} for section, (title, _) in reporter.SECTIONS.items()],
+            "groups": list(self.groups),
+        }
+
+    def agents(self, group=None, agent=None):
+        """Names kept by the filters: a group's members, and/or an agent id or part of a name. None = everybody."""
+        if group is None and agent is None:
+            return None
+        if group is not None:
+            if group not in self.groups:
+                raise UnknownFilter(f"Unknown group '{group}'.")
+            names = list(self.groups[group])
+        else:
+            names = list(self.data.get("employees_details", {}))
+        if agent is not None:
+            needle = agent.lower()
+            names = [name for name in names if self.ids.get(name) == agent or needle in name.lower()]
+            if not names:
+                raise UnknownFilter(f"No agent matches '{agent}'.")
+        return set(names)
+
+
+class ReportCache:
+    """
+    Keeps the latest Report.json, keyed on the file (mtime, size): a new plan
+    is a new version. Sections are rendered on demand, once per (section,
+    group, agent) and per version.
+    """
+
+    def __init__(self, report_path):
+        self.report_path = report_path
+        self._document = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The current ReportDocument, or None if no plan has been reported yet."""
+        try:
+            st = os.stat(self.report_path)
+        except FileNotFoundError:
+            return None
+        version = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+        with self._lock:
+            if self._document is None or self._document.version != version:
+                with open(self.report_path, 'r', encoding='utf-8') as f:
+                    self._document = ReportDocument(version, json.load(f))
+            return self._document
+
+    def render(self, document, section, group=None, agent=None):
+        """Text of one section for the filters, rendered at most once per version."""
+        if section not in reporter.SECTIONS:
+            raise UnknownFilter(f"Unknown section '{section}'.")
+        key = (section, group, agent)
+        with self._lock:
+            text = document.rendered.get(key)
+            if text is not None:
+                document.rendered.move_to_end(key)
+                return text
+        text = reporter.render_section(document.data, section, document.agents(group, agent), group)
+        with self._lock:
+            document.rendered[key] = text
+            while len(document.rendered) > MAX_RENDERED_SECTIONS:
+                document.rendered.popitem(last=False)
+        return text
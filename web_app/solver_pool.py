@@ -0,0 +1,332 @@
+import atexit
+import itertools
+import multiprocessing
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from multiprocessing.connection import wait
+
+from event_stream import EventChannel
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# Finished jobs kept in memory for status/result polling
+MAX_FINISHED_JOBS = 50
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class _PipeWriter:
+    """
+    File-like object forwarding printed lines to the parent process.
+    CP-SAT callbacks print from solver threads, hence the shared send lock.
+    """
+
+    def __init__(self, conn, send_lock, job_id, stream):
+        self.conn = conn
+        self.send_lock = send_lock
+        self.job_id = job_id
+        self.stream = stream
+        self._buffer = ""
+
+    def write(self, text):
+        with self.send_lock:
+            self._buffer += text
+            while "\n" in self._buffer:
+                line, self._buffer = self._buffer.split("\n", 1)
+                self.conn.send(("log", self.job_id, self.stream, line))
+        return len(text)
+
+    def flush(self):
+        with self.send_lock:
+            if self._buffer:
+                self.conn.send(("log", self.job_id, self.stream, self._buffer))
+                self._buffer = ""
+
+
+def _save_outputs(planner, result, seq, output_paths, save_lock, saved_seq):
+    """
+    Writes the outputs of job number `seq`, one job at a time across workers.
+    The current files (Planning.csv, Report.json, Planning.arrow...) always
+    come from the latest submitted job that succeeded: a job finishing after a
+    later one only adds its plan to the history store.
+    """
+    db_path = output_paths[2] if len(output_paths) > 2 else None
+    with save_lock:
+        if seq > saved_seq.value:
+            planner.save_outputs(result, *output_paths)
+            saved_seq.value = seq
+        elif db_path:
+            print("  >> Un planning plus récent est déjà enregistré : historique seulement.", flush=True)
+            planner.save_outputs(result, None, None, db_path)
+
+
+def _worker_main(conn, cancel_event, save_lock, saved_seq):
+    """
+    Worker process loop. OR-Tools, pandas and the planner are imported once,
+    when the worker starts, so each job only pays for the solve itself.
+    """
+    import src.planner as planner
+
+    send_lock = threading.Lock()
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+
+        job_id, seq, inputs, output_paths = message
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = _PipeWriter(conn, send_lock, job_id, "stdout")
+        sys.stderr = _PipeWriter(conn, send_lock, job_id, "stderr")
+        def on_solution(progress, job_id=job_id):
+            with send_lock:
+                conn.send(("progress", job_id, progress))
+
+        try:
+            result = planner.solve_from_data(stop_event=cancel_event, on_solution=on_solution, **inputs)
+            if result.ok and output_paths:
+                _save_outputs(planner, result, seq, output_paths, save_lock, saved_seq)
+            payload = {
+                "status": result.status,
+                "planning": result.planning,
+                "report_text": result.report_text,
+                "score": (result.report_data or {}).get("score"),
+                "total_uncovered": (result.report_data or {}).get("total_uncovered"),
+                "issues": [issue.to_dict() for issue in result.issues],
+                "capacity": result.capacity,
+                "conflict": result.conflict,
+            }
+            outcome = ("done", job_id, payload)
+        except Exception as e:
+            outcome = ("error", job_id, f"{type(e).__name__}: {e}")
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            sys.stdout, sys.stderr = stdout, stderr
+        with send_lock:
+            conn.send(outcome)
+
+
+class SolverJob:
+    def __init__(self, inputs, output_paths, seq=0):
+        self.id = uuid.uuid4().hex[:12]
+        self.seq = seq  # Submission order, decides which job's outputs are current
+        self.status = QUEUED
+        self.inputs = inputs
+        self.output_paths = output_paths
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        # Log lines, progress and the final status, for any number of SSE subscribers
+        self.events = EventChannel()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "last_event_id": self.events.last_event_id,
+            "error": self.error,
+        }
+
+
+class _Worker:
+    def __init__(self, ctx, save_lock, saved_seq):
+        self.conn, child_conn = ctx.Pipe()
+        self.cancel_event = ctx.Event()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, self.cancel_event, save_lock, saved_seq),
+                                   daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.job = None
+
+
+class SolverPool:
+    """
+    Long-lived pool of pre-imported solver processes fed by a bounded job queue.
+    At most `workers` solves run at the same time; at most `max_queued` jobs wait.
+    """
+
+    def __init__(self, workers=1, max_queued=4):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.RLock()
+        # Shared by the workers: outputs are written one job at a time, the latest submitted job wins
+        self._save_lock = self._ctx.Lock()
+        self._saved_seq = self._ctx.Value('q', 0, lock=False)
+        self._seq = itertools.count(1)
+        self._workers = [self._new_worker() for _ in range(max(1, workers))]
+        self._pending = deque()
+        self._jobs = OrderedDict()
+        self.max_queued = max_queued
+        self._closed = False
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    # --- public API ---
+
+    def submit(self, inputs, output_paths=None):
+        with self._lock:
+            if len(self._pending) >= self.max_queued:
+                raise QueueFullError(f"{len(self._pending)} jobs already waiting.")
+            job = SolverJob(inputs, output_paths, next(self._seq))
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._dispatch()
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Cancels a queued job, or stops the CP-SAT search of a running one."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return job
+            if job.status == QUEUED:
+                self._pending.remove(job)
+                self._finish(job, CANCELLED)
+            else:
+                for worker in self._workers:
+                    if worker.job is job:
+                        worker.cancel_event.set()
+            return job
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            for worker in self._workers:
+                worker.cancel_event.set()
+                try:
+                    worker.conn.send(None)
+                except (OSError, BrokenPipeError):
+                    pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    # --- internals ---
+
+    def _new_worker(self):
+        return _Worker(self._ctx, self._save_lock, self._saved_seq)
+
+    def _dispatch(self):
+        for worker in self._workers:
+            if not self._pending:
+                return
+            if worker.job is None:
+                job = self._pending.popleft()
+                worker.job = job
+                worker.cancel_event.clear()
+                job.status = RUNNING
+                job.started_at = time.time()
+                worker.conn.send((job.id, job.seq, job.inputs, job.output_paths))
+                job.events.publish({"job_id": job.id, "status": job.status}, event="status")
+
+    def _listen(self):
+        while not self._closed:
+            with self._lock:
+                conns = {worker.conn: worker for worker in self._workers}
+            for conn in wait(list(conns), timeout=0.5):
+                worker = conns[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    self._replace_dead_worker(worker)
+                    continue
+                self._handle(worker, message)
+
+    def _handle(self, worker, message):
+        kind, job_id = message[0], message[1]
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if kind == "log":
+                if job is not None:
+                    job.events.publish(message[3])
+                return
+            if kind == "progress":
+                if job is not None:
+                    job.events.publish(message[2], event="progress")
+                return
+
+            worker.job = None
+            if job is None:
+                self._dispatch()
+                return
+            if kind == "done":
+                job.result = message[2]
+                cancelled = worker.cancel_event.is_set() or job.result["status"] == "CANCELLED"
+                self._finish(job, CANCELLED if cancelled else DONE)
+            else:
+                job.error = message[2]
+                self._finish(job, FAILED)
+            self._dispatch()
+
+    def _replace_dead_worker(self, worker):
+        with self._lock:
+            if self._closed:
+                return
+            if worker.job is not None:
+                worker.job.error = f"Worker process exited (code {worker.process.exitcode})."
+                self._finish(worker.job, FAILED)
+            self._workers[self._workers.index(worker)] = self._new_worker()
+            self._dispatch()
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+        job.inputs = None
+        job.events.publish(self._final_message(job))
+        job.events.publish({"job_id": job.id, "status": job.status}, event="end")
+        job.events.close()
+        finished = [j for j in self._jobs.values() if j.status in FINISHED_STATES]
+        for old in itertools.islice(finished, max(0, len(finished) - MAX_FINISHED_JOBS)):
+            del self._jobs[old.id]
+
+    @staticmethod
+    def _final_message(job):
+        # Same wording as the former main.py subprocess run, the run page relies on it
+        if job.status == DONE and job.result["status"] == "OK":
+            return "Le script du solveur a terminé avec succès."
+        if job.status == DONE:
+            return f"ERROR: {job.result['status']}."
+        if job.status == CANCELLED:
+            return f"ERROR: Job {job.id} annulé."
+        return f"ERROR: Exception: {job.error}"
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers=1, max_queued=4):
+    """Process-wide pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SolverPool(workers=workers, max_queued=max_queued)
+            atexit.register(_pool.shutdown)
+        return _pool